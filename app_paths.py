@@ -32,8 +32,12 @@ def get_app_paths(override=None):
     return {
         "root": root,
         "presets": root / "presets.json",
+        "preset_db": root / "presets.sqlite3",
         "favorites": root / "favorites.json",
         "backups": backups,
+        "search_index": root / "search_index.sqlite3",
+        "journal": root / "change_journal.jsonl",
+        "history": root / "history",
     }
 
 
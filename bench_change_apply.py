@@ -0,0 +1,84 @@
+"""Compare per-value and key-grouped ``ChangePlan.apply`` on an in-memory backend.
+
+Every path-addressed backend call stands for one registry key open; a key
+session opens its key once for a whole batch::
+
+    python bench_change_apply.py --sizes 10 1000 100000 --per-key 100
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+
+from change_manager import ChangePlan
+from registry_backend import HKEY_CURRENT_USER, REG_DWORD, InMemoryRegistryBackend
+from registry_handler import RegistryHandler
+
+
+class CountingBackend(InMemoryRegistryBackend):
+    """Counts key opens: one per path-addressed call, one per session."""
+
+    def __init__(self):
+        super().__init__()
+        self.opens = 0
+
+    def query_value(self, hive, path, name):
+        self.opens += 1
+        return super().query_value(hive, path, name)
+
+    def set_value(self, hive, path, name, data, value_type):
+        self.opens += 1
+        super().set_value(hive, path, name, data, value_type)
+
+    def delete_value(self, hive, path, name):
+        self.opens += 1
+        super().delete_value(hive, path, name)
+
+    def open_key_session(self, hive, path):
+        self.opens += 1
+        return super().open_key_session(hive, path)
+
+
+class PerValueHandler(RegistryHandler):
+    """The handler as ``ChangePlan`` saw it before key sessions existed."""
+
+    key_session = None
+
+
+def run(handler_class, changes, per_key):
+    backend = CountingBackend()
+    handler = handler_class(backend=backend)
+    plan = ChangePlan(handler, "bench")
+    for start in range(0, changes, per_key):
+        path = f"Software\\Bench\\Key{start // per_key}"
+        backend.create_key(HKEY_CURRENT_USER, path)
+        count = min(per_key, changes - start)
+        plan.set_values(HKEY_CURRENT_USER, path, [(f"Value{i}", i, REG_DWORD) for i in range(count)])
+
+    backend.opens = 0
+    started = time.perf_counter()
+    result = plan.apply()
+    elapsed = time.perf_counter() - started
+    assert result.applied_count == changes, result.message
+    return backend.opens, elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 1000, 100000])
+    parser.add_argument("--per-key", type=int, default=100)
+    args = parser.parse_args(argv)
+
+    print(f"{'changes':>8}  {'per-value opens':>15}  {'grouped opens':>13}  {'per-value s':>11}  {'grouped s':>9}")
+    for changes in args.sizes:
+        per_value_opens, per_value_seconds = run(PerValueHandler, changes, args.per_key)
+        grouped_opens, grouped_seconds = run(RegistryHandler, changes, args.per_key)
+        print(
+            f"{changes:>8}  {per_value_opens:>15}  {grouped_opens:>13}  "
+            f"{per_value_seconds:>11.3f}  {grouped_seconds:>9.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
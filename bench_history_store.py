@@ -0,0 +1,66 @@
+"""Measure history store startup and undo against a long on-disk history.
+
+Records many small applied plans, then times reopening the store and
+walking part of the undo stack through a bounded ``HistoryManager``::
+
+    python bench_history_store.py --plans 20000
+"""
+
+from __future__ import annotations
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from change_manager import ChangePlan
+from history_manager import HistoryManager
+from history_store import HistoryStore
+from registry_backend import HKEY_CURRENT_USER, REG_DWORD, InMemoryRegistryBackend
+from registry_handler import RegistryHandler
+
+
+PATH = r"Software\Bench\History"
+
+
+def record_plans(store, handler, count):
+    for i in range(count):
+        plan = ChangePlan(handler, f"Edit {i}")
+        plan.set_value(HKEY_CURRENT_USER, PATH, f"Value{i % 50}", i, REG_DWORD)
+        plan.apply()
+        store.record(plan)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--plans", type=int, default=20000)
+    parser.add_argument("--window", type=int, default=100)
+    args = parser.parse_args()
+
+    handler = RegistryHandler(backend=InMemoryRegistryBackend())
+    handler.create_key(HKEY_CURRENT_USER, PATH)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        directory = Path(temp_dir) / "history"
+        store = HistoryStore(directory, handler)
+        started = time.perf_counter()
+        record_plans(store, handler, args.plans)
+        recorded = time.perf_counter() - started
+        store.close()
+
+        started = time.perf_counter()
+        store = HistoryStore(directory, handler)
+        history = HistoryManager(max_size=args.window, store=store)
+        opened = time.perf_counter() - started
+
+        started = time.perf_counter()
+        labels = [entry.label for entry in history.get_history()]
+        listed = time.perf_counter() - started
+        store.close()
+
+    print(f"recorded {args.plans} plans in {recorded:.2f}s ({recorded / args.plans * 1e6:.0f} us/plan)")
+    print(f"reopened with {history.undo_count()} undoable plans in {opened * 1000:.1f} ms")
+    print(f"summarized {len(labels)} windowed entries in {listed * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
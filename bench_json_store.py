@@ -0,0 +1,92 @@
+"""Measure saving and loading a large preset store with each serializer.
+
+Builds a preset file with many presets, a quarter of them holding binary
+data, and times one atomic save and one load per serializer, then the
+SQLite preset store's one-row save and first-page listing::
+
+    python bench_json_store.py --presets 10000
+"""
+
+from __future__ import annotations
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import json_store
+from preset_store import PresetStore
+from registry_backend import REG_BINARY, REG_DWORD, REG_MULTI_SZ, REG_SZ
+
+
+def make_presets(count):
+    presets = {}
+    for i in range(count):
+        values = [
+            (f"Enabled{i % 7}", i % 2, REG_DWORD),
+            ("Label", f"preset {i}", REG_SZ),
+            ("Paths", [f"C:\\Tools\\{i}", "D:\\Shared"], REG_MULTI_SZ),
+        ]
+        if i % 4 == 0:
+            values.append(("Blob", bytes([i % 256]) * 64, REG_BINARY))
+        presets[f"Preset {i}"] = {"path": f"Software\\Bench\\Preset{i % 100}", "values": values}
+    return presets
+
+
+def serializers():
+    yield json_store.JsonSerializer()
+    if json_store.orjson is not None:
+        yield json_store.OrjsonSerializer()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--presets", type=int, default=10000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    presets = make_presets(args.presets)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = Path(temp_dir) / "presets.json"
+        for serializer in serializers():
+            started = time.perf_counter()
+            for _ in range(args.rounds):
+                json_store.atomic_write_json(path, presets, serializer)
+            saved = (time.perf_counter() - started) / args.rounds
+
+            started = time.perf_counter()
+            for _ in range(args.rounds):
+                loaded = json_store.load_json(path, dict, serializer)
+            load_time = (time.perf_counter() - started) / args.rounds
+            assert len(loaded) == args.presets
+
+            print(
+                f"{serializer.name:>7}: {path.stat().st_size / 1e6:.2f} MB, "
+                f"save {saved * 1000:.1f} ms, load {load_time * 1000:.1f} ms"
+            )
+
+        store = PresetStore(Path(temp_dir) / "presets.sqlite3")
+        started = time.perf_counter()
+        store.migrate_json(path)
+        migrated = time.perf_counter() - started
+
+        started = time.perf_counter()
+        for i in range(args.rounds):
+            store.save(f"Preset {i}", presets[f"Preset {i}"])
+        saved = (time.perf_counter() - started) / args.rounds
+
+        started = time.perf_counter()
+        for _ in range(args.rounds):
+            page = store.page(0, 100)
+        listed = (time.perf_counter() - started) / args.rounds
+        store.close()
+        assert len(page) == 100
+
+        print(
+            f" sqlite: migrated in {migrated * 1000:.1f} ms, "
+            f"save one {saved * 1000:.1f} ms, list 100 {listed * 1000:.2f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""Compare per-key registry reads against an in-process fake winreg.
+
+Counts handle opens and enumeration-ending exceptions for the old
+``enum_keys`` + ``read_key`` pattern versus one ``read_key_full`` call::
+
+    python bench_key_reader.py --keys 2000 --values 20
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+from unittest import mock
+
+import registry_handler
+from registry_handler import RegistryHandler
+
+
+HIVE = 0x80000001
+KEY_READ = 0x20019
+
+
+class FakeWinreg:
+    """Just enough of ``winreg`` for key reads, with call counters."""
+
+    KEY_READ = KEY_READ
+
+    def __init__(self, keys, values_per_key):
+        self.keys = {}
+        for i in range(keys):
+            path = f"Software\\Bench\\Key{i}"
+            self.keys[path.casefold()] = (
+                [f"Child{j}" for j in range(4)],
+                [(f"Value{j}", j, 4) for j in range(values_per_key)],
+            )
+        self.opens = 0
+        self.raised = 0
+
+    def OpenKey(self, parent, path, reserved=0, access=0):
+        if path.casefold() not in self.keys:
+            raise FileNotFoundError(path)
+        self.opens += 1
+        return _FakeKey(self.keys[path.casefold()])
+
+    def QueryInfoKey(self, key):
+        return len(key.entry[0]), len(key.entry[1]), 0
+
+    def EnumKey(self, key, index):
+        return self._item(key.entry[0], index)
+
+    def EnumValue(self, key, index):
+        return self._item(key.entry[1], index)
+
+    def _item(self, items, index):
+        if index >= len(items):
+            self.raised += 1
+            raise OSError("No more data is available")
+        return items[index]
+
+
+class _FakeKey:
+    def __init__(self, entry):
+        self.entry = entry
+
+    def Close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.Close()
+
+
+def legacy_read(fake, path):
+    """The pre-``read_key_full`` pattern: two opens, exception-terminated loops."""
+    results = []
+    for enum in (fake.EnumKey, fake.EnumValue):
+        with fake.OpenKey(HIVE, path, 0, KEY_READ) as key:
+            items = []
+            i = 0
+            while True:
+                try:
+                    items.append(enum(key, i))
+                    i += 1
+                except OSError:
+                    break
+        results.append(items)
+    return results
+
+
+def run(keys, values_per_key):
+    paths = [f"Software\\Bench\\Key{i}" for i in range(keys)]
+    rows = []
+
+    fake = FakeWinreg(keys, values_per_key)
+    started = time.perf_counter()
+    for path in paths:
+        legacy_read(fake, path)
+    rows.append(("enum_keys + read_key", fake.opens, fake.raised, time.perf_counter() - started))
+
+    fake = FakeWinreg(keys, values_per_key)
+    with mock.patch.object(registry_handler, "winreg", fake):
+        handler = RegistryHandler()
+        started = time.perf_counter()
+        for path in paths:
+            handler.read_key_full(HIVE, path)
+        elapsed = time.perf_counter() - started
+    rows.append(("read_key_full", fake.opens, fake.raised, elapsed))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--keys", type=int, default=2000)
+    parser.add_argument("--values", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    print(f"{args.keys} keys x {args.values} values")
+    print(f"{'reader':<22}{'opens/key':>10}{'raises/key':>12}{'ms':>10}")
+    for label, opens, raised, elapsed in run(args.keys, args.values):
+        print(
+            f"{label:<22}{opens / args.keys:>10.2f}{raised / args.keys:>12.2f}"
+            f"{elapsed * 1000:>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Measure planning time and retained memory of large change plans.
+
+Builds a preset-like plan against the in-memory backend, with and without
+payload interning, and reports the memory the plan keeps alive::
+
+    python bench_plan_memory.py --values 100000 --distinct 50
+"""
+
+from __future__ import annotations
+
+import argparse
+import gc
+import time
+import tracemalloc
+
+from change_manager import ChangePlan
+from registry_backend import (
+    HKEY_CURRENT_USER,
+    REG_BINARY,
+    REG_DWORD,
+    REG_MULTI_SZ,
+    REG_SZ,
+    InMemoryRegistryBackend,
+)
+from registry_handler import RegistryHandler
+
+
+def preset_values(count, distinct):
+    """Yield ``(name, data, type)`` specs that repeat *distinct* payloads."""
+    for i in range(count):
+        n = i % distinct
+        kind = i % 4
+        if kind == 0:
+            yield f"Value{i}", f"setting {n}", REG_SZ
+        elif kind == 1:
+            yield f"Value{i}", n, REG_DWORD
+        elif kind == 2:
+            yield f"Value{i}", bytes([n]) * 64, REG_BINARY
+        else:
+            yield f"Value{i}", [f"item {n}", "tail"], REG_MULTI_SZ
+
+
+def build(handler, specs, per_key, intern_payloads):
+    plan = ChangePlan(handler, "bench", intern_payloads=intern_payloads)
+    for start in range(0, len(specs), per_key):
+        plan.set_values(HKEY_CURRENT_USER, f"Software\\Bench\\Key{start // per_key}", specs[start:start + per_key])
+    return plan.seal()
+
+
+def measure(handler, count, distinct, per_key, intern_payloads):
+    # Fresh payload objects per run, as if each preset were loaded from disk.
+    specs = [
+        (name, list(data) if isinstance(data, list) else data, value_type)
+        for name, data, value_type in preset_values(count, distinct)
+    ]
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    plan = build(handler, specs, per_key, intern_payloads)
+    elapsed = time.perf_counter() - started
+    del specs
+    gc.collect()
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert len(plan.changes) == count
+    return elapsed, retained
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--values", type=int, default=100000)
+    parser.add_argument("--distinct", type=int, default=50)
+    parser.add_argument("--per-key", type=int, default=100)
+    args = parser.parse_args(argv)
+
+    backend = InMemoryRegistryBackend()
+    for start in range(0, args.values, args.per_key):
+        backend.create_key(HKEY_CURRENT_USER, f"Software\\Bench\\Key{start // args.per_key}")
+    handler = RegistryHandler(backend=backend)
+
+    for intern_payloads in (False, True):
+        elapsed, retained = measure(handler, args.values, args.distinct, args.per_key, intern_payloads)
+        label = "interned" if intern_payloads else "plain"
+        print(
+            f"{label:>8}: plan {elapsed:6.2f} s  retained {retained / (1 << 20):7.1f} MiB"
+            f"  ({retained / args.values:5.0f} B/value)"
+        )
+
+
+if __name__ == "__main__":
+    main()
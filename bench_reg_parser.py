@@ -0,0 +1,68 @@
+"""Measure .reg export and parse throughput on a generated in-memory hive.
+
+    python bench_reg_parser.py --keys 20000 --values 10
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import tempfile
+import time
+
+from reg_file import export_to_file, parse_reg_file
+from registry_backend import (
+    HKEY_CURRENT_USER,
+    REG_BINARY,
+    REG_DWORD,
+    REG_EXPAND_SZ,
+    REG_SZ,
+    InMemoryRegistryBackend,
+)
+
+
+def build_backend(keys, values_per_key):
+    backend = InMemoryRegistryBackend()
+    for i in range(keys):
+        path = f"Software\\Bench\\Group{i // 100}\\Key{i}"
+        backend.create_key(HKEY_CURRENT_USER, path)
+        for j in range(values_per_key):
+            kind = j % 4
+            if kind == 0:
+                data, value_type = f"value {i}-{j}", REG_SZ
+            elif kind == 1:
+                data, value_type = i * j, REG_DWORD
+            elif kind == 2:
+                data, value_type = f"%TEMP%\\{i}\\{j}", REG_EXPAND_SZ
+            else:
+                data, value_type = bytes((i + j + n) & 0xFF for n in range(48)), REG_BINARY
+            backend.set_value(HKEY_CURRENT_USER, path, f"Value{j}", data, value_type)
+    return backend
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--keys", type=int, default=20000)
+    parser.add_argument("--values", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    backend = build_backend(args.keys, args.values)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        filepath = os.path.join(temp_dir, "bench.reg")
+
+        started = time.perf_counter()
+        writer = export_to_file(backend, [(HKEY_CURRENT_USER, "Software\\Bench")], filepath)
+        export_seconds = time.perf_counter() - started
+        size_mb = os.path.getsize(filepath) / (1 << 20)
+
+        started = time.perf_counter()
+        operations = sum(1 for _ in parse_reg_file(filepath))
+        parse_seconds = time.perf_counter() - started
+
+    print(f"{writer.keys_written} keys, {writer.values_written} values, {size_mb:.1f} MiB")
+    print(f"export  {export_seconds:7.2f} s  {size_mb / export_seconds:7.1f} MiB/s")
+    print(f"parse   {parse_seconds:7.2f} s  {size_mb / parse_seconds:7.1f} MiB/s  ({operations} operations)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""Write-ahead journal for ``ChangePlan.apply`` and crash recovery.
+
+The journal is an append-only JSON-lines file. Before a plan's first write
+it records the plan's intent: every effective change with its before and
+after snapshots. It then notes each attempted change, and finally the
+outcome. A plan whose intent is on disk but whose outcome is not was
+interrupted, and can be compensated from the journaled before-snapshots
+with the plan's own rollback rules. Intent and outcome records are always
+fsynced; per-change notes are fsynced in batches, which is safe because
+recovery re-checks every change of the plan against live registry state.
+Once no plan is open, the file is truncated, so it stays small.
+
+One process owns a journal at a time: ``ChangeJournal`` holds an exclusive
+lock on ``<journal>.lock`` until it is closed, and raises ``FileLockError``
+if another process holds it. Otherwise one process could truncate another's
+open intent, or offer to roll back a plan that is still being applied.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import NamedTuple
+
+from change_manager import ChangePlan
+from file_lock import FileLock
+from plan_format import decode_change, encode_change
+
+
+JOURNAL_VERSION = 1
+
+
+class JournalError(ValueError):
+    """Raised when the journal file is damaged beyond a torn final record."""
+
+
+class InterruptedPlan(NamedTuple):
+    """A plan whose apply started but never recorded an outcome."""
+
+    plan_id: str
+    label: str
+    created_at: str
+    changes: tuple
+    attempted: int
+
+
+class JournalEntry:
+    """The open journal record of one plan being applied."""
+
+    def __init__(self, journal, plan_id, changes):
+        self.journal = journal
+        self.plan_id = plan_id
+        self._indexes = {id(change): index for index, change in enumerate(changes)}
+
+    def attempted(self, change):
+        """Note that *change* is about to be written."""
+        self.journal._append({"op": "write", "id": self.plan_id, "i": self._indexes[id(change)]})
+
+    def finish(self, status):
+        self.journal._finish(self.plan_id, status)
+
+
+class ChangeJournal:
+    """An append-only, fsync-batched journal file; see the module docstring."""
+
+    def __init__(self, path, sync_interval=256):
+        self.path = Path(path)
+        self.sync_interval = max(1, sync_interval)
+        self._lock = threading.Lock()
+        self._stream = None
+        self._unsynced = 0
+        self._file_lock = FileLock(self.path.with_name(self.path.name + ".lock")).acquire()
+        try:
+            # Plans begun but not finished, including those left by a crash.
+            self._open = {plan.plan_id for plan in self.interrupted()}
+        except BaseException:
+            self._file_lock.release()
+            raise
+
+    def _file(self):
+        if not self._file_lock.held:
+            raise JournalError("The change journal has been closed.")
+        if self._stream is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._stream = open(self.path, "ab")
+        return self._stream
+
+    def _sync(self):
+        stream = self._file()
+        stream.flush()
+        os.fsync(stream.fileno())
+        self._unsynced = 0
+
+    def _append(self, record, sync=False):
+        # ASCII escapes keep lone surrogates in registry names exact.
+        line = json.dumps(record, separators=(",", ":")).encode("ascii") + b"\n"
+        with self._lock:
+            self._file().write(line)
+            self._unsynced += 1
+            if sync or self._unsynced >= self.sync_interval:
+                self._sync()
+
+    def begin(self, plan, changes):
+        """Durably record *plan*'s intent before any of *changes* is written."""
+        plan_id = uuid.uuid4().hex
+        self._append({
+            "op": "begin",
+            "v": JOURNAL_VERSION,
+            "id": plan_id,
+            "label": plan.label,
+            "created": datetime.now(timezone.utc).isoformat(),
+            "changes": [encode_change(change) for change in changes],
+        }, sync=True)
+        with self._lock:
+            self._open.add(plan_id)
+        return JournalEntry(self, plan_id, changes)
+
+    def _finish(self, plan_id, status):
+        status = getattr(status, "value", status)
+        self._append({"op": "end", "id": plan_id, "status": status}, sync=True)
+        with self._lock:
+            self._open.discard(plan_id)
+            if not self._open:
+                stream = self._file()
+                stream.truncate(0)
+                os.fsync(stream.fileno())
+
+    def interrupted(self):
+        """Return the plans that began but never recorded an outcome."""
+        try:
+            with open(self.path, "rb") as stream:
+                lines = stream.read().splitlines()
+        except FileNotFoundError:
+            return []
+
+        begun = {}
+        attempted = {}
+        for number, line in enumerate(lines, 1):
+            try:
+                record = json.loads(line)
+                op, plan_id = record["op"], record["id"]
+            except (ValueError, KeyError, TypeError):
+                if number == len(lines):
+                    break  # A torn final record; nothing after it was written.
+                raise JournalError(f"Damaged change journal record at line {number}.") from None
+            if op == "begin":
+                begun[plan_id] = record
+                attempted[plan_id] = 0
+            elif op == "write" and plan_id in attempted:
+                attempted[plan_id] += 1
+            elif op == "end":
+                begun.pop(plan_id, None)
+
+        return [
+            InterruptedPlan(
+                plan_id,
+                record.get("label", "Registry changes"),
+                record.get("created", ""),
+                tuple(decode_change(change) for change in record.get("changes", ())),
+                attempted[plan_id],
+            )
+            for plan_id, record in begun.items()
+        ]
+
+    def recover(self, handler, interrupted):
+        """Roll back an interrupted plan and record the outcome.
+
+        Every journaled change is compensated, not just the noted ones:
+        batched notes may not have reached the disk, and a change that was
+        never written still matches its before-snapshot and is skipped.
+        """
+        result = ChangePlan.recover(handler, interrupted.label, interrupted.changes)
+        self._finish(interrupted.plan_id, f"recovery_{result.status.value}")
+        return result
+
+    def discard(self, interrupted):
+        """Keep the registry as the interrupted plan left it."""
+        self._finish(interrupted.plan_id, "discarded")
+
+    def close(self):
+        with self._lock:
+            if self._stream is not None:
+                self._sync()
+                self._stream.close()
+                self._stream = None
+            self._file_lock.release()
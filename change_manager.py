@@ -3,12 +3,18 @@
 from __future__ import annotations
 
 import copy
-import winreg
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
 from dataclasses import dataclass
 from datetime import datetime, timezone
 from enum import Enum
+from functools import cached_property
 from typing import Any
 
+from registry_backend import REG_MULTI_SZ, filetime_now
+
 
 class DuplicateOperationError(ValueError):
     """Raised when a plan targets the same registry value more than once."""
@@ -38,9 +44,43 @@ class ApplyStatus(str, Enum):
     ROLLBACK_FAILED = "rollback_failed"
 
 
-@dataclass(frozen=True)
+_IMMUTABLE_PAYLOADS = (str, int, bytes, float, type(None))
+
+
+def _freeze(value):
+    """Return an immutable equivalent of registry data, copying only if needed."""
+    if isinstance(value, _IMMUTABLE_PAYLOADS):
+        return value
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    if isinstance(value, (bytearray, memoryview)):
+        return bytes(value)
+    return copy.deepcopy(value)
+
+
+def payload_size(value):
+    """Approximate bytes of registry data, counted as the registry stores it."""
+    if value is None:
+        return 0
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return len(value)
+    if isinstance(value, str):
+        return 2 * (len(value) + 1)  # UTF-16 with a terminator
+    if isinstance(value, int):
+        return 8
+    if isinstance(value, (tuple, list)):
+        return sum(payload_size(item) for item in value) + 2
+    return sys.getsizeof(value)
+
+
+@dataclass(frozen=True, slots=True)
 class ValueSnapshot:
-    """Exact existence, data, and type state for one registry value."""
+    """Exact existence, data, and type state for one registry value.
+
+    Data is frozen once on construction: registry payloads are str, int,
+    bytes, or a tuple of str for REG_MULTI_SZ, so snapshots can be shared
+    and are never copied again.
+    """
 
     exists: bool
     value: Any = None
@@ -48,20 +88,50 @@ class ValueSnapshot:
 
     @classmethod
     def missing(cls):
-        return cls(False, None, None)
+        return _MISSING
 
     @classmethod
     def existing(cls, value, value_type):
-        # Registry values are normally immutable scalars/bytes, except
-        # REG_MULTI_SZ. Freeze sequences so caller-owned lists cannot mutate
-        # history or alter optimistic-concurrency checks after planning.
-        if isinstance(value, (list, tuple)):
-            value = tuple(copy.deepcopy(item) for item in value)
-        elif isinstance(value, (bytearray, memoryview)):
-            value = bytes(value)
-        else:
-            value = copy.deepcopy(value)
-        return cls(True, value, value_type)
+        # Freeze sequences so caller-owned lists cannot mutate history or
+        # alter optimistic-concurrency checks after planning.
+        return cls(True, _freeze(value), value_type)
+
+
+_MISSING = ValueSnapshot(False, None, None)
+
+
+class PayloadInterner:
+    """Share one object between equal snapshots and payloads of a plan.
+
+    Large presets and imports repeat the same data many times; interning
+    keeps one copy of each distinct payload for the life of the plan and
+    its history entry.
+    """
+
+    def __init__(self):
+        self._payloads = {}
+        self._snapshots = {}
+
+    def payload(self, value):
+        if isinstance(value, str):
+            return sys.intern(value)
+        if isinstance(value, tuple):
+            value = tuple(self.payload(item) for item in value)
+        elif not isinstance(value, bytes):
+            return value
+        # Key on the type too, so equal values of different types stay apart.
+        return self._payloads.setdefault((type(value), value), value)
+
+    def snapshot(self, snapshot):
+        if not snapshot.exists:
+            return _MISSING
+        key = (snapshot.value_type, type(snapshot.value), snapshot.value)
+        shared = self._snapshots.get(key)
+        if shared is None:
+            shared = self._snapshots[key] = ValueSnapshot(
+                True, self.payload(snapshot.value), snapshot.value_type
+            )
+        return shared
 
 
 @dataclass(frozen=True)
@@ -73,8 +143,9 @@ class PlannedChange:
     before: ValueSnapshot
     after: ValueSnapshot
 
-    @property
+    @cached_property
     def classification(self):
+        # Both snapshots are frozen, so the comparison only ever runs once.
         if self.before == self.after:
             return ChangeClassification.NO_CHANGE
         if not self.before.exists and self.after.exists:
@@ -95,12 +166,21 @@ class PlanPreview:
     label: str
     changes: tuple[PlannedChange, ...]
 
+    @cached_property
+    def _summary(self):
+        """Effective changes and per-classification counts, in one pass."""
+        counts = dict.fromkeys(ChangeClassification, 0)
+        effective = []
+        for change in self.changes:
+            classification = change.classification
+            counts[classification] += 1
+            if classification is not ChangeClassification.NO_CHANGE:
+                effective.append(change)
+        return tuple(effective), counts
+
     @property
     def effective_changes(self):
-        return tuple(
-            change for change in self.changes
-            if change.classification is not ChangeClassification.NO_CHANGE
-        )
+        return self._summary[0]
 
     @property
     def has_changes(self):
@@ -108,12 +188,7 @@ class PlanPreview:
 
     @property
     def counts(self):
-        return {
-            classification: sum(
-                change.classification is classification for change in self.changes
-            )
-            for classification in ChangeClassification
-        }
+        return dict(self._summary[1])
 
 
 @dataclass(frozen=True)
@@ -132,6 +207,8 @@ class ApplyResult:
     rolled_back_count: int = 0
     error: ChangeError | None = None
     rollback_errors: tuple[ChangeError, ...] = ()
+    # Pre-check reads not needed because a key's last-write time held.
+    precheck_reads_skipped: int = 0
 
     @property
     def success(self):
@@ -153,23 +230,54 @@ class ApplyResult:
         return self.error.message if self.error else "The registry change plan failed."
 
 
+def _journal_errors():
+    # change_journal imports this module, so its error type is looked up late.
+    from change_journal import JournalError
+
+    return (OSError, JournalError)
+
+
+def _group_by_key(changes):
+    """Group changes by ``(hive, casefolded path)`` in first-seen order."""
+    groups = {}
+    for change in changes:
+        groups.setdefault((change.hive, change.path.casefold()), []).append(change)
+    return groups
+
+
 class ChangePlan:
     """A guarded batch of registry value mutations.
 
     This is optimistic application-level compensation, not a native Windows
     Registry transaction. State is checked before every write and every write
     is read back, but another process can still mutate a key concurrently.
+
+    Where the handler reports key last-write times, each key's time is
+    recorded before its first snapshot. At apply, a key whose time has not
+    moved cannot have changed, so its values are not re-read for the
+    pre-check; any other key is compared value by value.
     """
 
-    def __init__(self, handler, label="Registry changes"):
+    # Last-write times this close to their capture (in FILETIME ticks, here
+    # two seconds) are not trusted: a later change within the clock's
+    # resolution could carry the same time.
+    STAMP_MARGIN = 20_000_000
+
+    def __init__(self, handler, label="Registry changes", intern_payloads=False):
         self.handler = handler
         self.label = label
+        self._interner = PayloadInterner() if intern_payloads else None
         self.created_at = datetime.now(timezone.utc).isoformat()
         self._changes = []
         self._targets = set()
+        # (hive, casefolded path) -> trusted last-write time, or None.
+        self._key_stamps = {}
         self._sealed = False
+        self._preview = None
         self._executed = False
         self._last_result = None
+        self._journal_entry = None
+        self._payload_bytes = None
 
     @property
     def changes(self):
@@ -179,6 +287,23 @@ class ChangePlan:
     def effective_changes(self):
         return self.preview().effective_changes
 
+    @property
+    def counts(self):
+        return self.preview().counts
+
+    @property
+    def payload_bytes(self):
+        """Approximate size of every snapshot's data; fixed once sealed."""
+        if self._payload_bytes is not None:
+            return self._payload_bytes
+        total = sum(
+            payload_size(change.before.value) + payload_size(change.after.value)
+            for change in self._changes
+        )
+        if self._sealed:
+            self._payload_bytes = total
+        return total
+
     @property
     def sealed(self):
         return self._sealed
@@ -199,9 +324,36 @@ class ChangePlan:
     def _target_key(self, hive, path, name):
         return (hive, path.casefold(), name.casefold())
 
-    def _read_snapshot(self, hive, path, name):
+    def _record_stamp(self, hive, path, stamp, captured_at):
+        """Keep a key's last-write time from before its first snapshot."""
+        key = (hive, path.casefold())
+        if key not in self._key_stamps:
+            trusted = stamp is not None and captured_at - stamp >= self.STAMP_MARGIN
+            self._key_stamps[key] = stamp if trusted else None
+
+    def _capture_stamp(self, hive, path):
+        if (hive, path.casefold()) in self._key_stamps:
+            return
+        captured_at = filetime_now()
+        self._record_stamp(hive, path, self._current_stamp(hive, path), captured_at)
+
+    def _current_stamp(self, hive, path, session=None):
+        """Return a key's last-write time, or ``None`` if it is unavailable."""
         try:
-            current = self.handler.read_value(hive, path, name)
+            if session is not None:
+                return session.last_write_time()
+            last_write_time = getattr(self.handler, "last_write_time", None)
+            return None if last_write_time is None else last_write_time(hive, path)
+        except Exception:
+            # Unknown times only cost the full value comparison.
+            return None
+
+    def _read_snapshot(self, hive, path, name, session=None):
+        try:
+            if session is None:
+                current = self.handler.read_value(hive, path, name)
+            else:
+                current = session.read_value(name)
         except Exception as exc:
             raise SnapshotReadError(
                 f"Could not read {path or '<root>'}\\{name or '(Default)'}: {exc}"
@@ -211,6 +363,50 @@ class ChangePlan:
         value, value_type = current
         return ValueSnapshot.existing(value, value_type)
 
+    def _read_key_snapshots(self, hive, path, names):
+        """Snapshot several values of one key, keyed by casefolded name.
+
+        Handlers that offer ``read_key_full`` are read once per key, so a
+        plan costs one open and enumeration per key instead of one per
+        value. Other handlers fall back to per-value reads.
+        """
+        read_key_full = getattr(self.handler, "read_key_full", None)
+        if read_key_full is None or len(names) < 2:
+            self._capture_stamp(hive, path)
+            return {
+                name.casefold(): self._read_snapshot(hive, path, name) for name in names
+            }
+        captured_at = filetime_now()
+        try:
+            info = read_key_full(hive, path)
+        except Exception as exc:
+            raise SnapshotReadError(f"Could not read {path or '<root>'}: {exc}") from exc
+        self._record_stamp(hive, path, info and info.last_write, captured_at)
+        current = {}
+        if info is not None:
+            for value_name, value, value_type in info.values:
+                current[value_name.casefold()] = (value, value_type)
+        snapshots = {}
+        for name in names:
+            fold = name.casefold()
+            found = current.get(fold)
+            snapshots[fold] = (
+                ValueSnapshot.existing(*found) if found is not None else ValueSnapshot.missing()
+            )
+        return snapshots
+
+    def _check_batch(self, hive, path, names):
+        if self._sealed:
+            raise PlanSealedError("This change plan has already been reviewed or executed.")
+        seen = set()
+        for name in names:
+            target = self._target_key(hive, path, name)
+            if target in self._targets or target in seen:
+                raise DuplicateOperationError(
+                    f"The plan targets {path or '<root>'}\\{name or '(Default)'} more than once."
+                )
+            seen.add(target)
+
     def _append(self, hive, hive_name, path, name, before, after):
         if self._sealed:
             raise PlanSealedError("This change plan has already been reviewed or executed.")
@@ -220,60 +416,114 @@ class ChangePlan:
                 f"The plan targets {path or '<root>'}\\{name or '(Default)'} more than once."
             )
         self._targets.add(target)
+        if self._interner is not None:
+            before = self._interner.snapshot(before)
+            after = self._interner.snapshot(after)
         change = PlannedChange(hive, hive_name, path, name, before, after)
         self._changes.append(change)
         return change
 
     def set_value(self, hive, path, name, value, value_type, hive_name="HKEY_CURRENT_USER"):
+        self._capture_stamp(hive, path)
         before = self._read_snapshot(hive, path, name)
         after = ValueSnapshot.existing(value, value_type)
         return self._append(hive, hive_name, path, name, before, after)
 
     def delete_value(self, hive, path, name, hive_name="HKEY_CURRENT_USER"):
+        self._capture_stamp(hive, path)
         before = self._read_snapshot(hive, path, name)
         return self._append(
             hive, hive_name, path, name, before, ValueSnapshot.missing()
         )
 
+    def set_values(self, hive, path, values, hive_name="HKEY_CURRENT_USER"):
+        """Plan ``(name, value, type)`` writes under one key.
+
+        Before-state is captured from one read of the key. The batch is
+        validated as a whole, so a duplicate target adds nothing.
+        """
+        values = list(values)
+        names = [name for name, _, _ in values]
+        self._check_batch(hive, path, names)
+        snapshots = self._read_key_snapshots(hive, path, names)
+        return [
+            self._append(
+                hive, hive_name, path, name, snapshots[name.casefold()],
+                ValueSnapshot.existing(value, value_type),
+            )
+            for name, value, value_type in values
+        ]
+
+    def delete_values(self, hive, path, names, hive_name="HKEY_CURRENT_USER"):
+        """Plan deletions of several values under one key; see ``set_values``."""
+        names = list(names)
+        self._check_batch(hive, path, names)
+        snapshots = self._read_key_snapshots(hive, path, names)
+        return [
+            self._append(
+                hive, hive_name, path, name, snapshots[name.casefold()],
+                ValueSnapshot.missing(),
+            )
+            for name in names
+        ]
+
     def preview(self):
-        return PlanPreview(self.label, tuple(self._changes))
+        """Return the plan's preview; a sealed plan builds it only once."""
+        if self._preview is not None:
+            return self._preview
+        preview = PlanPreview(self.label, tuple(self._changes))
+        if self._sealed:
+            self._preview = preview
+        return preview
 
-    def _read_for_apply(self, change):
+    def _key_session(self, hive, path):
+        key_session = getattr(self.handler, "key_session", None)
+        if key_session is None:
+            return nullcontext(None)
+        return key_session(hive, path)
+
+    def _read_for_apply(self, change, session=None):
         try:
-            return self._read_snapshot(change.hive, change.path, change.name), None
+            return self._read_snapshot(change.hive, change.path, change.name, session), None
         except SnapshotReadError as exc:
             return None, ChangeError("read_failed", str(exc), change)
 
-    def _write_snapshot(self, change, snapshot):
+    def _write_snapshot(self, change, snapshot, session=None):
         if snapshot.exists:
             value = snapshot.value
-            if snapshot.value_type == winreg.REG_MULTI_SZ and isinstance(value, tuple):
+            if snapshot.value_type == REG_MULTI_SZ and isinstance(value, tuple):
                 value = list(value)
+            if session is None:
+                success = self.handler.write_value(
+                    change.hive,
+                    change.path,
+                    change.name,
+                    value,
+                    snapshot.value_type,
+                )
             else:
-                value = copy.deepcopy(value)
-            success = self.handler.write_value(
-                change.hive,
-                change.path,
-                change.name,
-                value,
-                snapshot.value_type,
-            )
+                success = session.write_value(change.name, value, snapshot.value_type)
             operation = "write"
         else:
-            success = self.handler.delete_value(change.hive, change.path, change.name)
+            if session is None:
+                success = self.handler.delete_value(change.hive, change.path, change.name)
+            else:
+                success = session.delete_value(change.name)
             operation = "delete"
 
         if success:
             return None
-        detail = getattr(self.handler, "last_error", None) or "backend returned failure"
+        # A key session reports its own error, which other threads cannot reset.
+        reporter = self.handler if session is None else session
+        detail = getattr(reporter, "last_error", None) or "backend returned failure"
         return ChangeError(
             f"{operation}_failed",
             f"Could not {operation} {change.location}: {detail}",
             change,
         )
 
-    def _verify_snapshot(self, change, expected, code="verification_failed"):
-        current, error = self._read_for_apply(change)
+    def _verify_snapshot(self, change, expected, code="verification_failed", session=None):
+        current, error = self._read_for_apply(change, session)
         if error:
             return error
         if current != expected:
@@ -318,7 +568,7 @@ class ChangePlan:
             rolled_back_count += 1
         return tuple(rollback_errors), rolled_back_count
 
-    def _failed_result(self, error, candidates, applied_count):
+    def _failed_result(self, error, candidates, applied_count, reads_skipped=0):
         rollback_errors, rolled_back_count = self._rollback(candidates)
         if rollback_errors:
             status = ApplyStatus.ROLLBACK_FAILED
@@ -336,9 +586,120 @@ class ChangePlan:
             rolled_back_count=rolled_back_count,
             error=error,
             rollback_errors=rollback_errors,
+            precheck_reads_skipped=reads_skipped,
         )
 
-    def apply(self):
+    def _note_attempt(self, change):
+        if self._journal_entry is None:
+            return None
+        try:
+            self._journal_entry.attempted(change)
+        except _journal_errors() as exc:
+            return ChangeError("journal_failed", f"Could not write the change journal: {exc}", change)
+        return None
+
+    def _precheck_key(self, changes, session):
+        """Confirm every before-snapshot under one key still holds.
+
+        Runs before the key's first write, so a stale preview of any value
+        stops the batch before it touches the key. Returns
+        ``(reads_skipped, error)``.
+        """
+        first = changes[0]
+        stamp = self._key_stamps.get((first.hive, first.path.casefold()))
+        if stamp is not None and self._current_stamp(first.hive, first.path, session) == stamp:
+            return len(changes), None
+        for change in changes:
+            current, read_error = self._read_for_apply(change, session)
+            if read_error:
+                return 0, read_error
+            if current != change.before:
+                return 0, ChangeError(
+                    "conflict",
+                    f"Registry state changed after preview at {change.location}. Refresh and review again.",
+                    change,
+                )
+        return 0, None
+
+    def _apply_key(self, changes, candidates, session):
+        """Write and verify every change under one key, in plan order.
+
+        Returns ``(applied_count, error)``.
+        """
+        applied_count = 0
+        for change in changes:
+            # Include the attempted operation in recovery. A backend can fail
+            # after changing state, so a false return alone is not conclusive.
+            candidates.append(change)
+            error = self._note_attempt(change)
+            if error is None:
+                error = self._write_snapshot(change, change.after, session)
+            if error is None:
+                error = self._verify_snapshot(change, change.after, session=session)
+            if error:
+                return applied_count, error
+            applied_count += 1
+        return applied_count, None
+
+    def _apply_group(self, changes):
+        """Apply one key's changes.
+
+        Returns ``(applied, candidates, error, reads_skipped)``.
+        """
+        candidates = []
+        applied = 0
+        with self._key_session(changes[0].hive, changes[0].path) as session:
+            reads_skipped, error = self._precheck_key(changes, session)
+            if error is None:
+                applied, error = self._apply_key(changes, candidates, session)
+        return applied, candidates, error, reads_skipped
+
+    def _apply_parallel(self, groups, max_workers):
+        """Apply key groups on a bounded pool; returns per-group outcomes.
+
+        Workers claim groups in plan order and stop claiming new ones after
+        the first failure; groups already running finish. Outcomes are
+        indexed by group, so aggregation does not depend on timing.
+        """
+        outcomes = [None] * len(groups)
+        pending = iter(range(len(groups)))
+        claim_lock = threading.Lock()
+        failed = threading.Event()
+        errors = []
+
+        def worker():
+            while not failed.is_set():
+                with claim_lock:
+                    index = next(pending, None)
+                if index is None:
+                    return
+                try:
+                    outcomes[index] = self._apply_group(groups[index])
+                except BaseException as exc:
+                    errors.append(exc)
+                    failed.set()
+                    return
+                if outcomes[index][2] is not None:
+                    failed.set()
+
+        with ThreadPoolExecutor(
+            max_workers=min(max_workers, len(groups)), thread_name_prefix="registry-apply"
+        ) as pool:
+            for _ in range(min(max_workers, len(groups))):
+                pool.submit(worker)
+        if errors:
+            raise errors[0]
+        return [outcome for outcome in outcomes if outcome is not None]
+
+    def apply(self, max_workers=None):
+        """Apply every effective change, key by key.
+
+        With *max_workers* above 1, independent keys are applied on a
+        bounded thread pool; changes under one key keep their plan order.
+        After a failure no further keys are started, and every change that
+        was attempted is compensated in reverse plan order, exactly as in a
+        serial apply. The handler must tolerate calls from several threads.
+        """
         if self._executed:
             error = ChangeError(
                 "plan_already_executed",
@@ -355,50 +716,71 @@ class ChangePlan:
             self._last_result = result
             return result
 
-        candidates = []
-        applied_count = 0
-        for change in effective:
-            current, read_error = self._read_for_apply(change)
-            if read_error:
-                result = self._failed_result(read_error, candidates, applied_count)
-                self._last_result = result
-                return result
-            if current != change.before:
-                conflict = ChangeError(
-                    "conflict",
-                    f"Registry state changed after preview at {change.location}. Refresh and review again.",
-                    change,
+        # Handlers may carry a ChangeJournal; no write starts before the
+        # plan's intent is durable.
+        journal = getattr(self.handler, "journal", None)
+        if journal is not None:
+            try:
+                self._journal_entry = journal.begin(self, effective)
+            except _journal_errors() as exc:
+                error = ChangeError(
+                    "journal_failed",
+                    f"Could not write the change journal, so nothing was applied: {exc}",
                 )
-                result = self._failed_result(conflict, candidates, applied_count)
+                result = ApplyResult(ApplyStatus.FAILED, self, skipped_count=skipped, error=error)
                 self._last_result = result
                 return result
 
-            # Include the attempted operation in recovery. A backend can fail
-            # after changing state, so a false return alone is not conclusive.
-            candidates.append(change)
-            write_error = self._write_snapshot(change, change.after)
-            if write_error:
-                result = self._failed_result(write_error, candidates, applied_count)
-                self._last_result = result
-                return result
-            verify_error = self._verify_snapshot(change, change.after)
-            if verify_error:
-                result = self._failed_result(verify_error, candidates, applied_count)
-                self._last_result = result
-                return result
-            applied_count += 1
+        # An exception leaves the journal entry open, so the next start can
+        # offer to compensate whatever was written.
+        result = self._apply_effective(effective, skipped, max_workers)
+        if self._journal_entry is not None:
+            try:
+                self._journal_entry.finish(result.status)
+            except _journal_errors() as exc:
+                print(f"Change journal warning: {exc}")
+            self._journal_entry = None
+        self._last_result = result
+        return result
 
-        result = ApplyResult(
+    def _apply_effective(self, effective, skipped, max_workers):
+        groups = list(_group_by_key(effective).values())
+        if max_workers is not None and max_workers > 1 and len(groups) > 1:
+            outcomes = self._apply_parallel(groups, max_workers)
+        else:
+            outcomes = []
+            for changes in groups:
+                outcomes.append(self._apply_group(changes))
+                if outcomes[-1][2] is not None:
+                    break
+
+        candidates = []
+        applied_count = 0
+        reads_skipped = 0
+        error = None
+        for applied, group_candidates, group_error, group_reads_skipped in outcomes:
+            candidates.extend(group_candidates)
+            applied_count += applied
+            reads_skipped += group_reads_skipped
+            # Report the failure of the earliest key in plan order.
+            error = error or group_error
+        if error:
+            return self._failed_result(error, candidates, applied_count, reads_skipped)
+        return ApplyResult(
             ApplyStatus.SUCCESS,
             self,
             applied_count=applied_count,
             skipped_count=skipped,
+            precheck_reads_skipped=reads_skipped,
         )
-        self._last_result = result
-        return result
 
     @classmethod
-    def _from_changes(cls, handler, label, changes):
+    def from_changes(cls, handler, label, changes, applied=False):
+        """Build a plan from existing ``PlannedChange`` records.
+
+        With *applied*, the plan is restored as successfully applied, such
+        as one loaded from a saved file, so it can be undone or redone.
+        """
         plan = cls(handler, label)
         for change in changes:
             plan._append(
@@ -409,8 +791,44 @@ class ChangePlan:
                 change.before,
                 change.after,
             )
+        if applied:
+            plan.seal()
+            plan._executed = True
+            plan._last_result = ApplyResult(
+                ApplyStatus.SUCCESS,
+                plan,
+                applied_count=len(plan.effective_changes),
+                skipped_count=len(plan.changes) - len(plan.effective_changes),
+            )
         return plan
 
+    @classmethod
+    def recover(cls, handler, label, changes):
+        """Compensate the changes of an interrupted apply, newest first.
+
+        Uses the rollback rules of a failed apply: values still at their
+        before-state are skipped, values at their after-state are restored,
+        and anything else is reported as a conflict and left alone.
+        """
+        plan = cls.from_changes(handler, label, changes).seal()
+        plan._executed = True
+        rollback_errors, rolled_back_count = plan._rollback(list(plan.changes))
+        if rollback_errors:
+            status = ApplyStatus.ROLLBACK_FAILED
+        elif rolled_back_count:
+            status = ApplyStatus.ROLLED_BACK
+        else:
+            status = ApplyStatus.NO_CHANGES
+        result = ApplyResult(
+            status,
+            plan,
+            rolled_back_count=rolled_back_count,
+            error=ChangeError("interrupted", f"{label} was interrupted before it finished."),
+            rollback_errors=rollback_errors,
+        )
+        plan._last_result = result
+        return result
+
     def create_inverse_plan(self, label=None):
         if not self.applied_successfully:
             raise RuntimeError("Only a successfully applied plan can be undone.")
@@ -425,7 +843,7 @@ class ChangePlan:
             )
             for change in reversed(self.effective_changes)
         ]
-        return self._from_changes(
+        return self.from_changes(
             self.handler, label or f"Undo: {self.label}", changes
         )
 
@@ -443,6 +861,40 @@ class ChangePlan:
             )
             for change in self.effective_changes
         ]
-        return self._from_changes(
+        return self.from_changes(
             self.handler, label or f"Redo: {self.label}", changes
         )
+
+
+def merge_plans(plans, label=None):
+    """Collapse plans applied one after another into one net plan.
+
+    Each target keeps the before-snapshot of its first change and the
+    after-snapshot of its last, in order of first appearance; targets that
+    end where they started are dropped. One pass over all changes with a
+    dict index, so the cost is linear. The result is bound to the first
+    plan's handler, and counts as applied when every input plan applied,
+    so the whole sequence can be undone or redone at once.
+    """
+    plans = list(plans)
+    if not plans:
+        raise ValueError("At least one plan is required to merge.")
+    first_plan = plans[0]
+    merged = {}
+    for plan in plans:
+        for change in plan.changes:
+            target = first_plan._target_key(change.hive, change.path, change.name)
+            earlier = merged.get(target)
+            if earlier is None:
+                merged[target] = change
+            else:
+                merged[target] = PlannedChange(
+                    earlier.hive, earlier.hive_name, earlier.path, earlier.name,
+                    earlier.before, change.after,
+                )
+    return ChangePlan.from_changes(
+        first_plan.handler,
+        label or f"Merged {len(plans)} plan(s)",
+        [change for change in merged.values() if change.before != change.after],
+        applied=all(plan.applied_successfully for plan in plans),
+    )
@@ -0,0 +1,57 @@
+"""Exclusive locks that one process holds on a data file for its lifetime.
+
+The change journal and the on-disk history are each written by one process
+at a time. A second Registry Manager window, or the command line while the
+app is open, fails to take the lock and works without that file instead of
+interleaving writes with the owner. The operating system releases the lock
+when its holder exits, so a crash never leaves a stale lock behind.
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+
+try:
+    import msvcrt
+except ImportError:  # POSIX: fcntl locks whole files.
+    msvcrt = None
+    import fcntl
+
+
+class FileLockError(OSError):
+    """Raised when another process already holds the lock."""
+
+
+class FileLock:
+    """A non-blocking exclusive lock on *path*, created if missing."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._stream = None
+
+    @property
+    def held(self):
+        return self._stream is not None
+
+    def acquire(self):
+        if self._stream is not None:
+            return self
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        stream = open(self.path, "a+b")
+        try:
+            if msvcrt is not None:
+                stream.seek(0)
+                msvcrt.locking(stream.fileno(), msvcrt.LK_NBLCK, 1)
+            else:
+                fcntl.flock(stream.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError as exc:
+            stream.close()
+            raise FileLockError(f"{self.path} is in use by another Registry Manager process.") from exc
+        self._stream = stream
+        return self
+
+    def release(self):
+        if self._stream is not None:
+            # Closing the handle drops the lock on every platform.
+            self._stream.close()
+            self._stream = None
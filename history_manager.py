@@ -1,20 +1,123 @@
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 from collections import deque
 
+from change_manager import merge_plans, payload_size
+from history_store import StoredPlan
+
+
 class HistoryManager:
     """
-    In-memory history of verified registry change plans.
+    History of verified registry change plans.
 
     Stack entries are only moved after the caller confirms that undo or redo
     completed successfully.  This keeps a transient registry error from
     silently losing the user's recovery action.
+
+    With a ``HistoryStore``, every plan is also kept on disk and history
+    survives restarts. The stacks then hold lazy ``StoredPlan`` entries and
+    act as a window of at most *max_size* entries next to the cursor; they
+    are refilled from the store as entries are undone or redone. If the
+    store fails, history continues in memory only.
+
+    *max_bytes* bounds the snapshot data history keeps in memory (see
+    ``memory_usage``). With a store, over-budget plans are only dropped from
+    its cache and reload from disk when needed. Without one, the oldest undo
+    entries are evicted; the newest is always kept so the last action can
+    be undone.
+
+    *keep_plans* and *keep_days* bound what the store retains: older undo
+    entries beyond the newest *keep_plans*, or created more than
+    *keep_days* ago, are trimmed from disk on startup and after each new
+    entry.
     """
-    def __init__(self, max_size=100):
+    def __init__(self, max_size=100, store=None, max_bytes=None, keep_plans=None, keep_days=None):
         self.undo_stack = deque(maxlen=max_size)
         self.redo_stack = deque(maxlen=max_size)
+        self.store = store
+        self.max_bytes = max_bytes
+        self.keep_plans = keep_plans
+        self.keep_days = keep_days
+        if store is not None:
+            store.max_cache_bytes = max_bytes
+        self._enforce_retention()
+        self._refill()
+
+    @staticmethod
+    def _entry_bytes(entry):
+        if isinstance(entry, dict):
+            return payload_size(entry.get("old_value")) + payload_size(entry.get("new_value"))
+        # Stored entries hold no snapshots; loaded ones count in the store.
+        return getattr(entry, "payload_bytes", 0)
+
+    def memory_usage(self):
+        """Approximate snapshot bytes held by history in memory."""
+        total = sum(self._entry_bytes(entry) for entry in self.undo_stack)
+        total += sum(self._entry_bytes(entry) for entry in self.redo_stack)
+        if self.store is not None:
+            total += self.store.cached_bytes
+        return total
+
+    def _enforce_budget(self):
+        if self.max_bytes is None:
+            return
+        if self.store is not None:
+            self.store.trim_cache()
+            return
+        usage = self.memory_usage()
+        while usage > self.max_bytes and len(self.undo_stack) > 1:
+            usage -= self._entry_bytes(self.undo_stack.popleft())
+
+    def _enforce_retention(self):
+        if self.store is None:
+            return
+        count = 0
+        if self.keep_plans is not None:
+            count = max(0, self.store.undo_count - self.keep_plans)
+        if self.keep_days is not None:
+            cutoff = datetime.now(timezone.utc) - timedelta(days=self.keep_days)
+            count = max(count, self._store_call(self.store.expired_count, cutoff) or 0)
+        if count and self.store is not None:
+            self._store_call(self.store.trim, count)
+        if self.store is not None:
+            # The window may still hold entries that were just trimmed.
+            while len(self.undo_stack) > self.store.undo_count:
+                self.undo_stack.popleft()
+
+    def _refill(self):
+        """Top the stack windows back up from the store."""
+        if self.store is None:
+            return
+        for stack, total, entries in (
+            (self.undo_stack, self.store.undo_count, self.store.undo_entries),
+            (self.redo_stack, self.store.redo_count, self.store.redo_entries),
+        ):
+            wanted = min(stack.maxlen, total)
+            if len(stack) < wanted:
+                older = entries(wanted)[:wanted - len(stack)]
+                stack.extendleft(reversed(older))
+
+    def _store_call(self, operation, *args):
+        """Run a store operation; on failure, fall back to memory only."""
+        try:
+            return operation(*args)
+        except (OSError, ValueError, IndexError) as exc:
+            print(f"History store unavailable, keeping history in memory: {exc}")
+            self.store = None
+            return None
+
+    def undo_count(self):
+        """Number of undoable entries, including those only on disk."""
+        return self.store.undo_count if self.store is not None else len(self.undo_stack)
+
+    def redo_count(self):
+        return self.store.redo_count if self.store is not None else len(self.redo_stack)
 
     def record(self, action, hive, path, name, old_value=None, old_type=None, new_value=None, new_type=None):
-        """Record a legacy single-value action for backwards compatibility."""
+        """Record a legacy single-value action for backwards compatibility.
+
+        Legacy items cannot be persisted, so this detaches any store.
+        """
+        self.store = None
         entry = {
             "action": action,       # "write", "delete", "create_key"
             "hive": hive,
@@ -28,6 +131,7 @@ class HistoryManager:
         }
         self.undo_stack.append(entry)
         self.redo_stack.clear()  # Clear redo on new action
+        self._enforce_budget()
 
     def record_plan(self, plan):
         """Record a successfully applied ``ChangePlan`` as one history item."""
@@ -35,8 +139,12 @@ class HistoryManager:
             raise ValueError("Only a successfully applied change plan can enter history.")
         if not getattr(plan, "sealed", False):
             raise ValueError("History plans must be immutable.")
+        if self.store is not None:
+            plan = self._store_call(self.store.record, plan) or plan
         self.undo_stack.append(plan)
         self.redo_stack.clear()
+        self._enforce_retention()
+        self._enforce_budget()
 
     def can_undo(self):
         return len(self.undo_stack) > 0
@@ -57,6 +165,9 @@ class HistoryManager:
         if not self.undo_stack or self.undo_stack[-1] is not entry:
             return False
         self.redo_stack.append(self.undo_stack.pop())
+        if self.store is not None:
+            self._store_call(self.store.undone)
+            self._refill()
         return True
 
     def commit_redo(self, entry):
@@ -64,23 +175,56 @@ class HistoryManager:
         if not self.redo_stack or self.redo_stack[-1] is not entry:
             return False
         self.undo_stack.append(self.redo_stack.pop())
+        if self.store is not None:
+            self._store_call(self.store.redone)
+            self._refill()
         return True
 
     def pop_undo(self):
         """Legacy eager stack movement; prefer ``peek_undo``/``commit_undo``."""
-        if self.undo_stack:
-            entry = self.undo_stack.pop()
-            self.redo_stack.append(entry)
-            return entry
-        return None
+        entry = self.peek_undo()
+        if entry is not None:
+            self.commit_undo(entry)
+        return entry
 
     def pop_redo(self):
         """Legacy eager stack movement; prefer ``peek_redo``/``commit_redo``."""
-        if self.redo_stack:
-            entry = self.redo_stack.pop()
-            self.undo_stack.append(entry)
-            return entry
-        return None
+        entry = self.peek_redo()
+        if entry is not None:
+            self.commit_redo(entry)
+        return entry
+
+    def merge_undo(self, count=None, label=None):
+        """Merge the newest *count* undo plans (default: all) into one entry.
+
+        Merging stops at the first legacy item. The merged plan keeps each
+        value's original state and final state only, so undoing a whole
+        session writes each value at most once. Returns the merged plan, or
+        ``None`` if fewer than two plans could be merged.
+        """
+        entries = []
+        for entry in reversed(self.undo_stack):
+            if (count is not None and len(entries) >= count) or not hasattr(entry, "changes"):
+                break
+            entries.append(entry)
+        if len(entries) < 2:
+            return None
+        entries.reverse()
+        merged = merge_plans(
+            [entry.load() if isinstance(entry, StoredPlan) else entry for entry in entries], label
+        )
+        for _ in entries:
+            self.undo_stack.pop()
+        # A session that ended where it began leaves nothing to undo.
+        kept = merged if merged.changes else None
+        if self.store is not None:
+            kept = self._store_call(self.store.merge, len(entries), kept) or kept
+            self._refill()
+        if kept is not None:
+            self.undo_stack.append(kept)
+        self._enforce_retention()
+        self._enforce_budget()
+        return merged
 
     def get_history(self):
         """Return full history list (most recent first)."""
@@ -0,0 +1,491 @@
+"""Disk-backed, append-only history of applied change plans.
+
+A history directory holds two files:
+
+* ``plans-<generation>.rmh``: every recorded plan, appended once in the
+  binary plan format (see ``plan_format``).
+* ``index.bin``: a header, then an append-only log of fixed-size
+  operations: record, undo, redo, merge and trim.
+
+History is a list of plans with a cursor: plans before the cursor can be
+undone, plans after it redone. Startup replays the operation log into two
+compact arrays of payload offsets and lengths, so it reads no plan data and
+stays fast with tens of thousands of plans. Moving the cursor appends one
+17-byte operation. Payloads are read only when a plan is undone, redone or
+summarized, and a small LRU keeps the plans loaded last. Once dead payloads
+(cleared redo plans, merged and trimmed plans) outweigh live ones, both
+files are rewritten under a new generation; the index is replaced
+atomically, so a crash leaves either the old or the new history.
+
+A store holds an exclusive lock on ``index.lock`` until it is closed, so
+two processes never interleave index appends; a second process gets
+``FileLockError``. The lock lives in its own file because compaction
+replaces ``index.bin``.
+"""
+
+from __future__ import annotations
+
+import io
+import os
+import struct
+import threading
+import weakref
+from array import array
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+
+from change_manager import ChangeClassification
+from file_lock import FileLock
+from plan_format import FORMAT_BINARY, PlanFormatError, dump_plan, iter_plan, read_plan
+
+
+INDEX_MAGIC = b"RMHIST\0"
+INDEX_VERSION = 1
+INDEX_NAME = "index.bin"
+LOCK_NAME = "index.lock"
+
+_INDEX_HEADER = struct.Struct("<7sBI")  # magic, version, data generation
+_OPERATION = struct.Struct("<BQII")  # op, payload offset, payload length, count
+
+_OP_RECORD = 1
+_OP_UNDO = 2
+_OP_REDO = 3
+_OP_MERGE = 4
+_OP_TRIM = 5
+
+# Dead payload bytes tolerated before compaction, at least.
+COMPACT_MIN_BYTES = 1 << 20
+_HEADER_READ = 4096
+
+
+class HistoryStoreError(ValueError):
+    """Raised when the history index is not a Registry Manager history."""
+
+
+class StoredPlan:
+    """One recorded plan; its changes are read from disk on demand.
+
+    Offers the parts of the ``ChangePlan`` interface that history uses:
+    ``label``, ``created_at`` and ``counts`` come from the payload header
+    alone, while ``changes`` and the inverse/forward plans load the plan.
+    """
+
+    __slots__ = ("_store", "offset", "length", "_header", "__weakref__")
+
+    sealed = True
+    applied_successfully = True
+
+    def __init__(self, store, offset, length):
+        self._store = store
+        self.offset = offset
+        self.length = length
+        self._header = None
+
+    def _summary(self):
+        if self._header is None:
+            self._header = self._store._read_header(self)
+        return self._header
+
+    @property
+    def label(self):
+        return self._summary().get("label", "Registry changes")
+
+    @property
+    def created_at(self):
+        return self._summary().get("created_at", "")
+
+    @property
+    def counts(self):
+        stored = self._summary().get("counts") or {}
+        return {classification: stored.get(classification.value, 0) for classification in ChangeClassification}
+
+    def load(self):
+        """Return the recorded ``ChangePlan``, applied and sealed."""
+        return self._store.load(self)
+
+    @property
+    def changes(self):
+        return self.load().changes
+
+    def create_inverse_plan(self, label=None):
+        return self.load().create_inverse_plan(label)
+
+    def create_forward_plan(self, label=None):
+        return self.load().create_forward_plan(label)
+
+
+class HistoryStore:
+    """The on-disk history of one handler's plans; see the module docstring."""
+
+    def __init__(self, directory, handler, cache_size=16, max_cache_bytes=None):
+        self.directory = Path(directory)
+        self.handler = handler
+        self.cache_size = max(1, cache_size)
+        # Optional bound on the snapshot bytes of loaded plans; evicted
+        # plans are simply read from disk again.
+        self.max_cache_bytes = max_cache_bytes
+        self._lock = threading.RLock()
+        self._cache = OrderedDict()
+        self._cache_bytes = 0
+        # Issued entries, so compaction can move them with their payloads.
+        self._entries = weakref.WeakSet()
+        self._offsets = array("Q")
+        self._lengths = array("I")
+        self._cursor = 0
+        self._live_bytes = 0
+        self._operations = 0
+        self._data = None
+        self._index = None
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._file_lock = FileLock(self.directory / LOCK_NAME).acquire()
+        try:
+            self._open()
+        except BaseException:
+            self.close()
+            raise
+
+    # --- Files ---
+
+    def _data_path(self, generation):
+        return self.directory / f"plans-{generation}.rmh"
+
+    def _open(self):
+        index_path = self.directory / INDEX_NAME
+        try:
+            with open(index_path, "rb") as stream:
+                raw = stream.read()
+        except FileNotFoundError:
+            raw = b""
+        if raw:
+            if len(raw) < _INDEX_HEADER.size:
+                raise HistoryStoreError("The history index is truncated.")
+            magic, version, generation = _INDEX_HEADER.unpack_from(raw)
+            if magic != INDEX_MAGIC:
+                raise HistoryStoreError("Not a Registry Manager history index.")
+            if version != INDEX_VERSION:
+                raise HistoryStoreError(f"Unsupported history index version: {version}")
+        else:
+            generation = 0
+            raw = _INDEX_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, generation)
+            with open(index_path, "wb") as stream:
+                stream.write(raw)
+
+        self.generation = generation
+        data_path = self._data_path(generation)
+        self._data = open(data_path, "a+b")
+        self._data.seek(0, os.SEEK_END)
+        data_size = self._data.tell()
+        valid = self._replay(raw, data_size)
+
+        # A crash can leave a torn operation; keep the valid prefix. The data
+        # file is never cut here: dead records earlier in the log still point
+        # into it, and a torn payload is only dead space until compaction.
+        self._index = open(index_path, "r+b")
+        self._index.truncate(valid)
+        self._index.seek(valid)
+        for stale in self.directory.glob("plans-*.rmh"):
+            if stale != data_path:
+                try:
+                    stale.unlink()
+                except OSError:
+                    pass
+
+    def _replay(self, raw, data_size):
+        """Rebuild the cursor and arrays; returns the valid index length."""
+        position = _INDEX_HEADER.size
+        offsets, lengths = self._offsets, self._lengths
+        cursor = 0
+        operations = 0
+        limit = position + (len(raw) - position) // _OPERATION.size * _OPERATION.size
+        for op, offset, length, count in _OPERATION.iter_unpack(raw[position:limit]):
+            if op in (_OP_RECORD, _OP_MERGE) and length and offset + length > data_size:
+                break  # The payload never reached the disk.
+            if op == _OP_RECORD:
+                del offsets[cursor:]
+                del lengths[cursor:]
+                offsets.append(offset)
+                lengths.append(length)
+                cursor += 1
+            elif op == _OP_UNDO and cursor > 0:
+                cursor -= 1
+            elif op == _OP_REDO and cursor < len(offsets):
+                cursor += 1
+            elif op == _OP_MERGE and count <= cursor:
+                start = cursor - count
+                del offsets[start:cursor]
+                del lengths[start:cursor]
+                cursor = start
+                if length:
+                    offsets.insert(start, offset)
+                    lengths.insert(start, length)
+                    cursor += 1
+            elif op == _OP_TRIM and count <= cursor:
+                del offsets[:count]
+                del lengths[:count]
+                cursor -= count
+            elif op not in (_OP_UNDO, _OP_REDO):
+                break
+            position += _OPERATION.size
+            operations += 1
+        self._cursor = cursor
+        self._live_bytes = sum(lengths)
+        self._operations = operations
+        return position
+
+    def _append_operation(self, op, offset=0, length=0, count=0):
+        self._index.write(_OPERATION.pack(op, offset, length, count))
+        self._index.flush()
+        self._operations += 1
+
+    def _append_payload(self, plan):
+        buffer = io.BytesIO()
+        dump_plan(plan, buffer, FORMAT_BINARY)
+        payload = buffer.getbuffer()
+        self._data.seek(0, os.SEEK_END)
+        offset = self._data.tell()
+        self._data.write(payload)
+        # The payload must be on disk before any operation refers to it.
+        self._data.flush()
+        os.fsync(self._data.fileno())
+        return offset, len(payload)
+
+    def _read_payload(self, offset, length):
+        with self._lock:
+            self._data.seek(offset)
+            payload = self._data.read(length)
+        if len(payload) != length:
+            raise PlanFormatError("A history plan ends early.")
+        return payload
+
+    def _read_header(self, entry):
+        # Headers are small; only a plan with an unusually long label needs
+        # its whole payload read.
+        head = self._read_payload(entry.offset, min(entry.length, _HEADER_READ))
+        try:
+            header, _ = iter_plan(io.BytesIO(head))
+        except PlanFormatError:
+            header, _ = iter_plan(io.BytesIO(self._read_payload(entry.offset, entry.length)))
+        return header
+
+    # --- Stack state ---
+
+    @property
+    def undo_count(self):
+        return self._cursor
+
+    @property
+    def redo_count(self):
+        return len(self._offsets) - self._cursor
+
+    @property
+    def live_bytes(self):
+        return self._live_bytes
+
+    def _entry(self, index):
+        entry = StoredPlan(self, self._offsets[index], self._lengths[index])
+        self._entries.add(entry)
+        return entry
+
+    def undo_entries(self, limit):
+        """Return up to *limit* of the newest undoable plans, oldest first."""
+        with self._lock:
+            start = max(0, self._cursor - limit)
+            return [self._entry(index) for index in range(start, self._cursor)]
+
+    def redo_entries(self, limit):
+        """Return up to *limit* redoable plans, in redo-stack order (next last)."""
+        with self._lock:
+            stop = min(len(self._offsets), self._cursor + limit)
+            return [self._entry(index) for index in reversed(range(self._cursor, stop))]
+
+    def expired_count(self, cutoff):
+        """Number of the oldest undoable plans created before *cutoff*.
+
+        Reads one header per expired plan, plus the first one kept.
+        """
+        with self._lock:
+            count = 0
+            while count < self._cursor:
+                try:
+                    created = datetime.fromisoformat(self._entry(count).created_at)
+                    if created >= cutoff:
+                        break
+                except (TypeError, ValueError):
+                    break
+                count += 1
+            return count
+
+    def load(self, entry):
+        key = (entry.offset, entry.length)
+        with self._lock:
+            plan = self._cache.get(key)
+            if plan is not None:
+                self._cache.move_to_end(key)
+                return plan
+        plan = read_plan(io.BytesIO(self._read_payload(entry.offset, entry.length)), self.handler)
+        with self._lock:
+            self._remember(key, plan)
+        return plan
+
+    @property
+    def cached_bytes(self):
+        """Snapshot bytes of the plans currently held in memory."""
+        return self._cache_bytes
+
+    def _remember(self, key, plan):
+        if key not in self._cache:
+            self._cache_bytes += plan.payload_bytes
+        self._cache[key] = plan
+        self._cache.move_to_end(key)
+        self.trim_cache()
+
+    def trim_cache(self):
+        """Drop least recently used plans beyond the count and byte limits.
+
+        The plan used last is always kept.
+        """
+        with self._lock:
+            while len(self._cache) > 1 and (
+                len(self._cache) > self.cache_size
+                or (self.max_cache_bytes is not None and self._cache_bytes > self.max_cache_bytes)
+            ):
+                _, plan = self._cache.popitem(last=False)
+                self._cache_bytes -= plan.payload_bytes
+
+    # --- Operations ---
+
+    def record(self, plan):
+        """Append an applied plan; it becomes the next undo and clears redo."""
+        with self._lock:
+            offset, length = self._append_payload(plan)
+            self._append_operation(_OP_RECORD, offset, length)
+            self._live_bytes += length - sum(self._lengths[self._cursor:])
+            del self._offsets[self._cursor:]
+            del self._lengths[self._cursor:]
+            self._offsets.append(offset)
+            self._lengths.append(length)
+            self._cursor += 1
+            self._remember((offset, length), plan)
+            entry = self._entry(self._cursor - 1)
+            self._maybe_compact()
+        return entry
+
+    def undone(self):
+        """Note that the newest undoable plan was undone."""
+        with self._lock:
+            if self._cursor == 0:
+                raise IndexError("Nothing to undo in the history store.")
+            self._append_operation(_OP_UNDO)
+            self._cursor -= 1
+
+    def redone(self):
+        """Note that the next redoable plan was redone."""
+        with self._lock:
+            if self._cursor == len(self._offsets):
+                raise IndexError("Nothing to redo in the history store.")
+            self._append_operation(_OP_REDO)
+            self._cursor += 1
+
+    def merge(self, count, plan):
+        """Replace the newest *count* undoable plans with *plan*, or drop them.
+
+        Returns the new entry, or ``None`` when *plan* is ``None``.
+        """
+        with self._lock:
+            if not 0 < count <= self._cursor:
+                raise IndexError("Cannot merge more plans than can be undone.")
+            offset = length = 0
+            if plan is not None:
+                offset, length = self._append_payload(plan)
+            self._append_operation(_OP_MERGE, offset, length, count)
+            start = self._cursor - count
+            self._live_bytes += length - sum(self._lengths[start:self._cursor])
+            del self._offsets[start:self._cursor]
+            del self._lengths[start:self._cursor]
+            self._cursor = start
+            entry = None
+            if plan is not None:
+                self._offsets.insert(start, offset)
+                self._lengths.insert(start, length)
+                self._cursor += 1
+                self._remember((offset, length), plan)
+                entry = self._entry(start)
+            self._maybe_compact()
+        return entry
+
+    def trim(self, count):
+        """Forget the *count* oldest undoable plans."""
+        with self._lock:
+            if not 0 <= count <= self._cursor:
+                raise IndexError("Cannot trim more plans than can be undone.")
+            if count:
+                self._append_operation(_OP_TRIM, count=count)
+                self._live_bytes -= sum(self._lengths[:count])
+                del self._offsets[:count]
+                del self._lengths[:count]
+                self._cursor -= count
+                self._maybe_compact()
+
+    # --- Compaction ---
+
+    def _maybe_compact(self):
+        self._data.seek(0, os.SEEK_END)
+        dead = self._data.tell() - self._live_bytes
+        if dead > max(self._live_bytes, COMPACT_MIN_BYTES) or self._operations > 4 * len(self._offsets) + 4096:
+            self.compact()
+
+    def compact(self):
+        """Rewrite both files with only live plans, under a new generation."""
+        with self._lock:
+            generation = self.generation + 1
+            data_path = self._data_path(generation)
+            offsets = array("Q")
+            operations = bytearray(_INDEX_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, generation))
+            with open(data_path, "wb") as data:
+                for offset, length in zip(self._offsets, self._lengths):
+                    offsets.append(data.tell())
+                    data.write(self._read_payload(offset, length))
+                    operations += _OPERATION.pack(_OP_RECORD, offsets[-1], length, 0)
+                operations += _OPERATION.pack(_OP_UNDO, 0, 0, 0) * self.redo_count
+                data.flush()
+                os.fsync(data.fileno())
+
+            index_path = self.directory / INDEX_NAME
+            temp_path = index_path.with_suffix(".tmp")
+            with open(temp_path, "wb") as index:
+                index.write(operations)
+                index.flush()
+                os.fsync(index.fileno())
+            self._index.close()
+            self._data.close()
+            os.replace(temp_path, index_path)
+            try:
+                self._data_path(self.generation).unlink()
+            except OSError:
+                pass
+
+            self.generation = generation
+            self._data = open(data_path, "a+b")
+            self._index = open(index_path, "r+b")
+            self._index.seek(0, os.SEEK_END)
+            moved = dict(zip(self._offsets, offsets))
+            for entry in list(self._entries):
+                if entry.offset in moved:
+                    entry.offset = moved[entry.offset]
+            self._cache = OrderedDict(
+                ((moved[offset], length), plan)
+                for (offset, length), plan in self._cache.items()
+                if offset in moved
+            )
+            self._cache_bytes = sum(plan.payload_bytes for plan in self._cache.values())
+            self._offsets = offsets
+            self._operations = len(self._offsets) + self.redo_count
+
+    def close(self):
+        with self._lock:
+            for stream in (self._index, self._data):
+                if stream is not None:
+                    stream.close()
+            self._index = self._data = None
+            self._file_lock.release()
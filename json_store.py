@@ -0,0 +1,112 @@
+"""Atomic JSON files shared by the preset and favorites stores.
+
+Registry data is JSON plus ``bytes``: binary values are written as
+``{BYTES_MARKER: "<base64>"}`` through the serializer's ``default`` hook,
+and read back with one ``object_hook``, so neither direction walks the
+tree in Python. Output is compact UTF-8.
+
+Serializers are pluggable: anything with ``dumps(value) -> bytes`` and
+``loads(data)`` works. ``orjson`` is used for writing when installed; the
+standard library is the fallback and is always used for reading, since
+only it offers an object hook.
+"""
+
+from __future__ import annotations
+
+import base64
+import json
+import os
+import tempfile
+
+try:
+    import orjson
+except ImportError:  # Optional: only speeds up writing.
+    orjson = None
+
+
+BYTES_MARKER = "__registry_manager_bytes_v1_7a0c8f39_5ef4_4e50_9e62_8df2bfeb1702__"
+
+
+def _encode_default(value):
+    if isinstance(value, bytes):
+        return {BYTES_MARKER: base64.b64encode(value).decode("ascii")}
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _decode_object(obj):
+    """Restore tagged bytes while leaving legacy JSON unchanged."""
+    if len(obj) == 1 and isinstance(obj.get(BYTES_MARKER), str):
+        return base64.b64decode(obj[BYTES_MARKER], validate=True)
+    return obj
+
+
+class JsonSerializer:
+    """Standard-library serializer."""
+
+    name = "json"
+
+    def dumps(self, value):
+        text = json.dumps(value, default=_encode_default, ensure_ascii=False, separators=(",", ":"))
+        return text.encode("utf-8")
+
+    def loads(self, data):
+        return json.loads(data, object_hook=_decode_object)
+
+
+class OrjsonSerializer(JsonSerializer):
+    """Writes with ``orjson``; reads like ``JsonSerializer``."""
+
+    name = "orjson"
+
+    def dumps(self, value):
+        return orjson.dumps(value, default=_encode_default)
+
+
+def default_serializer():
+    return OrjsonSerializer() if orjson is not None else JsonSerializer()
+
+
+def load_json(path, expected_type, serializer=None):
+    """Return the data in *path*, or an empty *expected_type* if it is
+    missing, unreadable, or holds a different top-level type."""
+    if not os.path.exists(path):
+        return expected_type()
+    serializer = serializer or default_serializer()
+    try:
+        with open(path, "rb") as stream:
+            data = serializer.loads(stream.read())
+    except (UnicodeDecodeError, ValueError):
+        return expected_type()
+    return data if isinstance(data, expected_type) else expected_type()
+
+
+def atomic_write_json(path, data, serializer=None):
+    """Serialize fully, then atomically replace *path* from the same directory."""
+    serialized = (serializer or default_serializer()).dumps(data) + b"\n"
+
+    target_path = os.path.abspath(os.fspath(path))
+    parent_dir = os.path.dirname(target_path)
+    os.makedirs(parent_dir, exist_ok=True)
+
+    temp_path = None
+    try:
+        with tempfile.NamedTemporaryFile(
+            mode="wb",
+            dir=parent_dir,
+            prefix=f".{os.path.basename(target_path)}.",
+            suffix=".tmp",
+            delete=False,
+        ) as temp_file:
+            temp_path = temp_file.name
+            temp_file.write(serialized)
+            temp_file.flush()
+            os.fsync(temp_file.fileno())
+
+        os.replace(temp_path, target_path)
+        temp_path = None
+    finally:
+        if temp_path is not None:
+            try:
+                os.unlink(temp_path)
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,431 @@
+"""Versioned, streamable files for saving, shipping and replaying change plans.
+
+Two encodings carry the same content: a header (label, creation time and
+whether the plan was applied) followed by one record per change.
+
+* Binary: ``MAGIC`` and a version byte, then length-prefixed records; the
+  header record is UTF-8 JSON and each change is packed with ``struct``.
+  A large REG_BINARY or REG_MULTI_SZ after-snapshot that mostly repeats its
+  before-snapshot is stored as a copy/insert delta (see ``value_delta``)
+  and rebuilt when the record is read.
+* JSON lines: a header object, then one ``[hive, hive_name, path, name,
+  before, after]`` array per line.
+
+Both round-trip every snapshot exactly: missing values, ``None`` data,
+``bytes``, integers of any size, and REG_MULTI_SZ tuples. Writers and
+readers handle one change at a time, so large plans use linear time and
+little memory. ``load_plan`` restores a plan as recorded, for review or
+undo; ``replay_plan`` re-plans the recorded end state against another
+registry, with fresh before-snapshots. Version 2 added deltas; version 1
+files still load.
+"""
+
+from __future__ import annotations
+
+import base64
+import json
+import os
+import struct
+
+import value_delta
+from change_manager import ChangePlan, PlannedChange, ValueSnapshot
+
+
+FORMAT_VERSION = 2
+READABLE_VERSIONS = (1, 2)
+FORMAT_BINARY = "binary"
+FORMAT_JSON = "json"
+MAGIC = b"RMPLAN\0"
+JSON_FORMAT_NAME = "registry-manager-plan"
+
+_U8 = struct.Struct("<B")
+_U32 = struct.Struct("<I")
+_CHANGE_HEAD = struct.Struct("<I")
+_SNAPSHOT_HEAD = struct.Struct("<BI")
+
+# Data tags of an existing snapshot in the binary encoding.
+_DATA_NONE = 0
+_DATA_STR = 1
+_DATA_INT = 2
+_DATA_BYTES = 3
+_DATA_STRINGS = 4
+_DATA_BYTES_DELTA = 5
+_DATA_STRINGS_DELTA = 6
+
+_MISSING = ValueSnapshot.missing()
+
+
+class PlanFormatError(ValueError):
+    """Raised for unreadable plan files or data that cannot be encoded."""
+
+
+# --- JSON encoding, shared with the change journal ---
+
+def _encode_data(value):
+    if isinstance(value, bytes):
+        return {"b": base64.b64encode(value).decode("ascii")}
+    if isinstance(value, tuple):
+        return [_encode_data(item) for item in value]
+    return value
+
+
+def _decode_data(value):
+    if isinstance(value, dict):
+        return base64.b64decode(value["b"])
+    if isinstance(value, list):
+        return tuple(_decode_data(item) for item in value)
+    return value
+
+
+def encode_snapshot(snapshot):
+    """Return a JSON-safe form of a ``ValueSnapshot``; ``None`` if missing."""
+    if not snapshot.exists:
+        return None
+    return [snapshot.value_type, _encode_data(snapshot.value)]
+
+
+def decode_snapshot(encoded):
+    if encoded is None:
+        return _MISSING
+    value_type, data = encoded
+    return ValueSnapshot(True, _decode_data(data), value_type)
+
+
+def encode_change(change):
+    return [
+        change.hive, change.hive_name, change.path, change.name,
+        encode_snapshot(change.before), encode_snapshot(change.after),
+    ]
+
+
+def decode_change(encoded):
+    hive, hive_name, path, name, before, after = encoded
+    return PlannedChange(hive, hive_name, path, name, decode_snapshot(before), decode_snapshot(after))
+
+
+# --- Binary encoding ---
+
+def _pack_text(out, text):
+    encoded = text.encode("utf-8", "surrogatepass")
+    out += _U32.pack(len(encoded))
+    out += encoded
+
+
+def _pack_strings(out, strings):
+    out += _U32.pack(len(strings))
+    for item in strings:
+        _pack_text(out, item)
+
+
+def _pack_delta(out, ops):
+    out += _U32.pack(len(ops))
+    for op in ops:
+        if op[0] == value_delta.COPY:
+            out += _U8.pack(op[0]) + _U32.pack(op[1]) + _U32.pack(op[2])
+        elif isinstance(op[1], bytes):
+            out += _U8.pack(op[0]) + _U32.pack(len(op[1]))
+            out += op[1]
+        else:
+            out += _U8.pack(op[0])
+            _pack_strings(out, op[1])
+
+
+def _pack_snapshot(out, snapshot, base=None):
+    """Pack *snapshot*, as a delta against *base*'s data when that is smaller."""
+    if not snapshot.exists:
+        out += _U8.pack(0)
+        return
+    value = snapshot.value
+    out += _SNAPSHOT_HEAD.pack(1, snapshot.value_type)
+    is_strings = isinstance(value, tuple) and all(isinstance(item, str) for item in value)
+    if base is not None and base.exists and (isinstance(value, bytes) or is_strings):
+        ops = value_delta.diff(base.value, value)
+        if ops is not None:
+            out += _U8.pack(_DATA_BYTES_DELTA if isinstance(value, bytes) else _DATA_STRINGS_DELTA)
+            _pack_delta(out, ops)
+            return
+    if value is None:
+        out += _U8.pack(_DATA_NONE)
+    elif isinstance(value, str):
+        out += _U8.pack(_DATA_STR)
+        _pack_text(out, value)
+    elif isinstance(value, int):
+        size = (value.bit_length() + 8) // 8
+        out += _U8.pack(_DATA_INT) + _U8.pack(size) + value.to_bytes(size, "little", signed=True)
+    elif isinstance(value, bytes):
+        out += _U8.pack(_DATA_BYTES) + _U32.pack(len(value))
+        out += value
+    elif is_strings:
+        out += _U8.pack(_DATA_STRINGS)
+        _pack_strings(out, value)
+    else:
+        raise PlanFormatError(f"Cannot encode registry data of type {type(value).__name__}.")
+
+
+def _pack_change(change):
+    out = bytearray(_CHANGE_HEAD.pack(change.hive))
+    _pack_text(out, change.hive_name)
+    _pack_text(out, change.path)
+    _pack_text(out, change.name)
+    _pack_snapshot(out, change.before)
+    _pack_snapshot(out, change.after, change.before)
+    return out
+
+
+class _Reader:
+    """Cursor over one binary record."""
+
+    __slots__ = ("data", "offset")
+
+    def __init__(self, data):
+        self.data = data
+        self.offset = 0
+
+    def unpack(self, layout):
+        values = layout.unpack_from(self.data, self.offset)
+        self.offset += layout.size
+        return values
+
+    def take(self, size):
+        end = self.offset + size
+        if end > len(self.data):
+            raise PlanFormatError("Plan record ends early.")
+        chunk = self.data[self.offset:end]
+        self.offset = end
+        return chunk
+
+    def text(self):
+        (size,) = self.unpack(_U32)
+        return self.take(size).decode("utf-8", "surrogatepass")
+
+    def strings(self):
+        (count,) = self.unpack(_U32)
+        return tuple(self.text() for _ in range(count))
+
+    def delta(self, base, kind):
+        if not base.exists or not isinstance(base.value, kind):
+            raise PlanFormatError("Plan record has a delta without a matching base value.")
+        (count,) = self.unpack(_U32)
+        ops = []
+        for _ in range(count):
+            (op,) = self.unpack(_U8)
+            if op == value_delta.COPY:
+                (start,) = self.unpack(_U32)
+                (length,) = self.unpack(_U32)
+                ops.append((op, start, length))
+            elif kind is bytes:
+                (size,) = self.unpack(_U32)
+                ops.append((op, bytes(self.take(size))))
+            else:
+                ops.append((op, self.strings()))
+        try:
+            return value_delta.patch(base.value, ops)
+        except ValueError as exc:
+            raise PlanFormatError(f"Damaged plan delta: {exc}") from None
+
+    def snapshot(self, base=None):
+        (exists,) = self.unpack(_U8)
+        if not exists:
+            return _MISSING
+        (value_type,) = self.unpack(_U32)
+        (tag,) = self.unpack(_U8)
+        if tag == _DATA_NONE:
+            value = None
+        elif tag == _DATA_STR:
+            value = self.text()
+        elif tag == _DATA_INT:
+            (size,) = self.unpack(_U8)
+            value = int.from_bytes(self.take(size), "little", signed=True)
+        elif tag == _DATA_BYTES:
+            (size,) = self.unpack(_U32)
+            value = bytes(self.take(size))
+        elif tag == _DATA_STRINGS:
+            value = self.strings()
+        elif tag == _DATA_BYTES_DELTA and base is not None:
+            value = self.delta(base, bytes)
+        elif tag == _DATA_STRINGS_DELTA and base is not None:
+            value = self.delta(base, tuple)
+        else:
+            raise PlanFormatError(f"Unknown data tag {tag} in plan record.")
+        return ValueSnapshot(True, value, value_type)
+
+
+def _unpack_change(record):
+    reader = _Reader(record)
+    try:
+        (hive,) = reader.unpack(_CHANGE_HEAD)
+        hive_name, path, name = reader.text(), reader.text(), reader.text()
+        before = reader.snapshot()
+        after = reader.snapshot(before)
+    except (struct.error, UnicodeDecodeError) as exc:
+        raise PlanFormatError(f"Damaged plan record: {exc}") from None
+    if reader.offset != len(record):
+        raise PlanFormatError("Plan record has trailing data.")
+    return PlannedChange(hive, hive_name, path, name, before, after)
+
+
+def _read_record(stream):
+    prefix = stream.read(_U32.size)
+    if not prefix:
+        return None
+    if len(prefix) < _U32.size:
+        raise PlanFormatError("Plan file ends inside a record length.")
+    (size,) = _U32.unpack(prefix)
+    record = stream.read(size)
+    if len(record) < size:
+        raise PlanFormatError("Plan file ends inside a record.")
+    return record
+
+
+# --- Public API ---
+
+def _header(plan):
+    return {
+        "format": JSON_FORMAT_NAME,
+        "version": FORMAT_VERSION,
+        "label": plan.label,
+        "created_at": plan.created_at,
+        "applied": plan.applied_successfully,
+        # Lets a reader summarize the plan without decoding its changes.
+        "counts": {classification.value: count for classification, count in plan.counts.items()},
+    }
+
+
+def dump_plan(plan, stream, fmt=FORMAT_BINARY):
+    """Write *plan* to a binary *stream*; returns the number of changes."""
+    header = _header(plan)
+    count = 0
+    if fmt == FORMAT_BINARY:
+        encoded = json.dumps(header, ensure_ascii=False).encode("utf-8")
+        stream.write(MAGIC + _U8.pack(FORMAT_VERSION) + _U32.pack(len(encoded)) + encoded)
+        for change in plan.changes:
+            record = _pack_change(change)
+            stream.write(_U32.pack(len(record)))
+            stream.write(record)
+            count += 1
+    elif fmt == FORMAT_JSON:
+        stream.write(json.dumps(header, ensure_ascii=False).encode("utf-8") + b"\n")
+        for change in plan.changes:
+            # ASCII escapes keep lone surrogates in registry names exact.
+            line = json.dumps(encode_change(change), separators=(",", ":"))
+            stream.write(line.encode("ascii") + b"\n")
+            count += 1
+    else:
+        raise PlanFormatError(f"Unknown plan format: {fmt}")
+    return count
+
+
+def _format_for(filepath):
+    return FORMAT_JSON if os.fspath(filepath).lower().endswith((".json", ".jsonl")) else FORMAT_BINARY
+
+
+def save_plan(plan, filepath, fmt=None):
+    """Write *plan* to *filepath*; ``.json``/``.jsonl`` files use JSON lines."""
+    with open(filepath, "wb", buffering=1 << 20) as stream:
+        return dump_plan(plan, stream, fmt or _format_for(filepath))
+
+
+def _check_header(header):
+    if not isinstance(header, dict) or header.get("format") != JSON_FORMAT_NAME:
+        raise PlanFormatError("Not a Registry Manager plan file.")
+    if header.get("version") not in READABLE_VERSIONS:
+        raise PlanFormatError(f"Unsupported plan format version: {header.get('version')}")
+    return header
+
+
+def iter_plan(stream):
+    """Return ``(header, changes)`` for a plan stream in either encoding.
+
+    *changes* is a generator that decodes one ``PlannedChange`` at a time.
+    """
+    start = stream.read(len(MAGIC))
+    if start == MAGIC:
+        version = stream.read(1)
+        if not version or version[0] not in READABLE_VERSIONS:
+            raise PlanFormatError(f"Unsupported plan format version: {version[0] if version else None}")
+        record = _read_record(stream)
+        try:
+            header = _check_header(json.loads(record or b""))
+        except ValueError as exc:
+            raise PlanFormatError(f"Damaged plan header: {exc}") from None
+
+        def changes():
+            while (record := _read_record(stream)) is not None:
+                yield _unpack_change(record)
+
+        return header, changes()
+
+    first_line = start + stream.readline()
+    try:
+        header = _check_header(json.loads(first_line))
+    except (ValueError, UnicodeDecodeError):
+        raise PlanFormatError("Not a Registry Manager plan file.") from None
+
+    def json_changes():
+        for number, line in enumerate(stream, 2):
+            if not line.strip():
+                continue
+            try:
+                yield decode_change(json.loads(line))
+            except (ValueError, TypeError, KeyError) as exc:
+                raise PlanFormatError(f"Damaged plan record at line {number}: {exc}") from None
+
+    return header, json_changes()
+
+
+def read_plan(stream, handler):
+    """Rebuild a plan from a stream written by ``dump_plan``, against *handler*."""
+    header, changes = iter_plan(stream)
+    plan = ChangePlan.from_changes(
+        handler, header.get("label", "Registry changes"), changes,
+        applied=bool(header.get("applied")),
+    )
+    if header.get("created_at"):
+        plan.created_at = header["created_at"]
+    return plan
+
+
+def load_plan(filepath, handler):
+    """Rebuild the saved plan exactly, against *handler*.
+
+    A plan saved after it applied comes back applied, so its undo and redo
+    plans can be created as from the live plan.
+    """
+    with open(filepath, "rb", buffering=1 << 20) as stream:
+        return read_plan(stream, handler)
+
+
+def replay_plan(filepath, handler, label=None):
+    """Plan the saved end state afresh against *handler*.
+
+    Only the recorded after-snapshots are kept. Before-snapshots are read
+    from *handler*'s registry, one read per key, so the result previews
+    and conflict-checks like any locally built plan.
+    """
+    with open(filepath, "rb", buffering=1 << 20) as stream:
+        header, changes = iter_plan(stream)
+        plan = ChangePlan(handler, label or header.get("label", "Registry changes"), intern_payloads=True)
+        batch = []
+        for change in changes:
+            if batch and (
+                (change.hive, change.path.casefold(), change.after.exists)
+                != (batch[0].hive, batch[0].path.casefold(), batch[0].after.exists)
+            ):
+                _plan_batch(plan, batch)
+                batch = []
+            batch.append(change)
+        if batch:
+            _plan_batch(plan, batch)
+    return plan
+
+
+def _plan_batch(plan, batch):
+    first = batch[0]
+    if first.after.exists:
+        plan.set_values(
+            first.hive, first.path,
+            [(change.name, change.after.value, change.after.value_type) for change in batch],
+            first.hive_name,
+        )
+    else:
+        plan.delete_values(first.hive, first.path, [change.name for change in batch], first.hive_name)
@@ -1,149 +1,137 @@
-import base64
-import json
 import os
-import tempfile
-import winreg
-
-
-_BYTES_MARKER = "__registry_manager_bytes_v1_7a0c8f39_5ef4_4e50_9e62_8df2bfeb1702__"
-
-
-def _encode_json_value(value):
-    """Convert values unsupported by JSON into an unambiguous tagged form."""
-    if isinstance(value, bytes):
-        return {_BYTES_MARKER: base64.b64encode(value).decode("ascii")}
-    if isinstance(value, dict):
-        return {key: _encode_json_value(item) for key, item in value.items()}
-    if isinstance(value, (list, tuple)):
-        return [_encode_json_value(item) for item in value]
-    return value
-
-
-def _decode_json_value(value):
-    """Restore recursively tagged values while leaving legacy JSON unchanged."""
-    if isinstance(value, list):
-        return [_decode_json_value(item) for item in value]
-    if isinstance(value, dict):
-        if set(value) == {_BYTES_MARKER} and isinstance(value[_BYTES_MARKER], str):
-            return base64.b64decode(value[_BYTES_MARKER], validate=True)
-        return {key: _decode_json_value(item) for key, item in value.items()}
-    return value
-
-
-def _atomic_write_json(path, data):
-    """Serialize fully, then atomically replace *path* from the same directory."""
-    encoded = _encode_json_value(data)
-    serialized = json.dumps(encoded, indent=4, ensure_ascii=False) + "\n"
-
-    target_path = os.path.abspath(os.fspath(path))
-    parent_dir = os.path.dirname(target_path)
-    os.makedirs(parent_dir, exist_ok=True)
-
-    temp_path = None
-    try:
-        with tempfile.NamedTemporaryFile(
-            mode="w",
-            encoding="utf-8",
-            newline="\n",
-            dir=parent_dir,
-            prefix=f".{os.path.basename(target_path)}.",
-            suffix=".tmp",
-            delete=False,
-        ) as temp_file:
-            temp_path = temp_file.name
-            temp_file.write(serialized)
-            temp_file.flush()
-            os.fsync(temp_file.fileno())
-
-        os.replace(temp_path, target_path)
-        temp_path = None
-    finally:
-        if temp_path is not None:
-            try:
-                os.unlink(temp_path)
-            except FileNotFoundError:
-                pass
+from collections.abc import Mapping
+
+from json_store import atomic_write_json, load_json
+from preset_store import PresetStore, PresetStoreError, PresetSummary
+from registry_backend import REG_DWORD
+
+
+class _StoredPresets(Mapping):
+    """Read-only view of a ``PresetStore``; values are decoded on access."""
+
+    def __init__(self, store):
+        self._store = store
+
+    def __getitem__(self, name):
+        data = self._store.get(name)
+        if data is None:
+            raise KeyError(name)
+        return data
+
+    def __iter__(self):
+        return iter(self._store.names())
+
+    def __len__(self):
+        return self._store.count()
+
+    def __contains__(self, name):
+        return name in self._store
+
 
 class PresetManager:
-    def __init__(self, presets_file="presets.json"):
+    """Presets kept in ``presets_file``, or in a SQLite store at *db_path*.
+
+    With *db_path*, ``presets_file`` is migrated into the database once and
+    then left untouched, and ``presets`` is a read-only mapping that loads
+    each preset's values only when asked for.
+
+    With ``read_only=True`` nothing is created, migrated or saved: an
+    existing database is opened as it is, otherwise ``presets_file`` is read
+    and missing defaults are only added in memory.
+    """
+
+    def __init__(self, presets_file="presets.json", serializer=None, db_path=None, read_only=False):
         self.presets_file = presets_file
-        self.presets = self.load_presets()
+        self.serializer = serializer
+        self.read_only = read_only
+        self.store = None
+        if db_path is not None and read_only and not os.path.exists(db_path):
+            db_path = None
+        if db_path is not None:
+            self.store = PresetStore(db_path, serializer, read_only=read_only)
+            if not read_only:
+                self.store.migrate_json(presets_file)
+            self.presets = _StoredPresets(self.store)
+        else:
+            self.presets = self.load_presets()
         self.ensure_defaults()
 
     def load_presets(self):
-        if not os.path.exists(self.presets_file):
-            return {}
-        try:
-            with open(self.presets_file, 'r', encoding='utf-8') as f:
-                data = _decode_json_value(json.load(f))
-            return data if isinstance(data, dict) else {}
-        except (json.JSONDecodeError, UnicodeDecodeError, ValueError):
-            return {}
+        return load_json(self.presets_file, dict, self.serializer)
 
     def ensure_defaults(self):
         defaults = {
             "Enable Dark Mode": {
                 "path": r"Software\Microsoft\Windows\CurrentVersion\Themes\Personalize",
                 "values": [
-                    ("AppsUseLightTheme", 0, winreg.REG_DWORD),
-                    ("SystemUsesLightTheme", 0, winreg.REG_DWORD)
+                    ("AppsUseLightTheme", 0, REG_DWORD),
+                    ("SystemUsesLightTheme", 0, REG_DWORD)
                 ]
             },
             "Enable Light Mode": {
                 "path": r"Software\Microsoft\Windows\CurrentVersion\Themes\Personalize",
                 "values": [
-                    ("AppsUseLightTheme", 1, winreg.REG_DWORD),
-                    ("SystemUsesLightTheme", 1, winreg.REG_DWORD)
+                    ("AppsUseLightTheme", 1, REG_DWORD),
+                    ("SystemUsesLightTheme", 1, REG_DWORD)
                 ]
             },
             "Show File Extensions": {
                 "path": r"Software\Microsoft\Windows\CurrentVersion\Explorer\Advanced",
                 "values": [
-                    ("HideFileExt", 0, winreg.REG_DWORD)
+                    ("HideFileExt", 0, REG_DWORD)
                 ]
             },
             "Hide File Extensions": {
                 "path": r"Software\Microsoft\Windows\CurrentVersion\Explorer\Advanced",
                 "values": [
-                    ("HideFileExt", 1, winreg.REG_DWORD)
+                    ("HideFileExt", 1, REG_DWORD)
                 ]
             },
             "Show Hidden Files": {
                 "path": r"Software\Microsoft\Windows\CurrentVersion\Explorer\Advanced",
                 "values": [
-                    ("Hidden", 1, winreg.REG_DWORD)
+                    ("Hidden", 1, REG_DWORD)
                 ]
             },
             "Hide Hidden Files": {
                 "path": r"Software\Microsoft\Windows\CurrentVersion\Explorer\Advanced",
                 "values": [
-                    ("Hidden", 2, winreg.REG_DWORD) # 2 is hidden, 1 is show
+                    ("Hidden", 2, REG_DWORD) # 2 is hidden, 1 is show
                 ]
             },
             "Enable Title Bar Color": {
                 "path": r"Software\Microsoft\Windows\DWM",
                 "values": [
-                    ("ColorPrevalence", 1, winreg.REG_DWORD)
+                    ("ColorPrevalence", 1, REG_DWORD)
                 ]
             },
             "Disable Title Bar Color": {
                 "path": r"Software\Microsoft\Windows\DWM",
                 "values": [
-                    ("ColorPrevalence", 0, winreg.REG_DWORD)
+                    ("ColorPrevalence", 0, REG_DWORD)
                 ]
             }
         }
         
+        if self.store is not None:
+            missing = [(name, data) for name, data in defaults.items() if name not in self.store]
+            if missing and not self.read_only:
+                self.store.save_many(missing, replace=False)
+            return
+
         changed = False
         for name, data in defaults.items():
             if name not in self.presets:
                 self.presets[name] = data
                 changed = True
         
-        if changed:
+        if changed and not self.read_only:
             self._save_to_file()
 
     def save_preset(self, name, data):
+        if self.store is not None:
+            self.store.save(name, data)
+            return
         previous = self.presets.copy()
         self.presets[name] = data
         try:
@@ -154,6 +142,9 @@ class PresetManager:
             raise
 
     def delete_preset(self, name):
+        if self.store is not None:
+            self.store.delete(name)
+            return
         if name in self.presets:
             previous = self.presets.copy()
             del self.presets[name]
@@ -167,5 +158,18 @@ class PresetManager:
     def get_preset(self, name):
         return self.presets.get(name)
 
+    def list_presets(self, offset=0, limit=None):
+        """Return a page of ``PresetSummary`` rows in saved order."""
+        if self.store is not None:
+            return self.store.page(offset, limit)
+        names = list(self.presets)[offset:None if limit is None else offset + limit]
+        return [PresetSummary.of(name, self.presets[name]) for name in names]
+
+    def close(self):
+        if self.store is not None:
+            self.store.close()
+
     def _save_to_file(self):
-        _atomic_write_json(self.presets_file, self.presets)
+        if self.read_only:
+            raise PresetStoreError(f"{self.presets_file} was opened read-only.")
+        atomic_write_json(self.presets_file, self.presets, self.serializer)
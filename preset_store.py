@@ -0,0 +1,199 @@
+"""Transactional SQLite storage for presets, one row per preset.
+
+Each row keeps a preset's name, key path and value count next to its full
+data, encoded with ``json_store`` so bytes round-trip exactly. Listing
+pages through names, paths and counts without decoding any values; a
+preset's values are decoded only when it is fetched. Saving or deleting a
+preset changes one row in one transaction.
+"""
+
+from __future__ import annotations
+
+import os
+import sqlite3
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+
+from json_store import JsonSerializer, default_serializer, load_json
+
+
+SCHEMA_VERSION = "1"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS presets (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    path TEXT NOT NULL,
+    value_count INTEGER NOT NULL,
+    data BLOB NOT NULL
+);
+"""
+
+
+class PresetStoreError(RuntimeError):
+    """Raised when the preset database cannot be opened or updated."""
+
+
+@dataclass(frozen=True)
+class PresetSummary:
+    name: str
+    path: str
+    value_count: int
+
+    @classmethod
+    def of(cls, name, data):
+        path = data.get("path") if isinstance(data, dict) else None
+        values = data.get("values") if isinstance(data, dict) else None
+        return cls(
+            name,
+            path if isinstance(path, str) else "",
+            len(values) if isinstance(values, (list, tuple)) else 0,
+        )
+
+
+def _row(name, data, serializer):
+    summary = PresetSummary.of(name, data)
+    return (name, summary.path, summary.value_count, serializer.dumps(data))
+
+
+class PresetStore:
+    """Presets in a SQLite database, in the order they were first saved."""
+
+    def __init__(self, db_path, serializer=None, read_only=False):
+        self.db_path = os.fspath(db_path)
+        self.serializer = serializer or default_serializer()
+        # Rows are always decoded with the standard library's object hook.
+        self._reader = JsonSerializer()
+        self._lock = threading.Lock()
+        if read_only:
+            self._open_read_only()
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        try:
+            self._conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            # Presets are user data; every commit reaches the disk.
+            self._conn.execute("PRAGMA synchronous=FULL")
+            with self._conn:
+                self._conn.executescript(_SCHEMA)
+                version = self.get_meta("schema_version")
+                if version not in (None, SCHEMA_VERSION):
+                    raise PresetStoreError(f"Unsupported preset schema {version!r} in {self.db_path}.")
+                self.set_meta("schema_version", SCHEMA_VERSION)
+        except sqlite3.Error as exc:
+            raise PresetStoreError(f"Could not open preset database {self.db_path}: {exc}") from exc
+
+    def _open_read_only(self):
+        """Open an existing database without creating or upgrading anything."""
+        uri = Path(self.db_path).resolve().as_uri() + "?mode=ro"
+        try:
+            self._conn = sqlite3.connect(uri, uri=True, timeout=30, check_same_thread=False)
+            version = self.get_meta("schema_version")
+        except sqlite3.Error as exc:
+            raise PresetStoreError(f"Could not open preset database {self.db_path}: {exc}") from exc
+        if version != SCHEMA_VERSION:
+            self._conn.close()
+            raise PresetStoreError(f"Unsupported preset schema {version!r} in {self.db_path}.")
+
+    def get_meta(self, name):
+        row = self._conn.execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, name, value):
+        self._conn.execute(
+            "INSERT INTO meta (name, value) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = excluded.value",
+            (name, str(value)),
+        )
+
+    # --- Reading ---
+
+    def count(self):
+        return self._conn.execute("SELECT COUNT(*) FROM presets").fetchone()[0]
+
+    def names(self):
+        return [name for (name,) in self._conn.execute("SELECT name FROM presets ORDER BY id")]
+
+    def page(self, offset=0, limit=None):
+        """Return ``PresetSummary`` rows without decoding preset values."""
+        rows = self._conn.execute(
+            "SELECT name, path, value_count FROM presets ORDER BY id LIMIT ? OFFSET ?",
+            (-1 if limit is None else limit, offset),
+        )
+        return [PresetSummary(*row) for row in rows]
+
+    def __contains__(self, name):
+        return self._conn.execute("SELECT 1 FROM presets WHERE name = ?", (name,)).fetchone() is not None
+
+    def get(self, name):
+        row = self._conn.execute("SELECT data FROM presets WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            return None
+        try:
+            return self._reader.loads(row[0])
+        except (UnicodeDecodeError, ValueError):
+            return None
+
+    # --- Writing ---
+
+    def save_many(self, items, replace=True):
+        """Save ``(name, data)`` pairs in one transaction.
+
+        Every pair is encoded before anything is written, so an unsupported
+        value raises ``TypeError`` and leaves the store unchanged. With
+        ``replace=False`` existing presets are kept.
+        """
+        rows = [_row(name, data, self.serializer) for name, data in items]
+        conflict = (
+            "DO UPDATE SET path = excluded.path, value_count = excluded.value_count, data = excluded.data"
+            if replace else "DO NOTHING"
+        )
+        with self._lock:
+            try:
+                with self._conn:
+                    self._conn.executemany(
+                        "INSERT INTO presets (name, path, value_count, data) VALUES (?, ?, ?, ?) "
+                        f"ON CONFLICT(name) {conflict}",
+                        rows,
+                    )
+            except sqlite3.Error as exc:
+                raise PresetStoreError(f"Could not save presets: {exc}") from exc
+        return len(rows)
+
+    def save(self, name, data):
+        self.save_many([(name, data)])
+
+    def delete(self, name):
+        with self._lock:
+            try:
+                with self._conn:
+                    cursor = self._conn.execute("DELETE FROM presets WHERE name = ?", (name,))
+            except sqlite3.Error as exc:
+                raise PresetStoreError(f"Could not delete preset {name!r}: {exc}") from exc
+        return cursor.rowcount > 0
+
+    def migrate_json(self, json_path):
+        """Import a ``presets.json`` file once; returns the number imported.
+
+        Presets already in the database win. The JSON file is left in place.
+        """
+        if self.get_meta("json_migrated") is not None:
+            return 0
+        presets = load_json(json_path, dict)
+        with self._lock:
+            try:
+                with self._conn:
+                    self._conn.executemany(
+                        "INSERT INTO presets (name, path, value_count, data) VALUES (?, ?, ?, ?) "
+                        "ON CONFLICT(name) DO NOTHING",
+                        [_row(name, data, self.serializer) for name, data in presets.items()],
+                    )
+                    self.set_meta("json_migrated", os.fspath(json_path))
+            except sqlite3.Error as exc:
+                raise PresetStoreError(f"Could not migrate presets from {json_path}: {exc}") from exc
+        return len(presets)
+
+    def close(self):
+        self._conn.close()
@@ -0,0 +1,365 @@
+"""Native ``.reg`` export and import without ``reg.exe``.
+
+Exports are UTF-16LE with a BOM and ``\\r\\n`` line endings, in the layout
+``reg export`` produces: one ``[key]`` section per key followed by a blank
+line, ``"name"="text"`` for ``REG_SZ``, ``dword:xxxxxxxx`` for ``REG_DWORD``
+and comma-separated ``hex(N):`` bytes for everything else, wrapped with a
+trailing backslash the same way regedit does.
+
+Imports stream a REGEDIT5 or REGEDIT4 file line by line into typed
+``RegOperation`` records, which ``build_import_plan`` turns into a
+reviewable ``ChangePlan``.
+"""
+
+from __future__ import annotations
+
+import codecs
+import re
+from typing import NamedTuple
+
+from change_manager import ChangePlan
+from registry_backend import (
+    HIVE_NAMES,
+    REG_BINARY,
+    REG_DWORD,
+    REG_EXPAND_SZ,
+    REG_MULTI_SZ,
+    REG_QWORD,
+    REG_SZ,
+    decode_value_data,
+    split_root,
+)
+
+
+REG_FILE_HEADER = "Windows Registry Editor Version 5.00"
+REGEDIT4_HEADER = "REGEDIT4"
+
+_BOM = b"\xff\xfe"
+# regedit wraps hex data once a line reaches this many characters.
+_MAX_HEX_CHARS = 77
+_HEX_CONTINUATION = "\\\r\n  "
+_WRITE_BUFFER = 1 << 20
+_READ_BUFFER = 1 << 20
+
+
+class RegFileError(ValueError):
+    """Raised when a ``.reg`` file cannot be parsed or imported."""
+
+    def __init__(self, message, line_number=None):
+        self.line_number = line_number
+        super().__init__(f"Line {line_number}: {message}" if line_number else message)
+
+
+def encode_value_data(data, value_type):
+    """Return the raw registry bytes for a ``winreg``-shaped value."""
+    if data is None:
+        return b""
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        return bytes(data)
+    if value_type in (REG_SZ, REG_EXPAND_SZ):
+        return (str(data) + "\0").encode("utf-16-le")
+    if value_type == REG_MULTI_SZ:
+        return "".join(f"{item}\0" for item in data).encode("utf-16-le") + b"\0\0"
+    if value_type == REG_DWORD:
+        return (int(data) & 0xFFFFFFFF).to_bytes(4, "little")
+    if value_type == REG_QWORD:
+        return (int(data) & 0xFFFFFFFFFFFFFFFF).to_bytes(8, "little")
+    raise TypeError(f"Cannot encode {type(data).__name__} data as registry type {value_type}.")
+
+
+def _escape(text):
+    return text.replace("\\", "\\\\").replace('"', '\\"')
+
+
+def _hex_data(line_len, raw):
+    """Comma-separated hex bytes, wrapped like regedit's ``export_hex_data``."""
+    parts = []
+    last = len(raw) - 1
+    for index, byte in enumerate(raw):
+        parts.append(f"{byte:02x}")
+        if index == last:
+            break
+        parts.append(",")
+        line_len += 3
+        if line_len >= _MAX_HEX_CHARS:
+            parts.append(_HEX_CONTINUATION)
+            line_len = 2
+    return "".join(parts)
+
+
+def format_value(name, data, value_type):
+    """Return one value's ``.reg`` line, including the trailing ``\\r\\n``."""
+    name_part = f'"{_escape(name)}"=' if name else "@="
+    if value_type == REG_SZ and isinstance(data, str) and not any(c in data for c in "\0\r\n"):
+        return f'{name_part}"{_escape(data)}"\r\n'
+    if value_type == REG_DWORD and isinstance(data, int):
+        return f"{name_part}dword:{data & 0xFFFFFFFF:08x}\r\n"
+    prefix = "hex:" if value_type == REG_BINARY else f"hex({value_type:x}):"
+    raw = encode_value_data(data, value_type)
+    return f"{name_part}{prefix}{_hex_data(len(name_part) + len(prefix), raw)}\r\n"
+
+
+class RegFileWriter:
+    """Stream key sections to a binary file object as a REGEDIT5 export."""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.keys_written = 0
+        self.values_written = 0
+        stream.write(_BOM + f"{REG_FILE_HEADER}\r\n\r\n".encode("utf-16-le"))
+
+    def write_key(self, key_path, values):
+        lines = [f"[{key_path}]\r\n"]
+        lines.extend(format_value(name, data, value_type) for name, data, value_type in values)
+        lines.append("\r\n")
+        self.stream.write("".join(lines).encode("utf-16-le"))
+        self.keys_written += 1
+        self.values_written += len(values)
+
+
+def _minimal_roots(roots):
+    """Drop roots already covered by a recursively exported ancestor."""
+    ordered = sorted(roots, key=lambda root: (root[0], root[1].casefold()))
+    kept = []
+    for hive, path in ordered:
+        fold = path.casefold()
+        if any(
+            kept_hive == hive and (not kept_fold or fold == kept_fold or fold.startswith(kept_fold + "\\"))
+            for kept_hive, _, kept_fold in kept
+        ):
+            continue
+        kept.append((hive, path, fold))
+    return [(hive, path) for hive, path, _ in kept]
+
+
+def export_keys(backend, roots, stream, recursive=True, missing_ok=False):
+    """Write ``(hive, path)`` keys from *backend* into one export on *stream*.
+
+    With *recursive* every subtree is included, like ``reg export``; keys
+    that appear more than once, or inside another exported subtree, are
+    written once. Missing or unreadable keys raise the backend's
+    ``OSError``, because a recovery export must never be silently partial;
+    *missing_ok* skips roots that do not exist yet, which have nothing to
+    recover. Returns the ``RegFileWriter`` so callers can report counts.
+    """
+    writer = RegFileWriter(stream)
+    unique = {}
+    for hive, path in roots:
+        path = path.strip("\\")
+        unique.setdefault((hive, path.casefold()), (hive, path))
+    roots = _minimal_roots(unique.values()) if recursive else list(unique.values())
+
+    for hive, path in roots:
+        hive_name = HIVE_NAMES.get(hive, f"{hive:#x}")
+        if missing_ok:
+            try:
+                backend.query_info(hive, path)
+            except FileNotFoundError:
+                continue
+        stack = [path]
+        while stack:
+            current = stack.pop()
+            info = backend.read_key(hive, current, include_values=True, transient=True)
+            writer.write_key(f"{hive_name}\\{current}" if current else hive_name, info.values)
+            if recursive:
+                prefix = f"{current}\\" if current else ""
+                stack.extend(prefix + name for name in reversed(info.subkeys))
+    return writer
+
+
+def export_to_file(backend, roots, filepath, recursive=True, missing_ok=False):
+    """``export_keys`` into *filepath* through one large write buffer."""
+    with open(filepath, "wb", buffering=_WRITE_BUFFER) as handle:
+        return export_keys(backend, roots, handle, recursive, missing_ok)
+
+
+# --- Import ---
+
+SET_VALUE = "set_value"
+DELETE_VALUE = "delete_value"
+CREATE_KEY = "create_key"
+DELETE_KEY = "delete_key"
+
+
+class RegOperation(NamedTuple):
+    """One instruction from a ``.reg`` file; ``name`` is ``""`` for ``@``."""
+
+    kind: str
+    hive: int
+    path: str
+    name: str | None = None
+    data: object = None
+    value_type: int | None = None
+
+
+_VALUE_LINE = re.compile(r'(?:@|"((?:[^"\\]|\\.)*)")\s*=\s*(.*)', re.DOTALL)
+_HEX_PREFIX = re.compile(r"hex(?:\(([0-9a-fA-F]+)\))?:", re.IGNORECASE)
+_ESCAPE = re.compile(r"\\(.)")
+_ESCAPES = {"n": "\n", "r": "\r", "0": "\0"}
+
+
+def _unescape(text):
+    if "\\" not in text:
+        return text
+    return _ESCAPE.sub(lambda match: _ESCAPES.get(match.group(1), match.group(1)), text)
+
+
+def _open_text(filepath):
+    with open(filepath, "rb") as probe:
+        head = probe.read(4)
+    if head.startswith(codecs.BOM_UTF16_LE):
+        encoding = "utf-16"
+    elif head.startswith(codecs.BOM_UTF8):
+        encoding = "utf-8-sig"
+    else:
+        encoding = "utf-8"
+    return open(filepath, "r", encoding=encoding, errors="replace", newline=None, buffering=_READ_BUFFER)
+
+
+def _logical_lines(handle):
+    """Yield ``(line_number, text)`` with backslash continuations joined."""
+    pending = []
+    start = 0
+    for number, line in enumerate(handle, 1):
+        line = line.rstrip("\r\n")
+        if pending:
+            line = line.lstrip()
+        else:
+            start = number
+        if line.endswith("\\") and not line.lstrip().startswith(";"):
+            pending.append(line[:-1])
+            continue
+        if pending:
+            pending.append(line)
+            line = "".join(pending)
+            pending = []
+        yield start, line
+    if pending:
+        yield start, "".join(pending)
+
+
+def _parse_data(text, line_number, ansi_strings):
+    if text.startswith('"'):
+        if len(text) < 2 or not text.rstrip().endswith('"'):
+            raise RegFileError("Unterminated string value.", line_number)
+        return _unescape(text.rstrip()[1:-1]), REG_SZ
+    lowered = text[:6].lower()
+    if lowered == "dword:":
+        try:
+            return int(text[6:].strip(), 16), REG_DWORD
+        except ValueError:
+            raise RegFileError(f"Invalid dword data: {text[6:].strip()}", line_number) from None
+    prefix = _HEX_PREFIX.match(text)
+    if prefix is None:
+        raise RegFileError(f"Unsupported value data: {text[:40]}", line_number)
+    value_type = int(prefix.group(1), 16) if prefix.group(1) else REG_BINARY
+    digits = text[prefix.end():].replace(",", "").replace(" ", "").replace("\t", "")
+    try:
+        raw = bytes.fromhex(digits)
+    except ValueError:
+        raise RegFileError("Invalid hex data.", line_number) from None
+    if ansi_strings and value_type in (REG_SZ, REG_EXPAND_SZ, REG_MULTI_SZ):
+        # REGEDIT4 stores string types as ANSI bytes, not UTF-16.
+        raw = raw.decode("latin-1").encode("utf-16-le")
+    return decode_value_data(raw, value_type), value_type
+
+
+def parse_reg_file(filepath):
+    """Yield ``RegOperation`` records from a ``.reg`` file as it is read.
+
+    Memory use is bounded by the longest logical line, so multi-hundred-MB
+    exports stream at disk speed. Raises ``RegFileError`` with a line number
+    for malformed input.
+    """
+    with _open_text(filepath) as handle:
+        lines = _logical_lines(handle)
+        header = next(lines, (1, ""))[1].strip()
+        if header not in (REG_FILE_HEADER, REGEDIT4_HEADER):
+            raise RegFileError("Not a registry export file.", 1)
+        ansi_strings = header == REGEDIT4_HEADER
+
+        hive = path = None
+        for line_number, line in lines:
+            line = line.strip()
+            if not line or line.startswith(";"):
+                continue
+            if line.startswith("["):
+                if not line.endswith("]"):
+                    raise RegFileError("Unterminated key name.", line_number)
+                key = line[1:-1].strip()
+                deleting = key.startswith("-")
+                try:
+                    hive, path = split_root(key.lstrip("-"))
+                except ValueError as exc:
+                    raise RegFileError(str(exc), line_number) from None
+                if deleting:
+                    yield RegOperation(DELETE_KEY, hive, path)
+                    hive = path = None
+                else:
+                    yield RegOperation(CREATE_KEY, hive, path)
+                continue
+
+            match = _VALUE_LINE.match(line)
+            if match is None:
+                raise RegFileError(f"Unrecognised line: {line[:40]}", line_number)
+            if hive is None:
+                raise RegFileError("Value outside of a key section.", line_number)
+            name = "" if match.group(1) is None else _unescape(match.group(1))
+            text = match.group(2).strip()
+            if text == "-":
+                yield RegOperation(DELETE_VALUE, hive, path, name)
+            else:
+                data, value_type = _parse_data(text, line_number, ansi_strings)
+                yield RegOperation(SET_VALUE, hive, path, name, data, value_type)
+
+
+class ImportPlan(NamedTuple):
+    """A reviewed-before-write import: the value plan plus keys to create."""
+
+    plan: ChangePlan
+    keys: list
+    operations: int
+
+
+def build_import_plan(handler, operations, label="Import .reg file"):
+    """Turn parsed operations into a ``ChangePlan`` against *handler*.
+
+    Later assignments to the same value win, as they do with ``reg import``.
+    Key sections become ``keys`` so the caller can create missing keys just
+    before applying; key deletions are refused because a change plan can
+    only compensate value changes.
+    """
+    targets = {}
+    keys = {}
+    count = 0
+    for operation in operations:
+        count += 1
+        if operation.kind == DELETE_KEY:
+            raise RegFileError(
+                f"Key deletion of {operation.path or '<root>'} is not supported by in-process import."
+            )
+        if operation.kind == CREATE_KEY:
+            keys.setdefault((operation.hive, operation.path.casefold()), (operation.hive, operation.path))
+            continue
+        target = (operation.hive, operation.path.casefold(), operation.name.casefold())
+        targets.pop(target, None)
+        targets[target] = operation
+
+    # Group by key so each key's before-state is captured in one read.
+    grouped = {}
+    for (hive, fold, _), operation in targets.items():
+        grouped.setdefault((hive, fold, operation.kind), []).append(operation)
+
+    plan = ChangePlan(handler, label, intern_payloads=True)
+    for (hive, _, kind), batch in grouped.items():
+        hive_name = HIVE_NAMES.get(hive, "HKEY_CURRENT_USER")
+        path = batch[0].path
+        if kind == SET_VALUE:
+            plan.set_values(
+                hive, path,
+                [(operation.name, operation.data, operation.value_type) for operation in batch],
+                hive_name,
+            )
+        else:
+            plan.delete_values(hive, path, [operation.name for operation in batch], hive_name)
+    return ImportPlan(plan, list(keys.values()), count)
@@ -0,0 +1,259 @@
+"""Read-only ``RegistryBackend`` over an offline hive file (regf format).
+
+Hive files such as an exported ``NTUSER.DAT`` are memory-mapped and cells
+are decoded on demand straight from the mapping, so opening a large hive
+costs no upfront parse and browsing it touches only the cells it shows.
+The whole file is one hive: the ``hive`` argument of every call is ignored
+and paths are relative to the file's root key.
+
+Layout reference: a 4 KiB base block, then ``hbin`` blocks of cells. Every
+cell offset is relative to the first hbin, and each cell starts with a
+signed size that is negative while the cell is allocated.
+"""
+
+from __future__ import annotations
+
+import mmap
+import os
+import struct
+import threading
+from collections import OrderedDict
+
+from registry_backend import KeyCounts, KeyInfo, decode_value_data
+
+
+class RegfError(ValueError):
+    """Raised when a file is not a readable regf hive."""
+
+
+_BASE_BLOCK_SIZE = 0x1000
+_NO_CELL = 0xFFFFFFFF
+_KEY_COMP_NAME = 0x0020
+_VALUE_COMP_NAME = 0x0001
+_DATA_INLINE = 0x80000000
+# Values larger than this are split into "db" segments on hive format 1.4+.
+_MAX_DIRECT_DATA = 16344
+
+_NK = struct.Struct("<2sH Q 8x I 4x I 4x I I 28x H H")
+_VK = struct.Struct("<2sH I I I H 2x")
+_LIST_HEADER = struct.Struct("<2sH")
+
+
+def _lh_hash(name):
+    value = 0
+    for char in name.upper():
+        value = (value * 37 + ord(char)) & 0xFFFFFFFF
+    return value
+
+
+def _read_only(*_args):
+    raise PermissionError(13, "Offline hive files are opened read-only")
+
+
+class RegfBackend:
+    """Lazily decoded, read-only view of one regf hive file.
+
+    Key lookups walk subkey lists by name (using ``lh`` hashes to skip
+    non-matching entries) and remember a bounded number of resolved paths,
+    so memory use stays flat no matter how large the hive is.
+    """
+
+    def __init__(self, path, path_cache_size=4096):
+        self.path = os.fspath(path)
+        self._lock = threading.Lock()
+        self._path_cache = OrderedDict()
+        self._path_cache_size = path_cache_size
+        with open(self.path, "rb") as handle:
+            try:
+                self._mmap = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError as exc:
+                raise RegfError(f"{self.path} is empty.") from exc
+        self._view = memoryview(self._mmap)
+        try:
+            self._read_base_block()
+        except Exception:
+            self.close()
+            raise
+
+    def _read_base_block(self):
+        if len(self._view) < _BASE_BLOCK_SIZE + 0x20 or bytes(self._view[:4]) != b"regf":
+            raise RegfError(f"{self.path} is not a registry hive file.")
+        major, minor = struct.unpack_from("<II", self._view, 0x14)
+        if major != 1:
+            raise RegfError(f"Unsupported hive format version {major}.{minor}.")
+        self.minor_version = minor
+        self.root_offset = struct.unpack_from("<I", self._view, 0x24)[0]
+        self._check_key(self.root_offset)
+
+    def close(self):
+        self._view.release()
+        self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # --- Cells ---
+    def _cell(self, offset):
+        """Return a zero-copy view of the allocated cell at *offset*."""
+        start = _BASE_BLOCK_SIZE + offset
+        if offset == _NO_CELL or start + 4 > len(self._view):
+            raise RegfError(f"Cell offset {offset:#x} is outside the hive.")
+        size = struct.unpack_from("<i", self._view, start)[0]
+        if size >= 0:
+            raise RegfError(f"Cell {offset:#x} is not allocated.")
+        end = start - size
+        if end > len(self._view):
+            raise RegfError(f"Cell {offset:#x} runs past the end of the hive.")
+        return self._view[start + 4:end]
+
+    def _check_key(self, offset):
+        cell = self._cell(offset)
+        if bytes(cell[:2]) != b"nk":
+            raise RegfError(f"Cell {offset:#x} is not a key node.")
+        return cell
+
+    def _key(self, offset):
+        cell = self._check_key(offset)
+        (_, flags, last_write, subkey_count, subkey_list, value_count,
+         value_list, name_length, _) = _NK.unpack_from(cell)
+        return cell, flags, last_write, subkey_count, subkey_list, value_count, value_list, name_length
+
+    def _key_name(self, offset):
+        cell, flags, *_, name_length = self._key(offset)
+        return _decode_name(cell[_NK.size:_NK.size + name_length], flags & _KEY_COMP_NAME)
+
+    def _subkey_offsets(self, list_offset):
+        """Yield ``(key_offset, lh_hash_or_None)`` for a subkey index."""
+        cell = self._cell(list_offset)
+        signature, count = _LIST_HEADER.unpack_from(cell)
+        if signature == b"ri":
+            for (child,) in struct.iter_unpack("<I", cell[4:4 + 4 * count]):
+                yield from self._subkey_offsets(child)
+        elif signature == b"li":
+            for (child,) in struct.iter_unpack("<I", cell[4:4 + 4 * count]):
+                yield child, None
+        elif signature in (b"lf", b"lh"):
+            hashed = signature == b"lh"
+            for child, hint in struct.iter_unpack("<II", cell[4:4 + 8 * count]):
+                yield child, hint if hashed else None
+        else:
+            raise RegfError(f"Cell {list_offset:#x} is not a subkey list.")
+
+    def _children(self, offset):
+        _, _, _, count, list_offset, *_ = self._key(offset)
+        if not count or list_offset == _NO_CELL:
+            return
+        yield from self._subkey_offsets(list_offset)
+
+    def _value_offsets(self, offset):
+        _, _, _, _, _, count, list_offset, _ = self._key(offset)
+        if not count or list_offset == _NO_CELL:
+            return ()
+        return [entry for (entry,) in struct.iter_unpack("<I", self._cell(list_offset)[:4 * count])]
+
+    def _value(self, offset):
+        """Return ``(name, data, type)`` shaped like ``winreg.EnumValue``."""
+        cell = self._cell(offset)
+        signature, name_length, size, data_offset, value_type, flags = _VK.unpack_from(cell)
+        if signature != b"vk":
+            raise RegfError(f"Cell {offset:#x} is not a value.")
+        name = _decode_name(cell[_VK.size:_VK.size + name_length], flags & _VALUE_COMP_NAME)
+        return name, decode_value_data(self._value_bytes(size, data_offset), value_type), value_type
+
+    def _value_name(self, offset):
+        cell = self._cell(offset)
+        _, name_length, _, _, _, flags = _VK.unpack_from(cell)
+        return _decode_name(cell[_VK.size:_VK.size + name_length], flags & _VALUE_COMP_NAME)
+
+    def _value_bytes(self, size, data_offset):
+        if size & _DATA_INLINE:
+            return struct.pack("<I", data_offset)[:size & ~_DATA_INLINE]
+        if not size:
+            return b""
+        if size > _MAX_DIRECT_DATA and self.minor_version > 3:
+            block = self._cell(data_offset)
+            if bytes(block[:2]) == b"db":
+                segments, list_offset = struct.unpack_from("<HI", block, 2)
+                segment_list = self._cell(list_offset)
+                parts = []
+                remaining = size
+                for (segment,) in struct.iter_unpack("<I", segment_list[:4 * segments]):
+                    chunk = self._cell(segment)[:min(remaining, _MAX_DIRECT_DATA)]
+                    parts.append(chunk)
+                    remaining -= len(chunk)
+                return b"".join(parts)
+        return bytes(self._cell(data_offset)[:size])
+
+    # --- Path resolution ---
+    def _find(self, path):
+        parts = [part for part in path.split("\\") if part]
+        fold = "\\".join(parts).casefold()
+        with self._lock:
+            cached = self._path_cache.get(fold)
+            if cached is not None:
+                self._path_cache.move_to_end(fold)
+                return cached
+        offset = self.root_offset
+        for part in parts:
+            offset = self._find_child(offset, part)
+            if offset is None:
+                raise FileNotFoundError(2, "The system cannot find the file specified", path)
+        with self._lock:
+            self._path_cache[fold] = offset
+            if len(self._path_cache) > self._path_cache_size:
+                self._path_cache.popitem(last=False)
+        return offset
+
+    def _find_child(self, offset, name):
+        wanted = name.casefold()
+        # Windows hashes with its own upcase table; only trust ASCII names.
+        wanted_hash = _lh_hash(name) if name.isascii() else None
+        for child, hint in self._children(offset):
+            if hint is not None and wanted_hash is not None and hint != wanted_hash:
+                continue
+            if self._key_name(child).casefold() == wanted:
+                return child
+        return None
+
+    # --- RegistryBackend ---
+    def query_info(self, hive, path):
+        _, _, last_write, subkey_count, _, value_count, _, _ = self._key(self._find(path))
+        return KeyCounts(subkey_count, value_count, last_write)
+
+    def last_write_time(self, hive, path):
+        return self.query_info(hive, path).last_write
+
+    def enum_keys(self, hive, path):
+        return [self._key_name(child) for child, _ in self._children(self._find(path))]
+
+    def enum_values(self, hive, path):
+        return [self._value(entry) for entry in self._value_offsets(self._find(path))]
+
+    def read_key(self, hive, path, unchanged_since=None, include_values=True, transient=False):
+        offset = self._find(path)
+        last_write = self._key(offset)[2]
+        if unchanged_since is not None and last_write == unchanged_since:
+            return KeyInfo(None, None, last_write)
+        subkeys = [self._key_name(child) for child, _ in self._children(offset)]
+        values = (
+            [self._value(entry) for entry in self._value_offsets(offset)]
+            if include_values else []
+        )
+        return KeyInfo(subkeys, values, last_write)
+
+    def query_value(self, hive, path, name):
+        wanted = (name or "").casefold()
+        for entry in self._value_offsets(self._find(path)):
+            if self._value_name(entry).casefold() == wanted:
+                _, data, value_type = self._value(entry)
+                return data, value_type
+        raise FileNotFoundError(2, "The system cannot find the file specified", name)
+
+    set_value = delete_value = create_key = delete_key = _read_only
+
+
+def _decode_name(raw, compressed):
+    return bytes(raw).decode("latin-1" if compressed else "utf-16-le")
@@ -0,0 +1,395 @@
+"""Registry storage backends behind ``RegistryHandler``.
+
+A backend addresses keys by ``(hive, path)`` and reports failures with the
+same exceptions ``winreg`` raises: ``FileNotFoundError`` for a missing key
+or value, ``PermissionError`` for refused access, and ``OSError`` for the
+rest. ``RegistryHandler`` keeps its error semantics on top of any backend,
+so the change engine, search, and index run unchanged against the
+in-memory backend on any platform.
+"""
+
+from __future__ import annotations
+
+import itertools
+import threading
+import time
+from typing import NamedTuple, Protocol
+
+
+# Windows ABI value type codes, usable without importing ``winreg``.
+REG_NONE = 0
+REG_SZ = 1
+REG_EXPAND_SZ = 2
+REG_BINARY = 3
+REG_DWORD = 4
+REG_DWORD_BIG_ENDIAN = 5
+REG_LINK = 6
+REG_MULTI_SZ = 7
+REG_RESOURCE_LIST = 8
+REG_FULL_RESOURCE_DESCRIPTOR = 9
+REG_RESOURCE_REQUIREMENTS_LIST = 10
+REG_QWORD = 11
+
+HKEY_CLASSES_ROOT = 0x80000000
+HKEY_CURRENT_USER = 0x80000001
+HKEY_LOCAL_MACHINE = 0x80000002
+HKEY_USERS = 0x80000003
+HKEY_CURRENT_CONFIG = 0x80000005
+
+HIVE_NAMES = {
+    HKEY_CLASSES_ROOT: "HKEY_CLASSES_ROOT",
+    HKEY_CURRENT_USER: "HKEY_CURRENT_USER",
+    HKEY_LOCAL_MACHINE: "HKEY_LOCAL_MACHINE",
+    HKEY_USERS: "HKEY_USERS",
+    HKEY_CURRENT_CONFIG: "HKEY_CURRENT_CONFIG",
+}
+
+# Full and reg.exe-style short root names, uppercased.
+HIVES_BY_NAME = {name: hive for hive, name in HIVE_NAMES.items()}
+HIVES_BY_NAME.update({
+    "HKCR": HKEY_CLASSES_ROOT,
+    "HKCU": HKEY_CURRENT_USER,
+    "HKLM": HKEY_LOCAL_MACHINE,
+    "HKU": HKEY_USERS,
+    "HKCC": HKEY_CURRENT_CONFIG,
+})
+
+
+def split_root(full_path):
+    """Split ``HKEY_CURRENT_USER\\Software\\X`` into ``(hive, "Software\\X")``.
+
+    Raises ``ValueError`` for an unknown root key.
+    """
+    root, _, path = full_path.strip("\\").partition("\\")
+    try:
+        return HIVES_BY_NAME[root.upper()], path
+    except KeyError:
+        raise ValueError(f"Unknown registry root: {root}") from None
+
+
+def decode_value_data(raw, value_type):
+    """Convert raw value bytes exactly as ``winreg`` does."""
+    if value_type in (REG_SZ, REG_EXPAND_SZ):
+        text = raw[: len(raw) & ~1].decode("utf-16-le", "replace")
+        return text.split("\0", 1)[0]
+    if value_type == REG_MULTI_SZ:
+        text = raw[: len(raw) & ~1].decode("utf-16-le", "replace")
+        # winreg stops at the first empty string, not just trailing ones.
+        return list(itertools.takewhile(bool, text.split("\0")))
+    if value_type == REG_DWORD:
+        return int.from_bytes(raw[:4].ljust(4, b"\0"), "little")
+    if value_type == REG_QWORD:
+        return int.from_bytes(raw[:8].ljust(8, b"\0"), "little")
+    return bytes(raw) if raw else None
+
+
+# FILETIME (100 ns ticks since 1601) of the Unix epoch.
+_FILETIME_UNIX_EPOCH = 116444736000000000
+
+
+class KeyInfo(NamedTuple):
+    """Subkey names, ``(name, data, type)`` values and FILETIME of one key."""
+
+    subkeys: list | None
+    values: list | None
+    last_write: int
+
+
+class KeyCounts(NamedTuple):
+    subkeys: int
+    values: int
+    last_write: int
+
+
+class RegistryBackend(Protocol):
+    """Path-addressed registry operations; see the module docstring for errors."""
+
+    def query_info(self, hive: int, path: str) -> KeyCounts:
+        """Subkey count, value count and last-write FILETIME of a key."""
+
+    def last_write_time(self, hive: int, path: str) -> int:
+        ...
+
+    def enum_keys(self, hive: int, path: str) -> list[str]:
+        ...
+
+    def enum_values(self, hive: int, path: str) -> list[tuple]:
+        ...
+
+    def read_key(
+        self,
+        hive: int,
+        path: str,
+        unchanged_since: int | None = None,
+        include_values: bool = True,
+        transient: bool = False,
+    ) -> KeyInfo:
+        """Read a whole key; see ``RegistryHandler.scan_key`` for the flags.
+
+        *transient* marks a read the caller will not repeat soon, such as one
+        step of a tree walk; backends that cache handles should not keep it.
+        """
+
+    def query_value(self, hive: int, path: str, name: str) -> tuple:
+        """Return ``(data, type)`` for one value."""
+
+    def set_value(self, hive: int, path: str, name: str, data, value_type: int) -> None:
+        ...
+
+    def delete_value(self, hive: int, path: str, name: str) -> None:
+        ...
+
+    def create_key(self, hive: int, path: str) -> None:
+        """Create *path* and any missing parents; existing keys are kept."""
+
+    def delete_key(self, hive: int, path: str) -> None:
+        """Delete a key that has no subkeys."""
+
+    def open_key_session(self, hive: int, path: str) -> KeySession:
+        """Open one key for several value reads and writes.
+
+        Optional: callers fall back to ``PathKeySession`` for backends
+        without it. Raises like ``query_value`` when the key cannot be
+        opened for both querying and setting values.
+        """
+
+
+class KeySession(Protocol):
+    """Value operations bound to one opened key; close it when done."""
+
+    def query_value(self, name: str) -> tuple:
+        ...
+
+    def set_value(self, name: str, data, value_type: int) -> None:
+        ...
+
+    def delete_value(self, name: str) -> None:
+        ...
+
+    def last_write_time(self) -> int:
+        ...
+
+    def close(self) -> None:
+        ...
+
+
+class PathKeySession:
+    """A ``KeySession`` that re-addresses the key by path on every call.
+
+    Used for backends without ``open_key_session`` and whenever a key cannot
+    be opened with both read and write access up front.
+    """
+
+    def __init__(self, backend, hive, path):
+        self.backend = backend
+        self.hive = hive
+        self.path = path
+
+    def query_value(self, name):
+        return self.backend.query_value(self.hive, self.path, name)
+
+    def set_value(self, name, data, value_type):
+        self.backend.set_value(self.hive, self.path, name, data, value_type)
+
+    def delete_value(self, name):
+        self.backend.delete_value(self.hive, self.path, name)
+
+    def last_write_time(self):
+        return self.backend.last_write_time(self.hive, self.path)
+
+    def close(self):
+        pass
+
+
+def filetime_now():
+    return time.time_ns() // 100 + _FILETIME_UNIX_EPOCH
+
+
+def _split(path):
+    return [part for part in path.split("\\") if part]
+
+
+class _Node:
+    __slots__ = ("name", "children", "values", "last_write", "deleted")
+
+    def __init__(self, name, last_write):
+        self.name = name
+        self.deleted = False
+        # Both dicts are keyed by casefolded name and keep insertion order,
+        # which stands in for the registry's enumeration order.
+        self.children = {}
+        self.values = {}
+        self.last_write = last_write
+
+
+class InMemoryRegistryBackend:
+    """A thread-safe registry held in a casefolded trie.
+
+    Each key is one slotted node with a dict of children and a dict of
+    ``(name, data, type)`` values, so lookups cost one dict probe per path
+    component and a value costs one tuple. Hives are created on first use.
+    Last-write times are FILETIME-like and strictly increase on every
+    change, which is what incremental index refresh relies on.
+    """
+
+    def __init__(self):
+        self._hives = {}
+        self._lock = threading.RLock()
+        self._clock = 0
+
+    def _tick(self):
+        self._clock = max(self._clock + 1, filetime_now())
+        return self._clock
+
+    def _root(self, hive):
+        root = self._hives.get(hive)
+        if root is None:
+            root = self._hives[hive] = _Node("", self._tick())
+        return root
+
+    def _find(self, hive, path):
+        node = self._root(hive)
+        for part in _split(path):
+            node = node.children.get(part.casefold())
+            if node is None:
+                raise FileNotFoundError(2, "The system cannot find the file specified", path)
+        return node
+
+    def query_info(self, hive, path):
+        with self._lock:
+            node = self._find(hive, path)
+            return KeyCounts(len(node.children), len(node.values), node.last_write)
+
+    def last_write_time(self, hive, path):
+        return self.query_info(hive, path).last_write
+
+    def enum_keys(self, hive, path):
+        with self._lock:
+            return [child.name for child in self._find(hive, path).children.values()]
+
+    def enum_values(self, hive, path):
+        with self._lock:
+            return [_copy_value(value) for value in self._find(hive, path).values.values()]
+
+    def read_key(self, hive, path, unchanged_since=None, include_values=True, transient=False):
+        with self._lock:
+            node = self._find(hive, path)
+            if unchanged_since is not None and node.last_write == unchanged_since:
+                return KeyInfo(None, None, node.last_write)
+            subkeys = [child.name for child in node.children.values()]
+            values = (
+                [_copy_value(value) for value in node.values.values()]
+                if include_values else []
+            )
+            return KeyInfo(subkeys, values, node.last_write)
+
+    def _query_node(self, node, name):
+        value = node.values.get((name or "").casefold())
+        if value is None:
+            raise FileNotFoundError(2, "The system cannot find the file specified", name)
+        _, data, value_type = _copy_value(value)
+        return data, value_type
+
+    def _set_node(self, node, name, data, value_type):
+        if isinstance(data, list):
+            data = list(data)
+        name = name or ""
+        fold = name.casefold()
+        existing = node.values.get(fold)
+        # Windows keeps the original spelling of a value name on overwrite.
+        node.values[fold] = (existing[0] if existing else name, data, value_type)
+        node.last_write = self._tick()
+
+    def _delete_node_value(self, node, name):
+        try:
+            del node.values[(name or "").casefold()]
+        except KeyError:
+            raise FileNotFoundError(2, "The system cannot find the file specified", name) from None
+        node.last_write = self._tick()
+
+    def query_value(self, hive, path, name):
+        with self._lock:
+            return self._query_node(self._find(hive, path), name)
+
+    def set_value(self, hive, path, name, data, value_type):
+        with self._lock:
+            self._set_node(self._find(hive, path), name, data, value_type)
+
+    def delete_value(self, hive, path, name):
+        with self._lock:
+            self._delete_node_value(self._find(hive, path), name)
+
+    def open_key_session(self, hive, path):
+        with self._lock:
+            return _InMemoryKeySession(self, self._find(hive, path))
+
+    def create_key(self, hive, path):
+        with self._lock:
+            node = self._root(hive)
+            for part in _split(path):
+                fold = part.casefold()
+                child = node.children.get(fold)
+                if child is None:
+                    stamp = self._tick()
+                    child = node.children[fold] = _Node(part, stamp)
+                    node.last_write = stamp
+                node = child
+
+    def delete_key(self, hive, path):
+        parts = _split(path)
+        if not parts:
+            raise PermissionError(5, "Access is denied", path)
+        with self._lock:
+            parent = self._find(hive, "\\".join(parts[:-1]))
+            fold = parts[-1].casefold()
+            node = parent.children.get(fold)
+            if node is None:
+                raise FileNotFoundError(2, "The system cannot find the file specified", path)
+            if node.children:
+                raise PermissionError(5, "Access is denied", path)
+            del parent.children[fold]
+            node.deleted = True
+            parent.last_write = self._tick()
+
+
+class _InMemoryKeySession:
+    """Holds a resolved node, like a handle; fails once the key is deleted."""
+
+    __slots__ = ("_backend", "_node")
+
+    def __init__(self, backend, node):
+        self._backend = backend
+        self._node = node
+
+    def _live_node(self):
+        if self._node.deleted:
+            raise OSError(
+                1018, "Illegal operation attempted on a registry key that has been marked for deletion"
+            )
+        return self._node
+
+    def query_value(self, name):
+        with self._backend._lock:
+            return self._backend._query_node(self._live_node(), name)
+
+    def set_value(self, name, data, value_type):
+        with self._backend._lock:
+            self._backend._set_node(self._live_node(), name, data, value_type)
+
+    def delete_value(self, name):
+        with self._backend._lock:
+            self._backend._delete_node_value(self._live_node(), name)
+
+    def last_write_time(self):
+        with self._backend._lock:
+            return self._live_node().last_write
+
+    def close(self):
+        pass
+
+
+def _copy_value(value):
+    name, data, value_type = value
+    if isinstance(data, list):
+        data = list(data)
+    return name, data, value_type
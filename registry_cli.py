@@ -0,0 +1,331 @@
+"""Headless command line for previewing and applying presets and plan files.
+
+    python registry_cli.py --preset "Show File Extensions" --dry-run
+    python registry_cli.py --plan rollout.rmplan --preset "Enable Dark Mode" --json
+
+Targets are planned in command-line order; if any target cannot be planned,
+nothing is applied. ``--dry-run`` stops after the snapshot reads and prints
+the preview. Otherwise each plan is applied in turn with verification and
+rollback, after a recovery export unless ``--no-backup``, and the first
+failure stops the run unless ``--keep-going``. Plan files are replayed:
+their recorded end state is re-planned against this machine's registry.
+
+No UI module is imported, and plan-file support is loaded only when a plan
+file is given, so the command starts quickly enough for fleet scripts.
+
+Exit status: 0 when every plan applied or needed no changes (or, with
+``--dry-run``, could be planned); 1 when a plan failed or conflicted and its
+changes were restored, or interrupted plans block the run; 2 for unusable
+arguments or input; 3 when a rollback failed and the registry needs
+attention.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+
+from app_paths import get_app_paths
+from change_manager import ApplyStatus, ChangePlan
+from preset_manager import PresetManager
+from preset_store import PresetStoreError
+from registry_backend import HKEY_CURRENT_USER
+from registry_codec import RegistryCodecError, format_registry_value, registry_type_name
+
+
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_USAGE = 2
+EXIT_ROLLBACK_FAILED = 3
+
+_FAILED_STATUSES = (
+    ApplyStatus.CONFLICT,
+    ApplyStatus.FAILED,
+    ApplyStatus.ROLLED_BACK,
+)
+
+
+class CliError(Exception):
+    """An argument or input problem; reported with ``EXIT_USAGE``."""
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="registry_cli",
+        description="Preview and apply Registry Manager presets and plan files without the GUI.",
+    )
+    parser.add_argument(
+        "--preset", dest="targets", action="append", metavar="NAME",
+        type=lambda name: ("preset", name), help="apply the named preset (repeatable)",
+    )
+    parser.add_argument(
+        "--plan", dest="targets", action="append", metavar="FILE",
+        type=lambda path: ("plan", path), help="replay a saved plan file (repeatable)",
+    )
+    parser.add_argument("--presets-file", help="read presets from this JSON file")
+    parser.add_argument("--data-dir", help="application data directory (journal, backups, presets)")
+    parser.add_argument("--dry-run", action="store_true", help="only read and preview; write nothing")
+    parser.add_argument("--json", action="store_true", help="print one machine-readable JSON report")
+    parser.add_argument("--no-backup", action="store_true", help="skip the .reg recovery export")
+    parser.add_argument("--keep-going", action="store_true", help="apply later plans after a failure")
+    parser.add_argument(
+        "--recover", action="store_true",
+        help="roll back plans an earlier run left interrupted before applying",
+    )
+    parser.add_argument("--list-presets", action="store_true", help="list preset names and exit")
+    return parser
+
+
+# --- Planning ---
+
+def _load_presets(path, db_path=None):
+    # Listing or previewing presets must not seed, migrate or rewrite them.
+    try:
+        return PresetManager(path, db_path=db_path, read_only=True)
+    except (OSError, PresetStoreError) as exc:
+        raise CliError(f"Could not read presets from {db_path or path}: {exc}") from None
+
+
+def _preset_plan(handler, presets, name):
+    data = presets.get_preset(name)
+    if not data:
+        raise CliError(f"Preset not found: {name}")
+    path = data.get("path")
+    if not isinstance(path, str):
+        raise CliError(f"Preset {name}: path must be a registry key path.")
+    values = data.get("values") or []
+    for value_spec in values:
+        if not isinstance(value_spec, (list, tuple)) or len(value_spec) != 3:
+            raise CliError(f"Preset {name}: each value must contain name, data, and type.")
+    plan = ChangePlan(handler, f"Apply preset: {name}", intern_payloads=True)
+    plan.set_values(HKEY_CURRENT_USER, path, values)
+    return plan
+
+
+def _file_plan(handler, path):
+    from plan_format import replay_plan
+
+    return replay_plan(path, handler)
+
+
+def build_plans(handler, targets, presets=None):
+    """Plan every ``(kind, target)`` in order; raises ``CliError``."""
+    plans = []
+    for kind, target in targets:
+        try:
+            if kind == "preset":
+                plans.append(_preset_plan(handler, presets, target))
+            else:
+                plans.append(_file_plan(handler, target))
+        except CliError:
+            raise
+        except (OSError, ValueError, RuntimeError) as exc:
+            raise CliError(f"Could not plan {kind} {target}: {exc}") from None
+    return plans
+
+
+# --- Reporting ---
+
+def _snapshot_json(snapshot):
+    if not snapshot.exists:
+        return None
+    try:
+        return {
+            "type": registry_type_name(snapshot.value_type),
+            "data": format_registry_value(snapshot.value, snapshot.value_type),
+        }
+    except RegistryCodecError:
+        return {"type": snapshot.value_type, "data": repr(snapshot.value)}
+
+
+def _snapshot_text(encoded):
+    if encoded is None:
+        return "(not present)"
+    text = encoded["data"].replace("\r", "").replace("\n", " · ")
+    if len(text) > 120:
+        text = text[:117] + "..."
+    return f"{encoded['type']} {text or '<empty>'}"
+
+
+def _plan_report(target, plan):
+    preview = plan.seal().preview()
+    return {
+        "target": {"kind": target[0], "name": target[1]},
+        "label": plan.label,
+        "counts": {classification.value: count for classification, count in preview.counts.items()},
+        "changes": [
+            {
+                "action": change.classification.value,
+                "key": f"{change.hive_name}\\{change.path}" if change.path else change.hive_name,
+                "name": change.name,
+                "before": _snapshot_json(change.before),
+                "after": _snapshot_json(change.after),
+            }
+            for change in preview.effective_changes
+        ],
+        "status": "planned",
+    }
+
+
+def _write_text(report, out):
+    for entry in report.get("recovered", ()):
+        out.write(f"Recovered {entry['label']}: {entry['status']}. {entry['message']}\n")
+    for entry in report["plans"]:
+        counts = entry["counts"]
+        out.write(
+            f"{entry['label']}: {counts['add']} add, {counts['modify']} modify, "
+            f"{counts['delete']} delete, {counts['no_change']} unchanged\n"
+        )
+        for change in entry["changes"]:
+            name = change["name"] or "(Default)"
+            out.write(
+                f"  {change['action'].upper():<7} {change['key']} • {name}: "
+                f"{_snapshot_text(change['before'])} -> {_snapshot_text(change['after'])}\n"
+            )
+        if entry["status"] != "planned":
+            out.write(f"  {entry['status']}: {entry['message']}\n")
+    if report.get("error"):
+        out.write(f"Error: {report['error']}\n")
+
+
+# --- Applying ---
+
+def _recover_interrupted(handler, report, recover):
+    """Roll back interrupted plans when asked; returns an exit code.
+
+    A recovery that restores values is a success; only a rollback that
+    failed, or interrupted plans left in place, block the run.
+    """
+    journal = getattr(handler, "journal", None)
+    if journal is None:
+        return EXIT_OK
+    interrupted = journal.interrupted()
+    if interrupted and not recover:
+        report["error"] = (
+            f"{len(interrupted)} interrupted plan(s) are in the change journal. "
+            "Run again with --recover, or review them in Registry Manager."
+        )
+        return EXIT_FAILED
+    exit_code = EXIT_OK
+    for plan in interrupted:
+        result = journal.recover(handler, plan)
+        report["recovered"].append(
+            {"label": plan.label, "status": result.status.value, "message": result.message}
+        )
+        if result.status is ApplyStatus.ROLLBACK_FAILED:
+            exit_code = EXIT_ROLLBACK_FAILED
+    return exit_code
+
+
+def _exit_code(status):
+    if status is ApplyStatus.ROLLBACK_FAILED:
+        return EXIT_ROLLBACK_FAILED
+    if status in _FAILED_STATUSES:
+        return EXIT_FAILED
+    return EXIT_OK
+
+
+def _apply_plans(handler, plans, entries, args):
+    exit_code = EXIT_OK
+    for plan, entry in zip(plans, entries):
+        if exit_code != EXIT_OK and not args.keep_going:
+            entry.update(status="not_run", message="Not applied after an earlier failure.")
+            continue
+        if plan.effective_changes and not args.no_backup:
+            # Same export as the GUI: just the keys this plan touches.
+            full_paths = [
+                f"{change.hive_name}\\{change.path}" if change.path else change.hive_name
+                for change in plan.effective_changes
+            ]
+            entry["backup"] = handler.backup_keys(full_paths, recursive=False, missing_ok=True)
+            if not entry["backup"]:
+                message = f"Recovery export failed; nothing was applied. {handler.last_error or ''}"
+                entry.update(status=ApplyStatus.FAILED.value, message=message.strip())
+                exit_code = EXIT_FAILED
+                continue
+        result = plan.apply()
+        entry.update(status=result.status.value, message=result.message, applied=result.applied_count)
+        exit_code = max(exit_code, _exit_code(result.status))
+    return exit_code
+
+
+def run(args, handler, out, presets=None):
+    """Plan, then preview or apply, *args*' targets; returns the exit code."""
+    targets = args.targets or ()
+    report = {"dry_run": args.dry_run, "recovered": [], "plans": []}
+    exit_code = EXIT_OK
+    if not args.dry_run:
+        # Recover first, so plans snapshot the registry as recovery left it.
+        exit_code = _recover_interrupted(handler, report, args.recover)
+    if exit_code == EXIT_OK:
+        try:
+            plans = build_plans(handler, targets, presets)
+        except CliError as exc:
+            report["error"] = str(exc)
+            exit_code = EXIT_USAGE
+        else:
+            report["plans"] = [_plan_report(target, plan) for target, plan in zip(targets, plans)]
+            if not args.dry_run:
+                exit_code = _apply_plans(handler, plans, report["plans"], args)
+    report["exit_code"] = exit_code
+
+    if args.json:
+        json.dump(report, out, ensure_ascii=False, indent=2)
+        out.write("\n")
+    else:
+        _write_text(report, out)
+    return exit_code
+
+
+def _run_targets(parser, args, paths, out, presets):
+    from registry_handler import RegistryHandler
+
+    try:
+        handler = RegistryHandler(paths["backups"])
+    except RuntimeError as exc:
+        parser.exit(EXIT_USAGE, f"registry_cli: {exc}\n")
+    if not args.dry_run:
+        from change_journal import ChangeJournal, JournalError
+
+        try:
+            handler.journal = ChangeJournal(paths["journal"])
+        except (OSError, JournalError) as exc:
+            parser.exit(EXIT_USAGE, f"registry_cli: change journal unavailable: {exc}\n")
+    try:
+        return run(args, handler, out, presets)
+    finally:
+        if handler.journal is not None:
+            handler.journal.close()
+
+
+def main(argv=None, out=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    out = out or sys.stdout
+    paths = get_app_paths(args.data_dir)
+    try:
+        if args.presets_file:
+            presets = _load_presets(args.presets_file)
+        else:
+            presets = _load_presets(paths["presets"], paths["preset_db"])
+    except CliError as exc:
+        parser.exit(EXIT_USAGE, f"registry_cli: {exc}\n")
+
+    try:
+        if args.list_presets:
+            names = sorted(presets.presets)
+            if args.json:
+                out.write(json.dumps(names, ensure_ascii=False) + "\n")
+            else:
+                out.write("".join(f"{name}\n" for name in names))
+            return EXIT_OK
+        if not args.targets:
+            parser.error("give at least one --preset or --plan, or --list-presets")
+        return _run_targets(parser, args, paths, out, presets)
+    finally:
+        presets.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,7 +3,15 @@
 from __future__ import annotations
 
 from collections.abc import Sequence
-import winreg
+
+from registry_backend import (
+    REG_BINARY,
+    REG_DWORD,
+    REG_EXPAND_SZ,
+    REG_MULTI_SZ,
+    REG_QWORD,
+    REG_SZ,
+)
 
 
 class RegistryCodecError(ValueError):
@@ -11,19 +19,19 @@ class RegistryCodecError(ValueError):
 
 
 REGISTRY_TYPE_NAMES = {
-    winreg.REG_SZ: "REG_SZ",
-    winreg.REG_EXPAND_SZ: "REG_EXPAND_SZ",
-    winreg.REG_MULTI_SZ: "REG_MULTI_SZ",
-    winreg.REG_BINARY: "REG_BINARY",
-    winreg.REG_DWORD: "REG_DWORD",
-    winreg.REG_QWORD: "REG_QWORD",
+    REG_SZ: "REG_SZ",
+    REG_EXPAND_SZ: "REG_EXPAND_SZ",
+    REG_MULTI_SZ: "REG_MULTI_SZ",
+    REG_BINARY: "REG_BINARY",
+    REG_DWORD: "REG_DWORD",
+    REG_QWORD: "REG_QWORD",
 }
 
 SUPPORTED_REGISTRY_TYPES = tuple(REGISTRY_TYPE_NAMES)
 
 _INTEGER_LIMITS = {
-    winreg.REG_DWORD: (1 << 32) - 1,
-    winreg.REG_QWORD: (1 << 64) - 1,
+    REG_DWORD: (1 << 32) - 1,
+    REG_QWORD: (1 << 64) - 1,
 }
 
 
@@ -44,7 +52,7 @@ def _validate_unsigned_integer(value: object, value_type: int) -> int:
 
     maximum = _INTEGER_LIMITS[value_type]
     if not 0 <= value <= maximum:
-        bits = 32 if value_type == winreg.REG_DWORD else 64
+        bits = 32 if value_type == REG_DWORD else 64
         raise RegistryCodecError(
             f"{type_name} must be an unsigned {bits}-bit integer "
             f"(0 to {maximum})."
@@ -56,12 +64,12 @@ def format_registry_value(value: object, value_type: int) -> str:
     """Format registry data as editable text without changing its meaning."""
     type_name = registry_type_name(value_type)
 
-    if value_type in (winreg.REG_SZ, winreg.REG_EXPAND_SZ):
+    if value_type in (REG_SZ, REG_EXPAND_SZ):
         if not isinstance(value, str):
             raise RegistryCodecError(f"{type_name} data must be text.")
         return value
 
-    if value_type == winreg.REG_MULTI_SZ:
+    if value_type == REG_MULTI_SZ:
         if (
             isinstance(value, (str, bytes, bytearray))
             or not isinstance(value, Sequence)
@@ -70,7 +78,7 @@ def format_registry_value(value: object, value_type: int) -> str:
             raise RegistryCodecError("REG_MULTI_SZ data must be a sequence of strings.")
         return "\n".join(value)
 
-    if value_type == winreg.REG_BINARY:
+    if value_type == REG_BINARY:
         if not isinstance(value, (bytes, bytearray, memoryview)):
             raise RegistryCodecError("REG_BINARY data must be bytes.")
         return " ".join(f"{byte:02X}" for byte in bytes(value))
@@ -88,17 +96,17 @@ def parse_registry_value(text: str, value_type: int) -> object:
     if not isinstance(text, str):
         raise RegistryCodecError("Registry editor input must be text.")
 
-    if value_type in (winreg.REG_SZ, winreg.REG_EXPAND_SZ):
+    if value_type in (REG_SZ, REG_EXPAND_SZ):
         return text
 
-    if value_type == winreg.REG_MULTI_SZ:
+    if value_type == REG_MULTI_SZ:
         if text == "":
             return []
         # A textbox may supply platform newlines. Registry items remain one per
         # logical line, including intentional empty items between lines.
         return text.replace("\r\n", "\n").replace("\r", "\n").split("\n")
 
-    if value_type == winreg.REG_BINARY:
+    if value_type == REG_BINARY:
         try:
             return bytes.fromhex(text)
         except ValueError as exc:
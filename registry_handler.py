@@ -1,8 +1,19 @@
-import winreg
 import os
-import subprocess
+import threading
 import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
 from datetime import datetime, timezone
+from typing import NamedTuple
+
+try:
+    import winreg
+except ImportError:  # Non-Windows: only explicit backends are available.
+    winreg = None
+
+from reg_file import build_import_plan, export_to_file, parse_reg_file
+from registry_backend import KeyCounts, KeyInfo, PathKeySession, split_root
+from registry_search import RegistrySearch
 
 
 class RegistryOperationError(RuntimeError):
@@ -14,23 +25,295 @@ class RegistryOperationError(RuntimeError):
         self.detail = str(detail)
         super().__init__(f"{operation} failed for {subkey or '<root>'}: {self.detail}")
 
+
+# Returned by winreg operations on a handle whose key was deleted.
+_ERROR_KEY_DELETED = 1018
+
+
+def _enum_range(enum, key, count):
+    """Enumerate *count* items presized from ``QueryInfoKey``.
+
+    A key can shrink between the count and the enumeration; the listing is
+    then truncated instead of ending on a raised ``ERROR_NO_MORE_ITEMS``.
+    """
+    items = [None] * count
+    for i in range(count):
+        try:
+            items[i] = enum(key, i)
+        except OSError:
+            del items[i:]
+            break
+    return items
+
+
+def _enum_subkeys(key):
+    return _enum_range(winreg.EnumKey, key, winreg.QueryInfoKey(key)[0])
+
+
+def _enum_values(key):
+    return _enum_range(winreg.EnumValue, key, winreg.QueryInfoKey(key)[1])
+
+
+def _read_open_key(key, unchanged_since=None, include_values=True):
+    subkey_count, value_count, last_write = winreg.QueryInfoKey(key)
+    if unchanged_since is not None and last_write == unchanged_since:
+        return KeyInfo(None, None, last_write)
+    subkeys = _enum_range(winreg.EnumKey, key, subkey_count)
+    values = _enum_range(winreg.EnumValue, key, value_count) if include_values else []
+    return KeyInfo(subkeys, values, last_write)
+
+
+class KeyCacheStats(NamedTuple):
+    hits: int
+    misses: int
+    relative_opens: int
+    evictions: int
+    open_handles: int
+
+
+class KeyHandleCache:
+    """LRU of open key handles keyed by (hive, casefolded path, access mask).
+
+    A miss opens relative to the deepest cached ancestor handle when there
+    is one, so Windows only resolves the remaining path components. The
+    lock is held while a handle is in use so another thread can never close
+    it mid-operation; registry point operations through one handler are
+    therefore serialized, which matches how the UI drives them.
+    """
+
+    def __init__(self, capacity=64):
+        self.capacity = max(1, capacity)
+        self._handles = OrderedDict()
+        self._paths = {}
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.relative_opens = 0
+        self.evictions = 0
+
+    def stats(self):
+        with self._lock:
+            return KeyCacheStats(
+                self.hits, self.misses, self.relative_opens, self.evictions, len(self._handles)
+            )
+
+    def run(self, hive, subkey, access, operation):
+        """Call ``operation(handle)`` with a cached handle for the key.
+
+        A handle whose key was deleted behind our back is dropped and the
+        operation is retried once with a freshly opened handle.
+        """
+        with self._lock:
+            handle = self._acquire(hive, subkey, access)
+            try:
+                return operation(handle)
+            except OSError as exc:
+                if getattr(exc, "winerror", None) != _ERROR_KEY_DELETED:
+                    raise
+            self.invalidate(hive, subkey)
+            return operation(self._acquire(hive, subkey, access))
+
+    def _acquire(self, hive, subkey, access):
+        fold = subkey.casefold()
+        cache_key = (hive, fold, access)
+        handle = self._handles.get(cache_key)
+        if handle is not None:
+            self._handles.move_to_end(cache_key)
+            self.hits += 1
+            return handle
+
+        self.misses += 1
+        parent, remainder = self._cached_ancestor(hive, subkey)
+        if parent is not None:
+            handle = winreg.OpenKey(parent, remainder, 0, access)
+            self.relative_opens += 1
+        else:
+            handle = winreg.OpenKey(hive, subkey, 0, access)
+        self._handles[cache_key] = handle
+        self._paths.setdefault((hive, fold), set()).add(access)
+        while len(self._handles) > self.capacity:
+            evicted_key, evicted = self._handles.popitem(last=False)
+            self._forget(evicted_key)
+            evicted.Close()
+            self.evictions += 1
+        return handle
+
+    def _cached_ancestor(self, hive, subkey):
+        parts = subkey.split("\\")
+        for depth in range(len(parts) - 1, 0, -1):
+            ancestor = "\\".join(parts[:depth]).casefold()
+            accesses = self._paths.get((hive, ancestor))
+            if accesses:
+                cache_key = (hive, ancestor, next(iter(accesses)))
+                self._handles.move_to_end(cache_key)
+                return self._handles[cache_key], "\\".join(parts[depth:])
+        return None, subkey
+
+    def _forget(self, cache_key):
+        hive, fold, access = cache_key
+        accesses = self._paths.get((hive, fold))
+        if accesses is not None:
+            accesses.discard(access)
+            if not accesses:
+                del self._paths[(hive, fold)]
+
+    def invalidate(self, hive=None, subkey=""):
+        """Close cached handles for *subkey* and everything below it."""
+        prefix = subkey.casefold()
+        with self._lock:
+            for cache_key in list(self._handles):
+                cached_hive, fold, _ = cache_key
+                if hive is not None and cached_hive != hive:
+                    continue
+                if prefix and fold != prefix and not fold.startswith(prefix + "\\"):
+                    continue
+                self._forget(cache_key)
+                self._handles.pop(cache_key).Close()
+
+    def clear(self):
+        self.invalidate()
+
+
+class WinregBackend:
+    """``RegistryBackend`` over ``winreg`` with cached key handles."""
+
+    def __init__(self, key_cache_size=64):
+        if winreg is None:
+            raise RuntimeError("winreg is only available on Windows; pass a backend explicitly.")
+        self.key_cache = KeyHandleCache(key_cache_size)
+
+    def query_info(self, hive, path):
+        return KeyCounts(*self.key_cache.run(hive, path, winreg.KEY_READ, winreg.QueryInfoKey))
+
+    def last_write_time(self, hive, path):
+        return self.query_info(hive, path).last_write
+
+    def enum_keys(self, hive, path):
+        return self.key_cache.run(hive, path, winreg.KEY_READ, _enum_subkeys)
+
+    def enum_values(self, hive, path):
+        return self.key_cache.run(hive, path, winreg.KEY_READ, _enum_values)
+
+    def read_key(self, hive, path, unchanged_since=None, include_values=True, transient=False):
+        if transient:
+            with winreg.OpenKey(hive, path, 0, winreg.KEY_READ) as key:
+                return _read_open_key(key, unchanged_since, include_values)
+        return self.key_cache.run(
+            hive, path, winreg.KEY_READ,
+            lambda key: _read_open_key(key, unchanged_since, include_values),
+        )
+
+    def query_value(self, hive, path, name):
+        return self.key_cache.run(
+            hive, path, winreg.KEY_QUERY_VALUE,
+            lambda key: winreg.QueryValueEx(key, name),
+        )
+
+    def set_value(self, hive, path, name, data, value_type):
+        self.key_cache.run(
+            hive, path, winreg.KEY_SET_VALUE,
+            lambda key: winreg.SetValueEx(key, name, 0, value_type, data),
+        )
+
+    def delete_value(self, hive, path, name):
+        self.key_cache.run(
+            hive, path, winreg.KEY_SET_VALUE,
+            lambda key: winreg.DeleteValue(key, name),
+        )
+
+    def create_key(self, hive, path):
+        # A same-named key may have been deleted and re-created elsewhere;
+        # never keep serving handles that point at the old one.
+        self.key_cache.invalidate(hive, path)
+        with winreg.CreateKey(hive, path):
+            pass
+
+    def delete_key(self, hive, path):
+        self.key_cache.invalidate(hive, path)
+        winreg.DeleteKey(hive, path)
+
+    def open_key_session(self, hive, path):
+        # A private handle: batch access rights would only crowd the cache.
+        return _WinregKeySession(
+            winreg.OpenKey(hive, path, 0, winreg.KEY_QUERY_VALUE | winreg.KEY_SET_VALUE)
+        )
+
+
+class _WinregKeySession:
+    """One ``KEY_QUERY_VALUE | KEY_SET_VALUE`` handle for a batch of values."""
+
+    def __init__(self, key):
+        self._key = key
+
+    def query_value(self, name):
+        return winreg.QueryValueEx(self._key, name)
+
+    def set_value(self, name, data, value_type):
+        winreg.SetValueEx(self._key, name, 0, value_type, data)
+
+    def delete_value(self, name):
+        winreg.DeleteValue(self._key, name)
+
+    def last_write_time(self):
+        return winreg.QueryInfoKey(self._key)[2]
+
+    def close(self):
+        self._key.Close()
+
+
+def _mutation_error(operation, description):
+    """Run a registry write; return ``None`` or the error text."""
+    try:
+        operation()
+        return None
+    except Exception as e:
+        print(f"Error {description}: {e}")
+        return str(e)
+
+
+class KeySession:
+    """``read_value``/``write_value``/``delete_value`` bound to one open key.
+
+    Obtained from ``RegistryHandler.key_session``; errors are reported as
+    the handler's per-value methods report them.
+    """
+
+    def __init__(self, handler, session, subkey):
+        self.last_error = None
+        self._handler = handler
+        self._session = session
+        self._subkey = subkey
+
+    def read_value(self, name):
+        return self._handler._read_value(lambda: self._session.query_value(name), self._subkey)
+
+    def write_value(self, name, value, val_type):
+        return self._mutate(lambda: self._session.set_value(name, value, val_type), "writing value")
+
+    def delete_value(self, name):
+        return self._mutate(lambda: self._session.delete_value(name), "deleting value")
+
+    def last_write_time(self):
+        return self._handler._read_value(self._session.last_write_time, self._subkey, "read key")
+
+    def _mutate(self, operation, description):
+        # Kept per session as well, so concurrent sessions report their own.
+        self.last_error = self._handler.last_error = _mutation_error(operation, description)
+        return self.last_error is None
+
+
 class RegistryHandler:
-    def __init__(self, backup_folder="backups"):
+    def __init__(self, backup_folder="backups", key_cache_size=64, backend=None, journal=None):
         self.last_error = None
         self.backup_folder = os.fspath(backup_folder)
+        self.backend = backend if backend is not None else WinregBackend(key_cache_size)
+        # Optional ChangeJournal; change plans applied through this handler
+        # record their intent and outcome in it.
+        self.journal = journal
 
     def read_key(self, hive, subkey):
         try:
-            with winreg.OpenKey(hive, subkey, 0, winreg.KEY_READ) as key:
-                values = []
-                i = 0
-                while True:
-                    try:
-                        values.append(winreg.EnumValue(key, i))
-                        i += 1
-                    except OSError:
-                        break
-            return values
+            return self.backend.enum_values(hive, subkey)
         except FileNotFoundError:
             return None
         except PermissionError:
@@ -45,144 +328,190 @@ class RegistryHandler:
         Unlike ``read_key``, access and I/O errors are raised so callers never
         mistake an unreadable value for a value that does not exist.
         """
+        return self._read_value(lambda: self.backend.query_value(hive, subkey, name), subkey)
+
+    def last_write_time(self, hive, subkey):
+        """Return a key's last-write FILETIME, or ``None`` when it is absent.
+
+        Errors are raised as by ``read_value``.
+        """
+        return self._read_value(lambda: self.backend.last_write_time(hive, subkey), subkey, "read key")
+
+    def _read_value(self, query, subkey, operation="read value"):
         try:
-            with winreg.OpenKey(hive, subkey, 0, winreg.KEY_QUERY_VALUE) as key:
-                return winreg.QueryValueEx(key, name)
+            return query()
         except FileNotFoundError:
             return None
         except OSError as exc:
-            raise RegistryOperationError("read value", subkey, exc) from exc
+            raise RegistryOperationError(operation, subkey, exc) from exc
 
     def enum_keys(self, hive, subkey):
         try:
-            with winreg.OpenKey(hive, subkey, 0, winreg.KEY_READ) as key:
-                subkeys = []
-                i = 0
-                while True:
-                    try:
-                        subkeys.append(winreg.EnumKey(key, i))
-                        i += 1
-                    except OSError:
-                        break
-            return subkeys
+            return self.backend.enum_keys(hive, subkey)
         except Exception:
             return []
 
-    def write_value(self, hive, subkey, name, value, val_type):
-        self.last_error = None
+    def read_key_full(self, hive, subkey):
+        """Return a ``KeyInfo`` for one key from a single open, or ``None``.
+
+        ``QueryInfoKey`` supplies the subkey/value counts and last-write time,
+        so both listings are presized and no enumeration ends on an exception.
+        Access and I/O errors raise ``RegistryOperationError``.
+        """
         try:
-            with winreg.OpenKey(hive, subkey, 0, winreg.KEY_SET_VALUE) as key:
-                winreg.SetValueEx(key, name, 0, val_type, value)
-            return True
-        except Exception as e:
-            self.last_error = str(e)
-            print(f"Error writing value: {e}")
-            return False
+            return self.backend.read_key(hive, subkey)
+        except FileNotFoundError:
+            return None
+        except OSError as exc:
+            raise RegistryOperationError("read key", subkey, exc) from exc
+
+    def scan_key(self, hive, subkey, unchanged_since=None, include_values=True):
+        """Enumerate a key from one open, or return ``None`` if unreadable.
+
+        Returns a ``KeyInfo`` like ``read_key_full``. When *unchanged_since*
+        equals the key's current last-write time, enumeration is skipped and
+        ``subkeys``/``values`` are ``None``; Windows bumps a key's timestamp
+        whenever its values or direct subkeys change, so the caller's cached
+        listing is still current. ``include_values=False`` lists only subkeys
+        and leaves ``values`` empty.
+        """
+        # Transient: a tree walk touches each key once and would only evict
+        # the cached handles that point operations reuse.
+        try:
+            return self.backend.read_key(
+                hive, subkey, unchanged_since, include_values, transient=True
+            )
+        except OSError:
+            return None
+
+    def write_value(self, hive, subkey, name, value, val_type):
+        return self._mutate(
+            lambda: self.backend.set_value(hive, subkey, name, value, val_type), "writing value"
+        )
 
     def delete_value(self, hive, subkey, name):
+        return self._mutate(lambda: self.backend.delete_value(hive, subkey, name), "deleting value")
+
+    def _mutate(self, operation, description):
+        self.last_error = _mutation_error(operation, description)
+        return self.last_error is None
+
+    @contextmanager
+    def key_session(self, hive, subkey):
+        """Yield a ``KeySession`` that reads and writes values of one key.
+
+        The key is opened once for querying and setting values. When the
+        backend has no sessions, or that open fails, every call addresses
+        the key by path again, so results and errors always match the
+        per-value methods.
+        """
+        session = None
+        open_session = getattr(self.backend, "open_key_session", None)
+        if open_session is not None:
+            try:
+                session = open_session(hive, subkey)
+            except OSError:
+                pass
+        if session is None:
+            session = PathKeySession(self.backend, hive, subkey)
+        try:
+            yield KeySession(self, session, subkey)
+        finally:
+            session.close()
+
+    def create_key(self, hive, subkey):
         self.last_error = None
         try:
-            with winreg.OpenKey(hive, subkey, 0, winreg.KEY_SET_VALUE) as key:
-                winreg.DeleteValue(key, name)
+            self.backend.create_key(hive, subkey)
             return True
         except Exception as e:
             self.last_error = str(e)
-            print(f"Error deleting value: {e}")
+            print(f"Error creating key: {e}")
             return False
 
-    def create_key(self, hive, subkey):
+    def delete_key(self, hive, subkey):
+        """Delete an empty key; Windows refuses keys that still have subkeys."""
         self.last_error = None
         try:
-            with winreg.CreateKey(hive, subkey):
-                pass
+            self.backend.delete_key(hive, subkey)
             return True
         except Exception as e:
             self.last_error = str(e)
-            print(f"Error creating key: {e}")
+            print(f"Error deleting key: {e}")
             return False
             
     def backup_key(self, path, backup_folder=None):
+        """Export *path* (``HKEY_...\\Sub\\Key``) and its subtree to a new .reg file."""
+        return self.backup_keys([path], backup_folder)
+
+    def backup_keys(self, paths, backup_folder=None, recursive=True, missing_ok=False):
+        """Export several keys into one new .reg file in a single pass.
+
+        Returns the file path, or ``None`` with ``last_error`` set; a partial
+        export is removed rather than left looking like a valid backup.
+        *missing_ok* skips keys that do not exist yet.
+        """
         self.last_error = None
+        paths = list(paths)
         backup_folder = os.fspath(backup_folder or self.backup_folder)
         os.makedirs(backup_folder, exist_ok=True)
         
         timestamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S_%fZ")
-        key_label = path.rstrip("\\").split("\\")[-1] or "registry"
-        safe_label = "".join(c if c.isalnum() or c in "-_" else "_" for c in key_label)[:48]
+        key_label = paths[0].rstrip("\\").split("\\")[-1] if paths else ""
+        safe_label = "".join(c if c.isalnum() or c in "-_" else "_" for c in key_label or "registry")[:48]
         filename = f"{safe_label}_{timestamp}_{uuid.uuid4().hex[:8]}.reg"
         filepath = os.path.abspath(os.path.join(backup_folder, filename))
         
-        cmd = ['reg', 'export', path, filepath, '/y']
         try:
-            subprocess.run(
-                cmd,
-                check=True,
-                capture_output=True,
-                creationflags=getattr(subprocess, "CREATE_NO_WINDOW", 0),
-                timeout=60,
-            )
+            roots = [split_root(path) for path in paths]
+            export_to_file(self.backend, roots, filepath, recursive, missing_ok)
             return filepath
-        except (OSError, subprocess.SubprocessError) as e:
+        except (OSError, ValueError) as e:
             self.last_error = str(e)
             print(f"Backup failed: {e}")
+            try:
+                os.remove(filepath)
+            except OSError:
+                pass
             return None
 
     def restore_backup(self, filepath):
+        """Merge a .reg file into the registry in-process.
+
+        The file is applied as one guarded ``ChangePlan``: missing keys are
+        created first, every value write is verified, and a failed write
+        rolls the earlier ones back. Use ``reg_file.build_import_plan`` to
+        preview the same plan before applying it.
+        """
         self.last_error = None
         filepath = os.path.abspath(filepath)
         if not os.path.isfile(filepath) or not filepath.lower().endswith(".reg"):
             self.last_error = "Backup must be an existing .reg file."
             return False
-            
-        cmd = ['reg', 'import', filepath]
+
         try:
-            subprocess.run(
-                cmd,
-                check=True,
-                capture_output=True,
-                creationflags=getattr(subprocess, "CREATE_NO_WINDOW", 0),
-                timeout=60,
+            imported = build_import_plan(
+                self, parse_reg_file(filepath), f"Import {os.path.basename(filepath)}"
             )
-            return True
-        except (OSError, subprocess.SubprocessError) as e:
+        except (OSError, ValueError, RuntimeError) as e:
             self.last_error = str(e)
             print(f"Restore failed: {e}")
             return False
+        for hive, path in imported.keys:
+            if not self.create_key(hive, path):
+                return False
+        result = imported.plan.apply()
+        if not result.success:
+            self.last_error = result.message
+            print(f"Restore failed: {result.message}")
+        return result.success
 
-    def search_registry(self, hive, start_path, query, stop_event=None):
+    def search_registry(self, hive, start_path, query, stop_event=None, max_workers=None):
         """
-        Recursive search for keys or values containing the query.
+        Search keys and values below *start_path* for *query*.
         Returns a list of results: [{'path': ..., 'type': 'Key'|'Value', 'name': ...}, ...]
+        Result order across subtrees is unspecified when more than one worker is used.
         """
-        results = []
-        try:
-            # Check keys
-            subkeys = self.enum_keys(hive, start_path)
-            for sk in subkeys:
-                if stop_event and stop_event.is_set():
-                    return results
-                
-                full_sub_path = f"{start_path}\\{sk}" if start_path else sk
-                
-                if query.lower() in sk.lower():
-                    results.append({'path': full_sub_path, 'type': 'Key', 'name': sk})
-                
-                # Recurse
-                results.extend(self.search_registry(hive, full_sub_path, query, stop_event))
-            
-            # Check values
-            values = self.read_key(hive, start_path)
-            if values and not isinstance(values, str):
-                for name, data, type_ in values:
-                    if stop_event and stop_event.is_set():
-                        return results
-                    
-                    name_str = name if name else "(Default)"
-                    if query.lower() in name_str.lower() or query.lower() in str(data).lower():
-                        results.append({'path': start_path, 'type': 'Value', 'name': name_str, 'data': str(data)})
-                        
-        except Exception as e:
-            # Access denied or other errors are common in registry traversal
-            pass
-            
-        return results
+        return RegistrySearch(self, max_workers).search(
+            hive, start_path, query, stop_event
+        )
@@ -0,0 +1,250 @@
+"""Compile search expressions into a single registry match predicate.
+
+A query is a list of whitespace-separated terms that must all match::
+
+    type:REG_DWORD name:/^Hide/ data>=1 path:Software\\Microsoft\\*
+
+``type:`` accepts comma-separated type names or numbers, ``name:`` and
+``data:`` take a case-insensitive substring or a ``/regex/``, ``data`` also
+supports ``= != < <= > >=`` against integer data, and ``path:`` takes a
+case-insensitive glob over the key path. Other words must appear in the key
+name, value name, or value data. A query without any ``field:`` term keeps
+the legacy meaning: the whole text is one case-insensitive substring.
+"""
+
+from __future__ import annotations
+
+import fnmatch
+import operator
+import re
+
+
+class QuerySyntaxError(ValueError):
+    """Raised when a search expression cannot be compiled."""
+
+
+# Windows ABI type codes; the query language can filter on every type the
+# registry stores, not only the ones the editors support.
+TYPE_CODES = {
+    "REG_NONE": 0,
+    "REG_SZ": 1,
+    "REG_EXPAND_SZ": 2,
+    "REG_BINARY": 3,
+    "REG_DWORD": 4,
+    "REG_DWORD_BIG_ENDIAN": 5,
+    "REG_LINK": 6,
+    "REG_MULTI_SZ": 7,
+    "REG_RESOURCE_LIST": 8,
+    "REG_FULL_RESOURCE_DESCRIPTOR": 9,
+    "REG_RESOURCE_REQUIREMENTS_LIST": 10,
+    "REG_QWORD": 11,
+}
+
+_INTEGER_TYPES = frozenset((4, 5, 11))
+
+_COMPARISONS = {
+    "=": operator.eq,
+    "!=": operator.ne,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "<": operator.lt,
+    "<=": operator.le,
+}
+
+_TERM = re.compile(
+    r"""
+    (?:(?P<field>type|name|data|path)\s*(?P<op>:|!=|>=|<=|=|>|<)\s*)?
+    (?P<value>/(?:\\.|[^/\\])*/|"(?:[^"]|"")*"|\S+)
+    """,
+    re.VERBOSE | re.IGNORECASE,
+)
+
+_GLOB_SPECIAL = re.compile(r"[*?\[]")
+
+
+def _unquote(text):
+    if len(text) >= 2 and text[0] == text[-1] == '"':
+        return text[1:-1].replace('""', '"')
+    return text
+
+
+def _text_test(raw):
+    """Return ``test(text)`` for a substring or ``/regex/`` operand."""
+    if len(raw) >= 2 and raw[0] == raw[-1] == "/":
+        try:
+            pattern = re.compile(raw[1:-1], re.IGNORECASE)
+        except re.error as exc:
+            raise QuerySyntaxError(f"Invalid regular expression {raw}: {exc}") from exc
+        return lambda text: pattern.search(text) is not None
+    needle = _unquote(raw).casefold()
+    if not needle:
+        raise QuerySyntaxError("Empty search term.")
+    return lambda text: needle in text.casefold()
+
+
+def _parse_type_codes(raw):
+    codes = set()
+    for part in _unquote(raw).split(","):
+        label = part.strip().upper()
+        if not label:
+            continue
+        if label in TYPE_CODES:
+            codes.add(TYPE_CODES[label])
+        elif f"REG_{label}" in TYPE_CODES:
+            codes.add(TYPE_CODES[f"REG_{label}"])
+        else:
+            try:
+                codes.add(int(label, 0))
+            except ValueError:
+                raise QuerySyntaxError(f"Unknown registry type: {part.strip()}") from None
+    if not codes:
+        raise QuerySyntaxError("type: needs at least one registry type.")
+    return frozenset(codes)
+
+
+def _integer_data(data_text, value_type):
+    if value_type not in _INTEGER_TYPES:
+        return None
+    try:
+        return int(data_text)
+    except ValueError:
+        return None
+
+
+class SubstringMatcher:
+    """Case-insensitive substring test with the query folded exactly once."""
+
+    def __init__(self, query):
+        self.needle = query.casefold()
+
+    def may_contain(self, path):
+        return True
+
+    def wants_values(self, path):
+        return True
+
+    def match_key(self, path, name):
+        return self.needle in name.casefold()
+
+    def match_value(self, path, name, data_text, value_type):
+        return self.needle in name.casefold() or self.needle in data_text.casefold()
+
+
+class PathGlob:
+    """Case-insensitive glob over a key path plus its subtree-pruning prefix."""
+
+    def __init__(self, pattern):
+        folded = _unquote(pattern).strip("\\").casefold()
+        self.pattern = folded
+        self._regex = re.compile(fnmatch.translate(folded))
+        wildcard = _GLOB_SPECIAL.search(folded)
+        self.literal = folded[: wildcard.start()] if wildcard else folded
+        self.exact = wildcard is None
+
+    def matches(self, path):
+        return self._regex.match(path.casefold()) is not None
+
+    def may_contain(self, path):
+        """Whether *path* or any key below it could match."""
+        folded = path.casefold()
+        if not folded or self.literal.startswith(folded + "\\"):
+            return True
+        if self.exact:
+            return folded == self.literal
+        return folded.startswith(self.literal)
+
+
+class CompiledQuery:
+    """All predicates of one expression, applied without re-parsing.
+
+    Path globs also prune the walk: ``may_contain`` rejects whole subtrees
+    and ``wants_values`` skips value enumeration on keys that are merely on
+    the way to a matching subtree.
+    """
+
+    def __init__(self, path_globs, name_tests, type_codes, data_tests, bare_tests):
+        self.path_globs = tuple(path_globs)
+        self.name_tests = tuple(name_tests)
+        self.type_codes = type_codes
+        self.data_tests = tuple(data_tests)
+        self.bare_tests = tuple(bare_tests)
+        self.values_only = type_codes is not None or bool(self.data_tests)
+
+    def may_contain(self, path):
+        return all(glob.may_contain(path) for glob in self.path_globs)
+
+    def wants_values(self, path):
+        return all(glob.matches(path) for glob in self.path_globs)
+
+    def match_key(self, path, name):
+        if self.values_only:
+            return False
+        return (
+            all(glob.matches(path) for glob in self.path_globs)
+            and all(test(name) for test in self.name_tests)
+            and all(test(name) for test in self.bare_tests)
+        )
+
+    def match_value(self, path, name, data_text, value_type):
+        if self.type_codes is not None and value_type not in self.type_codes:
+            return False
+        return (
+            all(glob.matches(path) for glob in self.path_globs)
+            and all(test(name) for test in self.name_tests)
+            and all(test(data_text, value_type) for test in self.data_tests)
+            and all(test(name) or test(data_text) for test in self.bare_tests)
+        )
+
+
+def _data_test(op, raw):
+    if op == ":":
+        text_test = _text_test(raw)
+        return lambda data_text, value_type: text_test(data_text)
+    try:
+        expected = int(_unquote(raw), 0)
+    except ValueError:
+        if op not in ("=", "!="):
+            raise QuerySyntaxError(f"data{op} needs an integer, got {raw}.") from None
+        folded = _unquote(raw).casefold()
+        equal = op == "="
+        return lambda data_text, value_type: (data_text.casefold() == folded) is equal
+    compare = _COMPARISONS[op]
+
+    def test(data_text, value_type):
+        number = _integer_data(data_text, value_type)
+        return number is not None and compare(number, expected)
+
+    return test
+
+
+def compile_query(text):
+    """Compile *text* into a matcher usable by ``RegistrySearch``/``SearchIndex``."""
+    if not isinstance(text, str):
+        raise QuerySyntaxError("Search queries must be text.")
+    terms = [match for match in _TERM.finditer(text)]
+    if not any(match.group("field") for match in terms):
+        return SubstringMatcher(text)
+
+    path_globs = []
+    name_tests = []
+    data_tests = []
+    bare_tests = []
+    type_codes = None
+    for match in terms:
+        field = (match.group("field") or "").lower()
+        op = match.group("op")
+        raw = match.group("value")
+        if not field:
+            bare_tests.append(_text_test(raw))
+        elif field == "data":
+            data_tests.append(_data_test(op, raw))
+        elif op != ":":
+            raise QuerySyntaxError(f"{field} only supports ':'; use data{op} for comparisons.")
+        elif field == "type":
+            codes = _parse_type_codes(raw)
+            type_codes = codes if type_codes is None else type_codes & codes
+        elif field == "name":
+            name_tests.append(_text_test(raw))
+        else:
+            path_globs.append(PathGlob(raw))
+    return CompiledQuery(path_globs, name_tests, type_codes, data_tests, bare_tests)
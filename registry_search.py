@@ -0,0 +1,227 @@
+"""Iterative, multi-threaded registry search."""
+
+from __future__ import annotations
+
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from registry_query import compile_query
+
+
+def default_worker_count():
+    """Bounded pool size; registry I/O releases the GIL, CPU work does not."""
+    return min(8, (os.cpu_count() or 1) + 2)
+
+
+def _join_path(parent, child):
+    return f"{parent}\\{child}" if parent else child
+
+
+def make_matcher(query):
+    """Return a matcher for *query*, which may already be a compiled matcher."""
+    return compile_query(query) if isinstance(query, str) else query
+
+
+def key_result(path, name):
+    return {"path": path, "type": "Key", "name": name}
+
+
+def value_result(path, name_text, data_text):
+    return {"path": path, "type": "Value", "name": name_text, "data": data_text}
+
+
+class _StopView:
+    """Adapt a predicate to the ``is_set`` surface of ``threading.Event``."""
+
+    def __init__(self, predicate):
+        self.is_set = predicate
+
+
+class RegistrySearch:
+    """Walk a registry subtree once, without recursion, and collect matches.
+
+    Pending keys live on an explicit work queue so arbitrarily deep trees never
+    touch the interpreter recursion limit. Each key is opened exactly once via
+    ``handler.scan_key`` and independent subtrees are spread across a bounded
+    pool of worker threads; ``winreg`` releases the GIL around its system
+    calls, so several keys can be enumerated concurrently.
+    """
+
+    def __init__(self, handler, max_workers=None):
+        self.handler = handler
+        self.max_workers = max(1, max_workers or default_worker_count())
+        self.keys_scanned = 0
+        self._counter_lock = threading.Lock()
+
+    def search(self, hive, start_path, query, stop_event=None):
+        """Return every match below *start_path* as a list of result dicts."""
+        results = []
+        lock = threading.Lock()
+
+        def collect(batch):
+            with lock:
+                results.extend(batch)
+
+        self.walk(hive, start_path, query, collect, stop_event)
+        return results
+
+    def iter_batches(
+        self, hive, start_path, query, stop_event=None, max_pending=64, heartbeat=0.1
+    ):
+        """Yield lists of matches as soon as each key has been scanned.
+
+        The walk runs on a background thread and hands batches over a queue of
+        at most *max_pending* entries, so a slow consumer throttles the scan
+        instead of letting results pile up in memory. An empty list is yielded
+        every *heartbeat* seconds without matches so callers can refresh
+        progress. Closing the generator cancels the walk.
+        """
+        caller_stop = stop_event
+        stop_event = threading.Event()
+        handoff = queue.Queue(maxsize=max_pending)
+        finished = object()
+        failure = []
+
+        def stopped():
+            return stop_event.is_set() or (caller_stop is not None and caller_stop.is_set())
+
+        def emit(batch):
+            while not stopped():
+                try:
+                    handoff.put(batch, timeout=heartbeat)
+                    return
+                except queue.Full:
+                    continue
+
+        def produce():
+            try:
+                self.walk(hive, start_path, query, emit, _StopView(stopped))
+            except BaseException as exc:
+                failure.append(exc)
+            finally:
+                while True:
+                    try:
+                        handoff.put(finished, timeout=heartbeat)
+                        break
+                    except queue.Full:
+                        if stop_event.is_set():
+                            break
+
+        producer = threading.Thread(
+            target=produce, name="registry-search-producer", daemon=True
+        )
+        producer.start()
+        try:
+            while True:
+                try:
+                    batch = handoff.get(timeout=heartbeat)
+                except queue.Empty:
+                    yield []
+                    continue
+                if batch is finished:
+                    break
+                yield batch
+        finally:
+            stop_event.set()
+            producer.join()
+        if failure:
+            raise failure[0]
+
+    def walk(self, hive, start_path, query, emit, stop_event=None):
+        """Scan the subtree and call ``emit(batch)`` with each key's matches.
+
+        *emit* may be called from worker threads, never concurrently for the
+        same key, and only with non-empty batches.
+        """
+        matcher = make_matcher(query)
+        stop_event = stop_event or threading.Event()
+
+        def visit(path):
+            wants_values = matcher.wants_values(path)
+            scanned = self._scan(hive, path, wants_values)
+            with self._counter_lock:
+                self.keys_scanned += 1
+            if scanned is None:
+                return ()
+            subkeys, values = scanned[0], scanned[1] if wants_values else ()
+            batch = []
+            children = []
+            for subkey in subkeys:
+                child = _join_path(path, subkey)
+                # Subtrees that cannot match are never opened at all.
+                if not matcher.may_contain(child):
+                    continue
+                children.append(child)
+                if matcher.match_key(child, subkey):
+                    batch.append(key_result(child, subkey))
+            for name, data, value_type in values:
+                name_text = name if name else "(Default)"
+                data_text = str(data)
+                if matcher.match_value(path, name_text, data_text, value_type):
+                    batch.append(value_result(path, name_text, data_text))
+            if batch and not stop_event.is_set():
+                emit(batch)
+            return children
+
+        if self.max_workers == 1:
+            self._walk_serial(start_path, visit, stop_event)
+        else:
+            self._walk_parallel(start_path, visit, stop_event)
+
+    def _scan(self, hive, path, include_values=True):
+        scan_key = getattr(self.handler, "scan_key", None)
+        try:
+            if scan_key is not None:
+                if include_values:
+                    return scan_key(hive, path)
+                return scan_key(hive, path, include_values=False)
+            if not include_values:
+                return self.handler.enum_keys(hive, path), ()
+            values = self.handler.read_key(hive, path)
+            if isinstance(values, str):
+                values = None
+            return self.handler.enum_keys(hive, path), values or []
+        except Exception:
+            # Access denied and races with deleted keys are routine during a
+            # full traversal; an unreadable key simply contributes nothing.
+            return None
+
+    def _walk_serial(self, start_path, visit, stop_event):
+        pending = [start_path]
+        while pending and not stop_event.is_set():
+            children = visit(pending.pop())
+            # Reverse so siblings are visited in enumeration order.
+            pending.extend(reversed(children))
+
+    def _walk_parallel(self, start_path, visit, stop_event):
+        pending = queue.Queue()
+        pending.put(start_path)
+        errors = []
+
+        def worker():
+            while True:
+                path = pending.get()
+                try:
+                    if path is None:
+                        return
+                    if not stop_event.is_set() and not errors:
+                        for child in visit(path):
+                            pending.put(child)
+                except BaseException as exc:
+                    errors.append(exc)
+                finally:
+                    pending.task_done()
+
+        with ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="registry-search"
+        ) as pool:
+            futures = [pool.submit(worker) for _ in range(self.max_workers)]
+            # Once stopped, workers drain the queue without scanning, so the
+            # join below returns promptly after a cancellation.
+            pending.join()
+            for _ in futures:
+                pending.put(None)
+        if errors:
+            raise errors[0]
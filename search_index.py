@@ -0,0 +1,377 @@
+"""Persistent SQLite snapshot of the registry tree for instant repeat searches."""
+
+from __future__ import annotations
+
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+
+from registry_query import SubstringMatcher
+from registry_search import key_result, make_matcher, value_result
+
+
+SCHEMA_VERSION = "1"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS keys (
+    id INTEGER PRIMARY KEY,
+    hive INTEGER NOT NULL,
+    parent_id INTEGER,
+    path TEXT NOT NULL,
+    path_fold TEXT NOT NULL,
+    last_write INTEGER NOT NULL,
+    UNIQUE (hive, path_fold)
+);
+CREATE INDEX IF NOT EXISTS keys_parent ON keys (parent_id);
+CREATE TABLE IF NOT EXISTS entries (
+    id INTEGER PRIMARY KEY,
+    key_id INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    name TEXT NOT NULL,
+    value_type INTEGER,
+    data TEXT
+);
+CREATE INDEX IF NOT EXISTS entries_key ON entries (key_id, kind);
+"""
+
+# External-content FTS keeps only the trigram postings, not a second copy of
+# the text. Older SQLite builds without the trigram tokenizer fall back to a
+# plain scan of ``entries``.
+_FTS_SCHEMA = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS entries_fts USING fts5("
+    "name, data, content='entries', content_rowid='id', tokenize='trigram')"
+)
+
+# Rows with kind 'K' hold a key's own name; 'V' rows hold one value each.
+_KEY_ROW = "K"
+_VALUE_ROW = "V"
+
+
+class SearchIndexError(RuntimeError):
+    """Raised when the on-disk index cannot be opened or updated."""
+
+
+@dataclass(frozen=True)
+class IndexStatus:
+    hive: int | None
+    root: str
+    refreshed_at: str | None
+    complete: bool
+    key_count: int
+    value_count: int
+
+    @property
+    def built(self):
+        return self.refreshed_at is not None
+
+    def age_seconds(self, now=None):
+        if not self.refreshed_at:
+            return None
+        refreshed = datetime.fromisoformat(self.refreshed_at)
+        return ((now or datetime.now(timezone.utc)) - refreshed).total_seconds()
+
+
+@dataclass(frozen=True)
+class RefreshStats:
+    keys_visited: int
+    keys_rescanned: int
+    keys_reused: int
+    keys_removed: int
+    elapsed: float
+    complete: bool
+
+
+def _child_path(parent, name):
+    return f"{parent}\\{name}" if parent else name
+
+
+def _under(path_fold, root_fold):
+    return not root_fold or path_fold == root_fold or path_fold.startswith(root_fold + "\\")
+
+
+class SearchIndex:
+    """Snapshot of key paths, value names, types and text, kept under app data.
+
+    ``refresh`` re-enumerates only keys whose last-write time changed since
+    the previous pass; an unchanged key reuses its stored values and child
+    list. Searches then run against SQLite and never touch the registry, so
+    results reflect the index as of ``status().refreshed_at``.
+    """
+
+    def __init__(self, db_path, handler):
+        self.db_path = os.fspath(db_path)
+        self.handler = handler
+        self._write_lock = threading.Lock()
+        self.fts_enabled = False
+        conn = self._connect()
+        try:
+            with conn:
+                conn.executescript(_SCHEMA)
+                try:
+                    conn.execute(_FTS_SCHEMA)
+                    self.fts_enabled = True
+                except sqlite3.OperationalError:
+                    self.fts_enabled = False
+                version = self._meta(conn, "schema_version")
+                if version not in (None, SCHEMA_VERSION):
+                    raise SearchIndexError(
+                        f"Unsupported search index schema {version!r} in {self.db_path}."
+                    )
+                self._set_meta(conn, "schema_version", SCHEMA_VERSION)
+        except sqlite3.Error as exc:
+            raise SearchIndexError(f"Could not initialize search index: {exc}") from exc
+        finally:
+            conn.close()
+
+    def _connect(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        try:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+        except sqlite3.Error as exc:
+            raise SearchIndexError(f"Could not open search index {self.db_path}: {exc}") from exc
+        return conn
+
+    @staticmethod
+    def _meta(conn, name):
+        row = conn.execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    @staticmethod
+    def _set_meta(conn, name, value):
+        conn.execute(
+            "INSERT INTO meta (name, value) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = excluded.value",
+            (name, str(value)),
+        )
+
+    def status(self):
+        conn = self._connect()
+        try:
+            hive = self._meta(conn, "hive")
+            return IndexStatus(
+                hive=int(hive) if hive is not None else None,
+                root=self._meta(conn, "root") or "",
+                refreshed_at=self._meta(conn, "refreshed_at"),
+                complete=self._meta(conn, "complete") == "1",
+                key_count=conn.execute("SELECT COUNT(*) FROM keys").fetchone()[0],
+                value_count=conn.execute(
+                    "SELECT COUNT(*) FROM entries WHERE kind = ?", (_VALUE_ROW,)
+                ).fetchone()[0],
+            )
+        finally:
+            conn.close()
+
+    def covers(self, hive, start_path):
+        status = self.status()
+        return (
+            status.built
+            and status.hive == hive
+            and _under(start_path.casefold(), status.root.casefold())
+        )
+
+    # --- Refresh ---
+
+    def refresh(self, hive, root="", stop_event=None):
+        """Bring the index for *root* up to date and return ``RefreshStats``."""
+        started = time.perf_counter()
+        with self._write_lock:
+            conn = self._connect()
+            try:
+                with conn:
+                    stats = self._refresh(conn, hive, root, stop_event)
+                    self._set_meta(conn, "refreshed_at", datetime.now(timezone.utc).isoformat())
+                    self._set_meta(conn, "complete", "1" if stats["complete"] else "0")
+            except sqlite3.Error as exc:
+                raise SearchIndexError(f"Search index refresh failed: {exc}") from exc
+            finally:
+                conn.close()
+        return RefreshStats(elapsed=time.perf_counter() - started, **stats)
+
+    def _refresh(self, conn, hive, root, stop_event):
+        if self._meta(conn, "hive") != str(hive) or (
+            (self._meta(conn, "root") or "").casefold() != root.casefold()
+        ):
+            self._clear(conn)
+            self._set_meta(conn, "hive", hive)
+            self._set_meta(conn, "root", root)
+
+        visited = rescanned = reused = removed = 0
+        pending = [(root, None)]
+        while pending:
+            if stop_event is not None and stop_event.is_set():
+                break
+            path, parent_id = pending.pop()
+            visited += 1
+            row = conn.execute(
+                "SELECT id, last_write FROM keys WHERE hive = ? AND path_fold = ?",
+                (hive, path.casefold()),
+            ).fetchone()
+            scan = self.handler.scan_key(hive, path, row[1] if row else None)
+
+            if scan is None:
+                if row:
+                    removed += self._delete_subtree(conn, hive, path.casefold())
+                continue
+
+            if scan.subkeys is None:
+                reused += 1
+                key_id = row[0]
+                children = conn.execute(
+                    "SELECT path FROM keys WHERE parent_id = ?", (key_id,)
+                ).fetchall()
+                pending.extend((child_path, key_id) for (child_path,) in children)
+                continue
+
+            rescanned += 1
+            if row:
+                key_id = row[0]
+                conn.execute(
+                    "UPDATE keys SET last_write = ?, path = ? WHERE id = ?",
+                    (scan.last_write, path, key_id),
+                )
+                self._delete_entries(conn, "key_id = ? AND kind = ?", (key_id, _VALUE_ROW))
+                current = {name.casefold() for name in scan.subkeys}
+                for child_id, child_path in conn.execute(
+                    "SELECT id, path FROM keys WHERE parent_id = ?", (key_id,)
+                ).fetchall():
+                    if child_path.rpartition("\\")[2].casefold() not in current:
+                        removed += self._delete_subtree(conn, hive, child_path.casefold())
+            else:
+                key_id = conn.execute(
+                    "INSERT INTO keys (hive, parent_id, path, path_fold, last_write) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (hive, parent_id, path, path.casefold(), scan.last_write),
+                ).lastrowid
+                if path.casefold() != root.casefold():
+                    self._insert_entries(
+                        conn,
+                        [(key_id, _KEY_ROW, path.rpartition("\\")[2], None, None)],
+                    )
+
+            self._insert_entries(
+                conn,
+                [
+                    (key_id, _VALUE_ROW, name or "(Default)", value_type, str(data))
+                    for name, data, value_type in scan.values
+                ],
+            )
+            # Reversed so siblings are visited in enumeration order.
+            pending.extend(
+                (_child_path(path, name), key_id) for name in reversed(scan.subkeys)
+            )
+
+        if pending:
+            # A stopped pass has stamped some parents current before all of
+            # their children were inserted. Forget those stamps so the next
+            # refresh enumerates the parents again instead of reusing them.
+            conn.executemany(
+                "UPDATE keys SET last_write = -1 WHERE id = ?",
+                [(key_id,) for key_id in {parent_id for _, parent_id in pending} if key_id is not None],
+            )
+
+        return {
+            "keys_visited": visited,
+            "keys_rescanned": rescanned,
+            "keys_reused": reused,
+            "keys_removed": removed,
+            "complete": not pending,
+        }
+
+    def _insert_entries(self, conn, rows):
+        if not rows:
+            return
+        if not self.fts_enabled:
+            conn.executemany(
+                "INSERT INTO entries (key_id, kind, name, value_type, data) VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+            return
+        for row in rows:
+            entry_id = conn.execute(
+                "INSERT INTO entries (key_id, kind, name, value_type, data) VALUES (?, ?, ?, ?, ?)",
+                row,
+            ).lastrowid
+            conn.execute(
+                "INSERT INTO entries_fts (rowid, name, data) VALUES (?, ?, ?)",
+                (entry_id, row[2], row[4]),
+            )
+
+    def _delete_entries(self, conn, where, params):
+        if self.fts_enabled:
+            conn.execute(
+                "INSERT INTO entries_fts (entries_fts, rowid, name, data) "
+                f"SELECT 'delete', id, name, data FROM entries WHERE {where}",
+                params,
+            )
+        conn.execute(f"DELETE FROM entries WHERE {where}", params)
+
+    def _delete_subtree(self, conn, hive, path_fold):
+        if not path_fold:
+            removed = conn.execute("SELECT COUNT(*) FROM keys").fetchone()[0]
+            self._clear(conn)
+            return removed
+        subtree = "hive = ? AND (path_fold = ? OR substr(path_fold, 1, ?) = ?)"
+        params = (hive, path_fold, len(path_fold) + 1, path_fold + "\\")
+        self._delete_entries(
+            conn, f"key_id IN (SELECT id FROM keys WHERE {subtree})", params
+        )
+        return conn.execute(f"DELETE FROM keys WHERE {subtree}", params).rowcount
+
+    def _clear(self, conn):
+        conn.execute("DELETE FROM entries")
+        conn.execute("DELETE FROM keys")
+        if self.fts_enabled:
+            conn.execute("INSERT INTO entries_fts (entries_fts) VALUES ('delete-all')")
+
+    # --- Search ---
+
+    def search(self, hive, start_path, query, stop_event=None):
+        results = []
+        for batch in self.iter_batches(hive, start_path, query, stop_event):
+            results.extend(batch)
+        return results
+
+    def iter_batches(self, hive, start_path, query, stop_event=None, batch_size=512):
+        """Yield result batches shaped exactly like ``RegistrySearch`` output."""
+        matcher = make_matcher(query)
+        start_fold = start_path.casefold()
+        sql = (
+            "SELECT k.path, k.path_fold, e.kind, e.name, e.value_type, e.data "
+            "FROM entries AS e JOIN keys AS k ON k.id = e.key_id "
+            "WHERE k.hive = ? AND (? = '' OR k.path_fold = ? OR substr(k.path_fold, 1, ?) = ?)"
+        )
+        params = [hive, start_fold, start_fold, len(start_fold) + 1, start_fold + "\\"]
+        if (
+            self.fts_enabled
+            and isinstance(matcher, SubstringMatcher)
+            and len(matcher.needle) >= 3
+        ):
+            sql += " AND e.id IN (SELECT rowid FROM entries_fts WHERE entries_fts MATCH ?)"
+            params.append('"' + matcher.needle.replace('"', '""') + '"')
+        sql += " ORDER BY e.id"
+
+        conn = self._connect()
+        try:
+            cursor = conn.execute(sql, params)
+            while not (stop_event is not None and stop_event.is_set()):
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                batch = []
+                for path, path_fold, kind, name, value_type, data in rows:
+                    if kind == _KEY_ROW:
+                        if path_fold != start_fold and matcher.match_key(path, name):
+                            batch.append(key_result(path, name))
+                        continue
+                    # Value rows store the display name, as search results do.
+                    if matcher.match_value(path, name, data, value_type):
+                        batch.append(value_result(path, name, data))
+                yield batch
+        finally:
+            conn.close()
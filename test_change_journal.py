@@ -0,0 +1,154 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from change_journal import ChangeJournal, JournalError
+from change_manager import ApplyStatus, ChangePlan
+from file_lock import FileLockError
+from registry_backend import (
+    HKEY_CURRENT_USER,
+    REG_BINARY,
+    REG_DWORD,
+    REG_SZ,
+    InMemoryRegistryBackend,
+)
+from registry_handler import RegistryHandler
+
+
+HIVE = HKEY_CURRENT_USER
+PATH = r"Software\JournalTests"
+
+
+class Crash(BaseException):
+    """Stands in for the process dying in the middle of a write."""
+
+
+class CrashingBackend(InMemoryRegistryBackend):
+    def __init__(self):
+        super().__init__()
+        self.crash_after = None
+
+    def _set_node(self, node, name, data, value_type):
+        if self.crash_after is not None:
+            if self.crash_after == 0:
+                raise Crash()
+            self.crash_after -= 1
+        super()._set_node(node, name, data, value_type)
+
+
+class TestChangeJournal(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = Path(self.temp_dir.name) / "change_journal.jsonl"
+        self.backend = CrashingBackend()
+        self.handler = RegistryHandler(backend=self.backend, journal=ChangeJournal(self.path))
+        self.handler.create_key(HIVE, PATH)
+        self.handler.write_value(HIVE, PATH, "Existing", "old", REG_SZ)
+
+    def tearDown(self):
+        self.handler.journal.close()
+        self.temp_dir.cleanup()
+
+    def plan(self):
+        plan = ChangePlan(self.handler, "Journaled")
+        plan.set_values(HIVE, PATH, [
+            ("Existing", "new", REG_SZ),
+            ("Added", 5, REG_DWORD),
+            ("Blob", b"\x00\xff", REG_BINARY),
+        ])
+        return plan
+
+    def test_finished_plans_leave_an_empty_journal(self):
+        self.assertTrue(self.plan().apply().success)
+
+        self.assertEqual(self.path.read_bytes(), b"")
+        self.assertEqual(self.handler.journal.interrupted(), [])
+
+    def test_interrupted_plan_is_found_and_rolled_back(self):
+        self.backend.crash_after = 2
+        with self.assertRaises(Crash):
+            self.plan().apply()
+        self.handler.journal.close()
+        self.backend.crash_after = None
+
+        journal = ChangeJournal(self.path)
+        self.handler.journal = journal
+        [interrupted] = journal.interrupted()
+        self.assertEqual(interrupted.label, "Journaled")
+        self.assertEqual(len(interrupted.changes), 3)
+        self.assertEqual(self.handler.read_value(HIVE, PATH, "Added"), (5, REG_DWORD))
+
+        result = journal.recover(self.handler, interrupted)
+
+        self.assertEqual(result.status, ApplyStatus.ROLLED_BACK)
+        self.assertEqual(result.rolled_back_count, 2)
+        self.assertEqual(self.handler.read_key(HIVE, PATH), [("Existing", "old", REG_SZ)])
+        self.assertEqual(journal.interrupted(), [])
+        self.assertEqual(self.path.read_bytes(), b"")
+
+    def test_recovery_does_not_overwrite_later_changes(self):
+        self.backend.crash_after = 1
+        with self.assertRaises(Crash):
+            self.plan().apply()
+        self.backend.crash_after = None
+        self.handler.write_value(HIVE, PATH, "Existing", "edited since", REG_SZ)
+
+        [interrupted] = self.handler.journal.interrupted()
+        result = self.handler.journal.recover(self.handler, interrupted)
+
+        self.assertEqual(result.status, ApplyStatus.ROLLBACK_FAILED)
+        self.assertEqual(result.rollback_errors[0].code, "rollback_conflict")
+        self.assertEqual(self.handler.read_value(HIVE, PATH, "Existing"), ("edited since", REG_SZ))
+
+    def test_unwritable_journal_stops_the_plan_before_any_write(self):
+        self.path.mkdir()
+
+        result = self.plan().apply()
+
+        self.assertEqual(result.status, ApplyStatus.FAILED)
+        self.assertEqual(result.error.code, "journal_failed")
+        self.assertEqual(self.handler.read_value(HIVE, PATH, "Existing"), ("old", REG_SZ))
+
+    def test_closed_journal_fails_the_plan_instead_of_raising(self):
+        self.handler.journal.close()
+
+        result = self.plan().apply()
+
+        self.assertEqual(result.status, ApplyStatus.FAILED)
+        self.assertEqual(result.error.code, "journal_failed")
+        self.assertIn("closed", result.error.message)
+        self.assertEqual(self.handler.read_value(HIVE, PATH, "Existing"), ("old", REG_SZ))
+
+    def test_torn_final_record_is_ignored_but_damage_elsewhere_is_not(self):
+        self.backend.crash_after = 0
+        with self.assertRaises(Crash):
+            self.plan().apply()
+        self.handler.journal.close()
+
+        with open(self.path, "ab") as stream:
+            stream.write(b'{"op":"end","id":"trunc')
+        reopened = ChangeJournal(self.path)
+        self.assertEqual(len(reopened.interrupted()), 1)
+        reopened.close()
+
+        with open(self.path, "ab") as stream:
+            stream.write(b'\n{"op":"end"}\n')
+        with self.assertRaises(JournalError):
+            ChangeJournal(self.path)
+
+    def test_a_journal_in_use_by_another_process_is_refused(self):
+        plan = self.plan()
+        entry = self.handler.journal.begin(plan, plan.effective_changes)
+
+        with self.assertRaises(FileLockError):
+            ChangeJournal(self.path)
+
+        entry.finish(ApplyStatus.SUCCESS)
+        self.handler.journal.close()
+        reopened = ChangeJournal(self.path)
+        self.assertEqual(reopened.interrupted(), [])
+        reopened.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -7,7 +7,10 @@ from change_manager import (
     ChangePlan,
     DuplicateOperationError,
     PlanSealedError,
+    ValueSnapshot,
+    merge_plans,
 )
+from registry_backend import KeyInfo, filetime_now
 
 
 HIVE = 0x80000001
@@ -52,6 +55,55 @@ class FakeRegistryHandler:
         return True
 
 
+class KeyReadingHandler(FakeRegistryHandler):
+    """Adds the handler's bulk key read and counts key and value reads."""
+
+    def __init__(self, initial=None, **kwargs):
+        super().__init__(initial, **kwargs)
+        self.key_reads = 0
+        self.value_reads = 0
+
+    def read_value(self, hive, path, name):
+        self.value_reads += 1
+        return super().read_value(hive, path, name)
+
+    def read_key_full(self, hive, path):
+        self.key_reads += 1
+        fold = path.casefold()
+        values = [
+            (name, *copy.deepcopy(value))
+            for (value_hive, value_path, name), value in self.values.items()
+            if value_hive == hive and value_path == fold
+        ]
+        return KeyInfo([], values, 0) if values else None
+
+
+class StampedHandler(KeyReadingHandler):
+    """Adds key last-write times that move on every write, as Windows does."""
+
+    def __init__(self, initial=None, **kwargs):
+        super().__init__(initial, **kwargs)
+        self.stamps = {}
+
+    def touch(self, path):
+        self.stamps[path.casefold()] = self.stamps.get(path.casefold(), 1000) + 1
+
+    def last_write_time(self, hive, path):
+        return self.stamps.get(path.casefold(), 1000)
+
+    def read_key_full(self, hive, path):
+        info = super().read_key_full(hive, path)
+        return info and info._replace(last_write=self.last_write_time(hive, path))
+
+    def write_value(self, hive, path, name, value, value_type):
+        self.touch(path)
+        return super().write_value(hive, path, name, value, value_type)
+
+    def delete_value(self, hive, path, name):
+        self.touch(path)
+        return super().delete_value(hive, path, name)
+
+
 class TestChangePlan(unittest.TestCase):
     def key(self, path, name):
         return HIVE, path.casefold(), name.casefold()
@@ -202,6 +254,42 @@ class TestChangePlan(unittest.TestCase):
             (["one", "two"], 7),
         )
 
+    def test_snapshots_are_slotted_and_never_copy_immutable_data(self):
+        payload = b"\x00" * 64
+        snapshot = ValueSnapshot.existing(payload, 3)
+
+        self.assertIs(snapshot.value, payload)
+        self.assertFalse(hasattr(snapshot, "__dict__"))
+        self.assertIs(ValueSnapshot.missing(), ValueSnapshot.missing())
+        self.assertEqual(ValueSnapshot.existing(bytearray(b"ab"), 3).value, b"ab")
+
+    def test_interned_plans_share_equal_payloads(self):
+        handler = FakeRegistryHandler()
+        plan = ChangePlan(handler, intern_payloads=True)
+        plan.set_values(HIVE, "Software", [
+            ("A", b"same" * 8, 3), ("B", b"same" * 8, 3),
+            ("C", ["x", "y"], 7), ("D", ["x", "y"], 7),
+            ("E", 1, 4), ("F", "1", 1),
+        ])
+        after = [change.after for change in plan.changes]
+
+        self.assertIs(after[0], after[1])
+        self.assertIs(after[2].value, after[3].value)
+        self.assertIs(plan.changes[0].before, plan.changes[5].before)
+        self.assertEqual((after[4].value, after[5].value), (1, "1"))
+        self.assertTrue(plan.apply().success)
+        self.assertEqual(handler.values[self.key("Software", "D")], (["x", "y"], 7))
+
+    def test_payload_bytes_counts_snapshot_data_as_stored(self):
+        handler = FakeRegistryHandler({self.key("Software", "Blob"): (b"\x00" * 100, 3)})
+        plan = ChangePlan(handler)
+        plan.set_value(HIVE, "Software", "Blob", b"\x01" * 40, 3)
+        plan.set_value(HIVE, "Software", "Text", "abc", 1)
+        plan.set_value(HIVE, "Software", "List", ["a", "bc"], 7)
+        plan.delete_value(HIVE, "Software", "Missing")
+
+        self.assertEqual(plan.payload_bytes, 100 + 40 + 8 + (4 + 6 + 2))
+
     def test_plan_can_only_execute_once(self):
         handler = FakeRegistryHandler()
         plan = ChangePlan(handler)
@@ -223,6 +311,170 @@ class TestChangePlan(unittest.TestCase):
         self.assertTrue(result.success)
         self.assertEqual(handler.operation_count, 0)
 
+    def test_sealed_plan_keeps_one_preview(self):
+        handler = FakeRegistryHandler({self.key("Software", "Same"): (1, 4)})
+        plan = ChangePlan(handler)
+        plan.set_value(HIVE, "Software", "Same", 1, 4)
+        self.assertIsNot(plan.preview(), plan.preview())
+        plan.set_value(HIVE, "Software", "New", 2, 4)
+
+        preview = plan.seal().preview()
+        counts = preview.counts
+        counts[ChangeClassification.ADD] = 99
+
+        self.assertIs(plan.preview(), preview)
+        self.assertIs(plan.effective_changes, preview.effective_changes)
+        self.assertEqual(len(preview.changes), 2)
+        self.assertEqual(preview.counts[ChangeClassification.ADD], 1)
+        self.assertEqual(preview.counts[ChangeClassification.NO_CHANGE], 1)
+
+
+class TestBatchedPlanning(unittest.TestCase):
+    def key(self, path, name):
+        return HIVE, path.casefold(), name.casefold()
+
+    def test_set_values_reads_each_key_once(self):
+        handler = KeyReadingHandler({
+            self.key("Software\\Demo", "Keep"): (1, 4),
+            self.key("Software\\Demo", "Change"): ("old", 1),
+        })
+        plan = ChangePlan(handler)
+        plan.set_values(HIVE, "Software\\Demo", [
+            ("KEEP", 1, 4), ("Change", "new", 1), ("Added", b"\x01", 3),
+        ])
+        plan.delete_values(HIVE, "Software\\Other", ["A", "B"])
+
+        self.assertEqual((handler.key_reads, handler.value_reads), (2, 0))
+        self.assertEqual(
+            [change.classification for change in plan.preview().changes],
+            [
+                ChangeClassification.NO_CHANGE,
+                ChangeClassification.MODIFY,
+                ChangeClassification.ADD,
+                ChangeClassification.NO_CHANGE,
+                ChangeClassification.NO_CHANGE,
+            ],
+        )
+        result = plan.apply()
+        self.assertEqual(result.applied_count, 2)
+        self.assertEqual(handler.values[self.key("Software\\Demo", "Added")], (b"\x01", 3))
+
+    def test_batch_with_duplicate_targets_adds_nothing(self):
+        handler = KeyReadingHandler()
+        plan = ChangePlan(handler)
+        plan.set_value(HIVE, "Software", "Taken", 1, 4)
+        with self.assertRaises(DuplicateOperationError):
+            plan.set_values(HIVE, "Software", [("New", 1, 4), ("new", 2, 4)])
+        with self.assertRaises(DuplicateOperationError):
+            plan.delete_values(HIVE, "software", ["Other", "TAKEN"])
+        self.assertEqual(len(plan.changes), 1)
+        self.assertEqual(handler.key_reads, 0)
+
+    def test_handlers_without_bulk_reads_fall_back_to_value_reads(self):
+        handler = FakeRegistryHandler({self.key("Software", "A"): (1, 4)})
+        plan = ChangePlan(handler)
+        changes = plan.set_values(HIVE, "Software", [("A", 1, 4), ("B", 2, 4)])
+        self.assertEqual(
+            [change.classification for change in changes],
+            [ChangeClassification.NO_CHANGE, ChangeClassification.ADD],
+        )
+
+
+class TestMergePlans(unittest.TestCase):
+    def key(self, path, name):
+        return HIVE, path.casefold(), name.casefold()
+
+    def applied(self, handler, *values):
+        plan = ChangePlan(handler)
+        for name, value in values:
+            if value is None:
+                plan.delete_value(HIVE, "Software", name)
+            else:
+                plan.set_value(HIVE, "Software", name, value, 4)
+        self.assertTrue(plan.apply().success)
+        return plan
+
+    def test_merge_keeps_first_before_and_last_after(self):
+        initial = {self.key("Software", "A"): (1, 4), self.key("Software", "B"): (5, 4)}
+        handler = FakeRegistryHandler(initial)
+        plans = [
+            self.applied(handler, ("A", 2), ("C", 9)),
+            self.applied(handler, ("a", 3), ("B", None)),
+            self.applied(handler, ("C", None)),
+        ]
+
+        merged = merge_plans(plans)
+
+        self.assertTrue(merged.applied_successfully)
+        self.assertEqual(merged.label, "Merged 3 plan(s)")
+        self.assertEqual([change.name for change in merged.changes], ["A", "B"])
+        self.assertEqual(merged.changes[0].before, ValueSnapshot.existing(1, 4))
+        self.assertEqual(merged.changes[0].after, ValueSnapshot.existing(3, 4))
+        self.assertEqual(merged.changes[1].after, ValueSnapshot.missing())
+
+        writes = handler.operation_count
+        self.assertTrue(merged.create_inverse_plan().apply().success)
+        self.assertEqual(handler.values, initial)
+        self.assertEqual(handler.operation_count - writes, 2)
+
+    def test_round_trip_merges_to_an_empty_plan(self):
+        handler = FakeRegistryHandler({self.key("Software", "A"): (1, 4)})
+        plans = [self.applied(handler, ("A", 2)), self.applied(handler, ("A", 1))]
+
+        self.assertEqual(merge_plans(plans, "Session").changes, ())
+        with self.assertRaises(ValueError):
+            merge_plans([])
+
+
+class TestTimestampPrecheck(unittest.TestCase):
+    def key(self, name):
+        return HIVE, "software", name.casefold()
+
+    def plan(self, handler):
+        plan = ChangePlan(handler)
+        plan.set_values(HIVE, "Software", [("A", 2, 4), ("B", 3, 4)])
+        plan.delete_value(HIVE, "Software", "C")
+        return plan
+
+    def test_unchanged_key_skips_precheck_reads(self):
+        handler = StampedHandler({self.key("A"): (1, 4), self.key("C"): (9, 4)})
+        plan = self.plan(handler)
+        reads = handler.value_reads
+
+        result = plan.apply()
+
+        self.assertEqual(result.status, ApplyStatus.SUCCESS)
+        self.assertEqual(result.precheck_reads_skipped, 3)
+        # Only the read-back of each write remains.
+        self.assertEqual(handler.value_reads - reads, 3)
+
+    def test_moved_key_falls_back_to_value_comparison(self):
+        handler = StampedHandler({self.key("A"): (1, 4), self.key("C"): (9, 4)})
+        plan = self.plan(handler)
+        handler.values[self.key("C")] = (10, 4)
+        handler.touch("Software")
+
+        result = plan.apply()
+
+        self.assertEqual(result.status, ApplyStatus.CONFLICT)
+        self.assertEqual(result.precheck_reads_skipped, 0)
+        self.assertEqual(handler.values[self.key("A")], (1, 4))
+
+    def test_recent_stamps_are_not_trusted(self):
+        handler = StampedHandler({self.key("A"): (1, 4)})
+        handler.stamps["software"] = filetime_now()
+
+        result = self.plan(handler).apply()
+
+        self.assertTrue(result.success)
+        self.assertEqual(result.precheck_reads_skipped, 0)
+
+    def test_handlers_without_stamps_always_compare_values(self):
+        handler = KeyReadingHandler({self.key("A"): (1, 4)})
+        result = self.plan(handler).apply()
+        self.assertTrue(result.success)
+        self.assertEqual(result.precheck_reads_skipped, 0)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -1,6 +1,9 @@
 import unittest
 
+from change_manager import ChangePlan, ValueSnapshot
 from history_manager import HistoryManager
+from registry_backend import HKEY_CURRENT_USER, REG_BINARY, REG_DWORD, InMemoryRegistryBackend
+from registry_handler import RegistryHandler
 
 
 class AppliedPlan:
@@ -42,6 +45,48 @@ class TestHistoryManager(unittest.TestCase):
         with self.assertRaises(ValueError):
             history.record_plan(object())
 
+    def test_merge_undo_collapses_trailing_plans_only(self):
+        handler = RegistryHandler(backend=InMemoryRegistryBackend())
+        handler.create_key(HKEY_CURRENT_USER, "Software")
+        history = HistoryManager()
+        history.record("write", HKEY_CURRENT_USER, "Software", "Legacy")
+        for value in (1, 2, 3):
+            plan = ChangePlan(handler)
+            plan.set_value(HKEY_CURRENT_USER, "Software", "A", value, REG_DWORD)
+            self.assertTrue(plan.apply().success)
+            history.record_plan(plan)
+
+        merged = history.merge_undo(label="Session")
+
+        self.assertEqual(len(history.undo_stack), 2)
+        self.assertIs(history.peek_undo(), merged)
+        self.assertEqual(merged.changes[0].before, ValueSnapshot.missing())
+        self.assertEqual(merged.changes[0].after, ValueSnapshot.existing(3, REG_DWORD))
+        self.assertIsNone(history.merge_undo())
+
+    def test_byte_budget_evicts_oldest_undo_entries_but_keeps_the_newest(self):
+        handler = RegistryHandler(backend=InMemoryRegistryBackend())
+        handler.create_key(HKEY_CURRENT_USER, "Software")
+        history = HistoryManager(max_bytes=2500)
+        plans = []
+        for index in range(4):
+            plan = ChangePlan(handler, f"Blob {index}")
+            plan.set_value(HKEY_CURRENT_USER, "Software", f"Blob{index}", bytes(1000), REG_BINARY)
+            self.assertTrue(plan.apply().success)
+            self.assertEqual(plan.payload_bytes, 1000)
+            history.record_plan(plan)
+            plans.append(plan)
+
+        self.assertEqual(list(history.undo_stack), plans[2:])
+        self.assertEqual(history.memory_usage(), 2000)
+
+        history.max_bytes = 10
+        huge = ChangePlan(handler, "Huge")
+        huge.set_value(HKEY_CURRENT_USER, "Software", "Huge", bytes(5000), REG_BINARY)
+        self.assertTrue(huge.apply().success)
+        history.record_plan(huge)
+        self.assertEqual(list(history.undo_stack), [huge])
+
 
 if __name__ == "__main__":
     unittest.main()
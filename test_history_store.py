@@ -0,0 +1,252 @@
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import history_store
+from change_manager import ChangeClassification, ChangePlan
+from file_lock import FileLockError
+from history_manager import HistoryManager
+from history_store import HistoryStore, HistoryStoreError, StoredPlan
+from registry_backend import HKEY_CURRENT_USER, REG_BINARY, REG_DWORD, InMemoryRegistryBackend
+from registry_handler import RegistryHandler
+
+
+PATH = r"Software\HistoryStoreTests"
+
+
+class StoreTestCase(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.directory = Path(self.temp_dir.name) / "history"
+        self.handler = RegistryHandler(backend=InMemoryRegistryBackend())
+        self.handler.create_key(HKEY_CURRENT_USER, PATH)
+        self.stores = []
+
+    def tearDown(self):
+        for store in self.stores:
+            store.close()
+        self.temp_dir.cleanup()
+
+    def open_store(self, **kwargs):
+        store = HistoryStore(self.directory, self.handler, **kwargs)
+        self.stores.append(store)
+        return store
+
+    def applied(self, value, name="Counter"):
+        plan = ChangePlan(self.handler, f"Set {name} to {value}")
+        plan.set_value(HKEY_CURRENT_USER, PATH, name, value, REG_DWORD)
+        self.assertTrue(plan.apply().success)
+        return plan
+
+
+class TestHistoryStore(StoreTestCase):
+    def test_stacks_survive_a_restart_and_load_lazily(self):
+        store = self.open_store()
+        for value in range(1, 5):
+            plan = self.applied(value)
+            store.record(plan)
+        self.assertTrue(plan.create_inverse_plan().apply().success)
+        store.undone()
+        store.close()
+
+        reopened = self.open_store(cache_size=1)
+        self.assertEqual((reopened.undo_count, reopened.redo_count), (3, 1))
+        [redo] = reopened.redo_entries(10)
+        self.assertEqual(redo.label, "Set Counter to 4")
+        self.assertEqual(redo.counts[ChangeClassification.MODIFY], 1)
+        self.assertEqual(len(reopened._cache), 0)
+
+        newest = reopened.undo_entries(1)[0]
+        self.assertTrue(newest.create_inverse_plan().apply().success)
+        self.assertEqual(self.handler.read_value(HKEY_CURRENT_USER, PATH, "Counter"), (2, REG_DWORD))
+
+    def test_record_clears_redo_and_merge_and_trim_persist(self):
+        store = self.open_store()
+        for value in range(1, 6):
+            store.record(self.applied(value))
+        store.undone()
+        store.record(self.applied(9))
+        merged = ChangePlan.from_changes(self.handler, "Merged", (), applied=True)
+        store.merge(2, merged)
+        store.trim(1)
+        store.close()
+
+        reopened = self.open_store()
+        labels = [entry.label for entry in reopened.undo_entries(10)]
+        self.assertEqual(labels, ["Set Counter to 2", "Set Counter to 3", "Merged"])
+        self.assertEqual(reopened.redo_count, 0)
+
+    def test_torn_tail_is_ignored_and_cut(self):
+        store = self.open_store()
+        store.record(self.applied(1))
+        store.record(self.applied(2))
+        store.close()
+        index = self.directory / history_store.INDEX_NAME
+        with open(index, "ab") as stream:
+            stream.write(b"\x01\x00\x00")
+        data = self.directory / "plans-0.rmh"
+        with open(data, "ab") as stream:
+            stream.write(b"partial payload")
+
+        reopened = self.open_store()
+        self.assertEqual(reopened.undo_count, 2)
+        reopened.record(self.applied(3))
+        self.assertEqual(reopened.undo_entries(1)[0].load().label, "Set Counter to 3")
+
+    def test_records_after_trimming_or_dropping_everything_survive_reopening(self):
+        store = self.open_store()
+        for value in range(1, 6):
+            store.record(self.applied(value))
+        store.trim(5)
+        store.close()
+        store = self.open_store()
+        store.record(self.applied(6))
+        store.close()
+        self.assertEqual(self.open_store().undo_count, 1)
+        self.stores[-1].close()
+
+        store = self.open_store()
+        blob = ChangePlan(self.handler, "Large blob")
+        blob.set_value(HKEY_CURRENT_USER, PATH, "Blob", bytes(4096), REG_BINARY)
+        self.assertTrue(blob.apply().success)
+        store.record(blob)
+        store.merge(1, None)
+        store.close()
+        store = self.open_store()
+        store.record(self.applied(7))
+        store.close()
+        reopened = self.open_store()
+        self.assertEqual(reopened.undo_entries(1)[0].label, "Set Counter to 7")
+        self.assertEqual(reopened.undo_count, 2)
+
+    def test_compaction_drops_dead_plans_and_keeps_entries_usable(self):
+        store = self.open_store()
+        held = store.record(self.applied(1))
+        for value in range(2, 6):
+            store.record(self.applied(value))
+            store.undone()
+        size_before = (self.directory / "plans-0.rmh").stat().st_size
+
+        with mock.patch.object(history_store, "COMPACT_MIN_BYTES", 0):
+            store.record(self.applied(6))
+
+        self.assertEqual(store.generation, 1)
+        self.assertFalse((self.directory / "plans-0.rmh").exists())
+        self.assertLess((self.directory / "plans-1.rmh").stat().st_size, size_before)
+        self.assertEqual(held.label, "Set Counter to 1")
+        self.assertEqual(held.load().changes[0].after.value, 1)
+        store.close()
+        self.assertEqual(self.open_store().undo_count, 2)
+
+    def test_repeated_edits_of_a_large_value_store_deltas(self):
+        store = self.open_store(cache_size=1)
+        blob = bytearray(bytes(range(256)) * 1024)
+        self.handler.write_value(HKEY_CURRENT_USER, PATH, "Blob", bytes(blob), REG_BINARY)
+        for index in range(10):
+            blob[index * 1000] ^= 0xFF
+            plan = ChangePlan(self.handler, f"Edit {index}")
+            plan.set_value(HKEY_CURRENT_USER, PATH, "Blob", bytes(blob), REG_BINARY)
+            self.assertTrue(plan.apply().success)
+            store.record(plan)
+
+        # Every before-snapshot is kept whole; every after-snapshot is a delta.
+        self.assertLess((self.directory / "plans-0.rmh").stat().st_size, 11 * len(blob))
+        [oldest] = store.undo_entries(10)[:1]
+        self.assertEqual(oldest.load().changes[0].after.value[0], 0xFF)
+
+    def test_live_bytes_track_records_merges_and_trims(self):
+        store = self.open_store()
+        for value in range(1, 6):
+            store.record(self.applied(value))
+        store.undone()
+        store.record(self.applied(9))
+        store.merge(2, ChangePlan.from_changes(self.handler, "Merged", (), applied=True))
+        store.trim(1)
+
+        self.assertEqual(store.live_bytes, sum(store._lengths))
+        store.close()
+        self.assertEqual(self.open_store().live_bytes, store.live_bytes)
+
+    def test_a_second_process_cannot_open_the_store(self):
+        self.open_store()
+        with self.assertRaises(FileLockError):
+            HistoryStore(self.directory, self.handler)
+
+    def test_foreign_index_is_rejected(self):
+        self.directory.mkdir()
+        (self.directory / history_store.INDEX_NAME).write_bytes(b"not a history index")
+        with self.assertRaises(HistoryStoreError):
+            HistoryStore(self.directory, self.handler)
+
+
+class TestHistoryManagerWithStore(StoreTestCase):
+    def test_windows_stay_bounded_and_refill_from_disk(self):
+        history = HistoryManager(max_size=3, store=self.open_store())
+        for value in range(1, 8):
+            history.record_plan(self.applied(value))
+        self.assertEqual((len(history.undo_stack), history.undo_count()), (3, 7))
+
+        for expected in range(7, 2, -1):
+            entry = history.peek_undo()
+            self.assertIsInstance(entry, StoredPlan)
+            self.assertEqual(entry.label, f"Set Counter to {expected}")
+            self.assertTrue(entry.create_inverse_plan().apply().success)
+            self.assertTrue(history.commit_undo(entry))
+        self.assertEqual((history.undo_count(), history.redo_count()), (2, 5))
+        self.assertEqual(len(history.redo_stack), 3)
+        self.assertEqual(self.handler.read_value(HKEY_CURRENT_USER, PATH, "Counter"), (2, REG_DWORD))
+
+        self.stores[0].close()
+        restarted = HistoryManager(max_size=3, store=self.open_store())
+        self.assertEqual(restarted.peek_redo().label, "Set Counter to 3")
+        self.assertEqual(restarted.peek_undo().label, "Set Counter to 2")
+
+    def test_merge_undo_replaces_stored_plans(self):
+        history = HistoryManager(store=self.open_store())
+        for value in range(1, 4):
+            history.record_plan(self.applied(value))
+
+        history.merge_undo(label="Session")
+
+        self.stores[0].close()
+        restarted = HistoryManager(store=self.open_store())
+        [entry] = restarted.get_history()
+        self.assertEqual(entry.label, "Session")
+        self.assertTrue(entry.create_inverse_plan().apply().success)
+        self.assertIsNone(self.handler.read_value(HKEY_CURRENT_USER, PATH, "Counter"))
+
+    def test_retention_trims_old_and_surplus_plans_from_disk(self):
+        history = HistoryManager(max_size=2, store=self.open_store(), keep_plans=4)
+        for value in range(1, 7):
+            plan = self.applied(value)
+            if value <= 3:
+                plan.created_at = "2020-01-01T00:00:00+00:00"
+            history.record_plan(plan)
+        self.assertEqual(history.undo_count(), 4)
+
+        self.stores[0].close()
+        restarted = HistoryManager(max_size=10, store=self.open_store(), keep_days=30)
+        self.assertEqual(restarted.undo_count(), 3)
+        self.assertEqual(
+            [entry.label for entry in restarted.get_history()],
+            ["Set Counter to 6", "Set Counter to 5", "Set Counter to 4"],
+        )
+
+    def test_memory_budget_spills_loaded_plans_to_disk(self):
+        history = HistoryManager(store=self.open_store(), max_bytes=1500)
+        for index in range(4):
+            plan = ChangePlan(self.handler, f"Blob {index}")
+            plan.set_value(HKEY_CURRENT_USER, PATH, f"Blob{index}", bytes([index]) * 1000, REG_BINARY)
+            self.assertTrue(plan.apply().success)
+            history.record_plan(plan)
+
+        self.assertEqual(history.memory_usage(), 1000)
+        self.assertEqual(history.undo_count(), 4)
+        oldest = history.undo_stack[0]
+        self.assertEqual(oldest.load().changes[0].after.value, bytes(1000))
+        self.assertEqual(history.memory_usage(), 1000)
+
+
+if __name__ == "__main__":
+    unittest.main()
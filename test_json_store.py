@@ -0,0 +1,56 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+import json_store
+from json_store import BYTES_MARKER, JsonSerializer, OrjsonSerializer, atomic_write_json, load_json
+
+
+def serializers():
+    yield JsonSerializer()
+    if json_store.orjson is not None:
+        yield OrjsonSerializer()
+
+
+class TestJsonStore(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = Path(self.temp_dir.name) / "store.json"
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_bytes_round_trip_compactly_with_every_serializer(self):
+        data = {"café": {"values": [("Blob", b"\x00\xff", 3), [b"", {"deep": b"x"}]]}}
+        expected = {"café": {"values": [["Blob", b"\x00\xff", 3], [b"", {"deep": b"x"}]]}}
+        for serializer in serializers():
+            with self.subTest(serializer=serializer.name):
+                atomic_write_json(self.path, data, serializer)
+                raw = self.path.read_text(encoding="utf-8")
+                self.assertNotIn("\n ", raw)
+                self.assertIn("café", raw)
+                self.assertEqual(load_json(self.path, dict, serializer), expected)
+                self.assertEqual(load_json(self.path, dict, JsonSerializer()), expected)
+
+    def test_marker_lookalikes_and_bad_files_stay_safe(self):
+        lookalike = {BYTES_MARKER: "AA==", "other": 1}
+        atomic_write_json(self.path, [lookalike])
+        self.assertEqual(load_json(self.path, list), [lookalike])
+
+        self.path.write_text('{"' + BYTES_MARKER + '": "not base64!"}', encoding="utf-8")
+        self.assertEqual(load_json(self.path, dict), {})
+        self.path.write_bytes(b"\xff\xfe")
+        self.assertEqual(load_json(self.path, list), [])
+        self.assertEqual(load_json(self.path.with_name("missing.json"), dict), {})
+
+    def test_unsupported_values_raise_type_error_before_writing(self):
+        for serializer in serializers():
+            with self.subTest(serializer=serializer.name):
+                with self.assertRaises(TypeError):
+                    atomic_write_json(self.path, {"value": object()}, serializer)
+                self.assertFalse(self.path.exists())
+                self.assertEqual(list(self.path.parent.glob("*.tmp")), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,8 +1,13 @@
+import tempfile
 import unittest
+from pathlib import Path
 
+from change_journal import ChangeJournal
 from change_manager import ChangePlan
 from history_manager import HistoryManager
-from ui.main_window import RegistryApp
+from registry_backend import InMemoryRegistryBackend
+from registry_handler import RegistryHandler
+from ui.main_window import RegistryApp, format_byte_size
 
 
 class FakeHandler:
@@ -25,6 +30,7 @@ class FakeHandler:
 class AppHarness:
     def __init__(self):
         self.registry_handler = FakeHandler()
+        self.offline_handler = None
         self.history_manager = HistoryManager()
         self.statuses = []
         self.undo_updates = 0
@@ -60,6 +66,50 @@ class TestApplyUiBoundary(unittest.TestCase):
         self.assertIn("View refresh failed", app.statuses[-1][0])
         self.assertEqual(app.statuses[-1][1], "orange")
 
+    def test_plans_against_an_offline_hive_are_refused(self):
+        app = AppHarness()
+        app.offline_handler = FakeHandler()
+        plan = ChangePlan(app.offline_handler, "Offline edit")
+        plan.set_value(1, "Software", "Value", 2, 4)
+
+        result = RegistryApp.apply_change_plan(app, plan, create_backup=False)
+
+        self.assertFalse(result.success)
+        self.assertEqual(app.offline_handler.values, {})
+        self.assertIn("read-only", app.statuses[-1][0])
+
+
+class TestStatusBar(unittest.TestCase):
+    def test_byte_sizes_are_short(self):
+        self.assertEqual(format_byte_size(0), "0 B")
+        self.assertEqual(format_byte_size(1536), "1.5 KB")
+        self.assertEqual(format_byte_size(64 * 1024 * 1024), "64.0 MB")
+        self.assertEqual(format_byte_size(3 * 1024 ** 3), "3.0 GB")
+
+
+class TestJournalRecoveryPrompt(unittest.TestCase):
+    def test_interrupted_plans_are_rolled_back_or_kept_per_answer(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            app = AppHarness()
+            journal = ChangeJournal(Path(temp_dir) / "change_journal.jsonl")
+            app.registry_handler = RegistryHandler(backend=InMemoryRegistryBackend(), journal=journal)
+            handler = app.registry_handler
+            handler.create_key(1, "Software")
+            for label in ("First", "Second", "Third"):
+                plan = ChangePlan(handler, label)
+                plan.set_value(1, "Software", label, 1, 4)
+                journal.begin(plan, plan.changes)
+                handler.write_value(1, "Software", label, 1, 4)
+            answers = {"First": True, "Second": False, "Third": None}
+            app.ask_journal_recovery = lambda interrupted: answers[interrupted.label]
+
+            RegistryApp.offer_journal_recovery(app)
+
+            self.assertIsNone(handler.read_value(1, "Software", "First"))
+            self.assertEqual(handler.read_value(1, "Software", "Second"), (1, 4))
+            self.assertEqual([plan.label for plan in journal.interrupted()], ["Third"])
+            journal.close()
+
 
 if __name__ == "__main__":
     unittest.main()
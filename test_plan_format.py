@@ -0,0 +1,157 @@
+import io
+import tempfile
+import unittest
+from pathlib import Path
+
+from change_manager import ApplyStatus, ChangePlan, ValueSnapshot
+from plan_format import (
+    FORMAT_BINARY,
+    FORMAT_JSON,
+    MAGIC,
+    PlanFormatError,
+    decode_snapshot,
+    dump_plan,
+    encode_snapshot,
+    iter_plan,
+    load_plan,
+    replay_plan,
+    save_plan,
+)
+from registry_backend import (
+    HKEY_CURRENT_USER,
+    REG_BINARY,
+    REG_DWORD,
+    REG_MULTI_SZ,
+    REG_QWORD,
+    REG_SZ,
+    InMemoryRegistryBackend,
+)
+from registry_handler import RegistryHandler
+
+
+HIVE = HKEY_CURRENT_USER
+PATH = r"Software\PlanFormatTests"
+
+SNAPSHOTS = (
+    ValueSnapshot.missing(),
+    ValueSnapshot.existing(None, REG_BINARY),
+    ValueSnapshot.existing(b"", REG_BINARY),
+    ValueSnapshot.existing(bytes(range(256)), REG_BINARY),
+    ValueSnapshot.existing(["a", "", "ü✓"], REG_MULTI_SZ),
+    ValueSnapshot.existing((), REG_MULTI_SZ),
+    ValueSnapshot.existing(0, REG_DWORD),
+    ValueSnapshot.existing((1 << 64) - 1, REG_QWORD),
+    ValueSnapshot.existing("", REG_SZ),
+    ValueSnapshot.existing("lone \ud800 surrogate", REG_SZ),
+)
+
+
+def make_handler():
+    handler = RegistryHandler(backend=InMemoryRegistryBackend())
+    handler.create_key(HIVE, PATH)
+    return handler
+
+
+class TestPlanFormat(unittest.TestCase):
+    def sample_plan(self, handler):
+        handler.write_value(HIVE, PATH, "Old", b"\x01", REG_BINARY)
+        plan = ChangePlan(handler, "Sample ✓")
+        plan.set_values(HIVE, PATH, [
+            (f"Value{index}", snapshot.value, snapshot.value_type)
+            for index, snapshot in enumerate(SNAPSHOTS) if snapshot.exists
+        ])
+        plan.delete_value(HIVE, PATH, "Old")
+        return plan
+
+    def test_snapshots_round_trip_exactly_in_json(self):
+        for snapshot in SNAPSHOTS:
+            self.assertEqual(decode_snapshot(encode_snapshot(snapshot)), snapshot)
+
+    def test_both_encodings_round_trip_every_change(self):
+        plan = self.sample_plan(make_handler())
+        for fmt in (FORMAT_BINARY, FORMAT_JSON):
+            with self.subTest(fmt=fmt):
+                stream = io.BytesIO()
+                self.assertEqual(dump_plan(plan, stream, fmt), len(plan.changes))
+                stream.seek(0)
+                header, changes = iter_plan(stream)
+
+                self.assertEqual(header["label"], "Sample ✓")
+                self.assertFalse(header["applied"])
+                self.assertEqual(tuple(changes), plan.changes)
+
+    def test_applied_plans_load_ready_for_undo(self):
+        handler = make_handler()
+        plan = self.sample_plan(handler)
+        self.assertTrue(plan.apply().success)
+        with tempfile.TemporaryDirectory() as temp_dir:
+            filepath = Path(temp_dir) / "applied.rmplan"
+            save_plan(plan, filepath)
+            loaded = load_plan(filepath, handler)
+
+        self.assertEqual(loaded.created_at, plan.created_at)
+        self.assertTrue(loaded.applied_successfully)
+        undo = loaded.create_inverse_plan()
+        self.assertEqual(undo.apply().status, ApplyStatus.SUCCESS)
+        self.assertEqual(handler.read_key(HIVE, PATH), [("Old", b"\x01", REG_BINARY)])
+
+    def test_replay_re_snapshots_against_another_registry(self):
+        plan = self.sample_plan(make_handler())
+        target = make_handler()
+        target.write_value(HIVE, PATH, "Value6", 99, REG_DWORD)
+        with tempfile.TemporaryDirectory() as temp_dir:
+            filepath = Path(temp_dir) / "shipped.jsonl"
+            save_plan(plan, filepath)
+            self.assertTrue(filepath.read_bytes().startswith(b"{"))
+            replayed = replay_plan(filepath, target)
+
+        self.assertEqual(len(replayed.changes), len(plan.changes))
+        self.assertEqual(replayed.changes[5].before, ValueSnapshot.existing(99, REG_DWORD))
+        self.assertTrue(replayed.apply().success)
+        self.assertEqual(target.read_value(HIVE, PATH, "Value3"), (bytes(range(256)), REG_BINARY))
+        self.assertEqual(target.read_value(HIVE, PATH, "Value4"), (["a", "", "ü✓"], REG_MULTI_SZ))
+
+    def test_binary_stores_small_edits_of_large_values_as_deltas(self):
+        handler = make_handler()
+        blob = bytes(range(256)) * 256
+        strings = tuple(f"C:\\Tools\\{index}" for index in range(500))
+        handler.write_value(HIVE, PATH, "Blob", blob, REG_BINARY)
+        handler.write_value(HIVE, PATH, "Paths", strings, REG_MULTI_SZ)
+        plan = ChangePlan(handler, "Tweak")
+        plan.set_value(HIVE, PATH, "Blob", blob[:100] + b"\xff" + blob[101:], REG_BINARY)
+        plan.set_value(HIVE, PATH, "Paths", strings[:10] + ("D:\\New",) + strings[11:], REG_MULTI_SZ)
+
+        binary, text = io.BytesIO(), io.BytesIO()
+        dump_plan(plan, binary, FORMAT_BINARY)
+        dump_plan(plan, text, FORMAT_JSON)
+        self.assertLess(len(binary.getvalue()), len(blob) + 2 * len(strings) * 20)
+        for stream in (binary, text):
+            stream.seek(0)
+            _, changes = iter_plan(stream)
+            self.assertEqual(tuple(changes), plan.changes)
+
+    def test_version_1_binary_files_still_load(self):
+        plan = self.sample_plan(make_handler())
+        stream = io.BytesIO()
+        dump_plan(plan, stream)
+        data = stream.getvalue().replace(b'"version": 2', b'"version": 1', 1)
+        data = data[:len(MAGIC)] + b"\x01" + data[len(MAGIC) + 1:]
+
+        header, changes = iter_plan(io.BytesIO(data))
+        self.assertEqual(header["version"], 1)
+        self.assertEqual(tuple(changes), plan.changes)
+
+    def test_damaged_and_foreign_files_are_rejected(self):
+        plan = self.sample_plan(make_handler())
+        stream = io.BytesIO()
+        dump_plan(plan, stream)
+        truncated = io.BytesIO(stream.getvalue()[:-3])
+        _, changes = iter_plan(truncated)
+        with self.assertRaises(PlanFormatError):
+            list(changes)
+        with self.assertRaises(PlanFormatError):
+            iter_plan(io.BytesIO(b"Windows Registry Editor Version 5.00\r\n"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from preset_manager import PresetManager
+from preset_store import PresetStore, PresetSummary
+from registry_backend import REG_BINARY, REG_DWORD
+
+
+class PresetStoreTestCase(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = Path(self.temp_dir.name)
+        self.json_path = self.root / "presets.json"
+        self.db_path = self.root / "presets.sqlite3"
+        self.managers = []
+
+    def tearDown(self):
+        for manager in self.managers:
+            manager.close()
+        self.temp_dir.cleanup()
+
+    def open_manager(self):
+        manager = PresetManager(self.json_path, db_path=self.db_path)
+        self.managers.append(manager)
+        return manager
+
+
+class TestPresetStore(PresetStoreTestCase):
+    def test_pages_list_summaries_in_saved_order_without_decoding(self):
+        store = PresetStore(self.db_path)
+        self.addCleanup(store.close)
+        store.save_many(
+            (f"Preset {index}", {"path": f"Software\\P{index}", "values": [("V", index, REG_DWORD)] * index})
+            for index in range(5)
+        )
+        store.save("Preset 1", {"path": "Software\\Moved", "values": []})
+
+        with mock.patch.object(store._reader, "loads", side_effect=AssertionError("decoded")):
+            self.assertEqual(store.count(), 5)
+            self.assertEqual(
+                store.page(1, 2),
+                [PresetSummary("Preset 1", "Software\\Moved", 0), PresetSummary("Preset 2", "Software\\P2", 2)],
+            )
+        self.assertTrue(store.delete("Preset 0"))
+        self.assertFalse(store.delete("Preset 0"))
+        self.assertEqual(store.names(), ["Preset 1", "Preset 2", "Preset 3", "Preset 4"])
+
+    def test_unsupported_values_leave_the_store_unchanged(self):
+        store = PresetStore(self.db_path)
+        self.addCleanup(store.close)
+        store.save("Kept", {"path": "Software", "values": []})
+        with self.assertRaises(TypeError):
+            store.save_many([("New", {"path": "Software"}), ("Bad", {"value": object()})])
+        self.assertEqual(store.names(), ["Kept"])
+
+
+class TestPresetManagerDatabase(PresetStoreTestCase):
+    def test_json_presets_migrate_once_with_exact_bytes(self):
+        legacy = {"Legacy": {"path": "Software\\Legacy", "values": [["Enabled", 1, REG_DWORD]]}}
+        self.json_path.write_text(json.dumps(legacy), encoding="utf-8")
+
+        manager = self.open_manager()
+        self.assertEqual(manager.get_preset("Legacy"), legacy["Legacy"])
+        self.assertIn("Enable Dark Mode", manager.presets)
+        manager.save_preset("Binary", {"path": "Software", "values": [("Blob", b"\x00\xff", REG_BINARY)]})
+        manager.delete_preset("Legacy")
+        manager.close()
+
+        self.json_path.write_text(json.dumps({"Late": {}}), encoding="utf-8")
+        reopened = self.open_manager()
+        self.assertNotIn("Legacy", reopened.presets)
+        self.assertNotIn("Late", reopened.presets)
+        self.assertEqual(reopened.get_preset("Binary")["values"], [["Blob", b"\x00\xff", REG_BINARY]])
+        self.assertEqual(reopened.list_presets(len(reopened.presets) - 1)[0].name, "Binary")
+
+    def test_json_and_database_modes_list_the_same_summaries(self):
+        database = self.open_manager()
+        plain = PresetManager(self.root / "plain.json")
+        self.assertEqual(database.list_presets(2, 3), plain.list_presets(2, 3))
+        self.assertEqual(len(database.list_presets()), len(plain.presets))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,269 @@
+import io
+import os
+import tempfile
+import unittest
+
+from reg_file import (
+    CREATE_KEY,
+    DELETE_KEY,
+    DELETE_VALUE,
+    SET_VALUE,
+    RegFileError,
+    RegFileWriter,
+    RegOperation,
+    build_import_plan,
+    export_keys,
+    export_to_file,
+    format_value,
+    parse_reg_file,
+)
+from registry_backend import (
+    HKEY_CURRENT_USER,
+    REG_BINARY,
+    REG_DWORD,
+    REG_EXPAND_SZ,
+    REG_MULTI_SZ,
+    REG_NONE,
+    REG_QWORD,
+    REG_SZ,
+    InMemoryRegistryBackend,
+)
+from registry_handler import RegistryHandler
+
+
+HIVE = HKEY_CURRENT_USER
+
+
+def hex_list(raw):
+    return ",".join(f"{byte:02x}" for byte in raw)
+
+
+class TestFormatValue(unittest.TestCase):
+    def test_lines_match_reg_export(self):
+        cases = [
+            (("", "hello", REG_SZ), '@="hello"'),
+            (("Quote", 'a"b\\c', REG_SZ), '"Quote"="a\\"b\\\\c"'),
+            (("Count", 255, REG_DWORD), '"Count"=dword:000000ff'),
+            (("Q", 1, REG_QWORD), '"Q"=hex(b):01,00,00,00,00,00,00,00'),
+            (("Exp", "%P%", REG_EXPAND_SZ), '"Exp"=hex(2):25,00,50,00,25,00,00,00'),
+            (("Multi", ["a", "b"], REG_MULTI_SZ), '"Multi"=hex(7):61,00,00,00,62,00,00,00,00,00'),
+            (("Empty", None, REG_BINARY), '"Empty"=hex:'),
+            (("None", b"\x01", REG_NONE), '"None"=hex(0):01'),
+            (("Lines", "a\nb", REG_SZ), '"Lines"=hex(1):61,00,0a,00,62,00,00,00'),
+        ]
+        for (name, data, value_type), expected in cases:
+            with self.subTest(name=name):
+                self.assertEqual(format_value(name, data, value_type), expected + "\r\n")
+
+    def test_hex_wraps_at_regedit_columns(self):
+        raw = bytes(range(60))
+        lines = format_value("Bin", raw, REG_BINARY).split("\r\n")
+
+        self.assertEqual(lines[0], '"Bin"=hex:' + hex_list(raw[:23]) + ",\\")
+        self.assertEqual(lines[1], "  " + hex_list(raw[23:48]) + ",\\")
+        self.assertEqual(lines[2], "  " + hex_list(raw[48:]))
+        self.assertEqual(lines[3], "")
+        self.assertTrue(all(len(line) <= 80 for line in lines))
+
+
+class TestExport(unittest.TestCase):
+    def setUp(self):
+        self.backend = InMemoryRegistryBackend()
+        for path in (r"Software\App", r"Software\App\Sub", r"Software\Other"):
+            self.backend.create_key(HIVE, path)
+        self.backend.set_value(HIVE, r"Software\App", "", "root", REG_SZ)
+        self.backend.set_value(HIVE, r"Software\App\Sub", "Flag", 1, REG_DWORD)
+        self.backend.set_value(HIVE, r"Software\Other", "Bin", b"\xff", REG_BINARY)
+
+    def export(self, roots, recursive=True):
+        stream = io.BytesIO()
+        export_keys(self.backend, roots, stream, recursive)
+        return stream.getvalue()
+
+    def test_single_pass_export_is_utf16_with_bom(self):
+        data = self.export([(HIVE, r"Software\App"), (HIVE, r"Software\Other")])
+
+        self.assertTrue(data.startswith(b"\xff\xfe"))
+        self.assertEqual(
+            data[2:].decode("utf-16-le"),
+            "Windows Registry Editor Version 5.00\r\n\r\n"
+            "[HKEY_CURRENT_USER\\Software\\App]\r\n@=\"root\"\r\n\r\n"
+            "[HKEY_CURRENT_USER\\Software\\App\\Sub]\r\n\"Flag\"=dword:00000001\r\n\r\n"
+            "[HKEY_CURRENT_USER\\Software\\Other]\r\n\"Bin\"=hex:ff\r\n\r\n",
+        )
+
+    def test_nested_and_repeated_roots_are_written_once(self):
+        text = self.export([
+            (HIVE, r"Software\App\Sub"), (HIVE, r"software\app"), (HIVE, r"Software\App"),
+        ])[2:].decode("utf-16-le")
+        self.assertEqual(text.casefold().count("[hkey_current_user\\software\\app\\sub]"), 1)
+        self.assertEqual(text.count("[HKEY"), 2)
+
+        flat = self.export([(HIVE, r"Software\App"), (HIVE, r"SOFTWARE\APP")], recursive=False)
+        self.assertNotIn("Sub]", flat[2:].decode("utf-16-le"))
+        self.assertEqual(flat[2:].decode("utf-16-le").count("[HKEY"), 1)
+
+    def test_writer_counts_sections(self):
+        writer = RegFileWriter(io.BytesIO())
+        writer.write_key("HKEY_CURRENT_USER\\X", [("A", 1, REG_DWORD), ("B", 2, REG_DWORD)])
+        self.assertEqual((writer.keys_written, writer.values_written), (1, 2))
+
+
+class TestHandlerBackups(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.backend = InMemoryRegistryBackend()
+        self.backend.create_key(HIVE, r"Software\App")
+        self.backend.set_value(HIVE, r"Software\App", "Name", "value", REG_SZ)
+        self.handler = RegistryHandler(self.temp_dir.name, backend=self.backend)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_backup_keys_writes_one_file_without_reg_exe(self):
+        filepath = self.handler.backup_keys(
+            [r"HKEY_CURRENT_USER\Software\App", r"HKCU\Software\App"], recursive=False
+        )
+
+        self.assertIsNotNone(filepath)
+        with open(filepath, "rb") as handle:
+            text = handle.read()[2:].decode("utf-16-le")
+        self.assertEqual(text.count("[HKEY_CURRENT_USER\\Software\\App]"), 1)
+        self.assertIn('"Name"="value"', text)
+
+    def test_failed_export_leaves_no_file(self):
+        self.assertIsNone(self.handler.backup_key(r"HKEY_CURRENT_USER\Software\Missing"))
+        self.assertIsNotNone(self.handler.last_error)
+        self.assertEqual(os.listdir(self.temp_dir.name), [])
+
+    def test_missing_keys_can_be_skipped(self):
+        filepath = self.handler.backup_keys(
+            [r"HKCU\Software\Missing", r"HKCU\Software\App"], missing_ok=True
+        )
+        with open(filepath, "rb") as handle:
+            text = handle.read()[2:].decode("utf-16-le")
+        self.assertNotIn("Missing", text)
+        self.assertIn("[HKEY_CURRENT_USER\\Software\\App]", text)
+
+
+class TestParse(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def write(self, text, encoding="utf-16"):
+        filepath = os.path.join(self.temp_dir.name, "import.reg")
+        with open(filepath, "w", encoding=encoding, newline="") as handle:
+            handle.write(text)
+        return filepath
+
+    def test_sections_escapes_continuations_and_deletes(self):
+        filepath = self.write(
+            "Windows Registry Editor Version 5.00\r\n\r\n"
+            "; comment\r\n"
+            "[HKEY_CURRENT_USER\\Software\\App]\r\n"
+            '@="C:\\\\Program Files\\\\\\"App\\""\r\n'
+            '"Count"=dword:0000002A\r\n'
+            '"Bin"=hex:00,01,\\\r\n'
+            "  02,03\r\n"
+            '"Multi"=hex(7):61,00,00,00,62,00,00,00,00,00\r\n'
+            '"Q"=hex(b):01,00,00,00,00,00,00,00\r\n'
+            '"Gone"=-\r\n'
+            "\r\n"
+            "[-HKCU\\Software\\Old]\r\n"
+        )
+
+        self.assertEqual(list(parse_reg_file(filepath)), [
+            RegOperation(CREATE_KEY, HIVE, r"Software\App"),
+            RegOperation(SET_VALUE, HIVE, r"Software\App", "", 'C:\\Program Files\\"App"', REG_SZ),
+            RegOperation(SET_VALUE, HIVE, r"Software\App", "Count", 42, REG_DWORD),
+            RegOperation(SET_VALUE, HIVE, r"Software\App", "Bin", b"\x00\x01\x02\x03", REG_BINARY),
+            RegOperation(SET_VALUE, HIVE, r"Software\App", "Multi", ["a", "b"], REG_MULTI_SZ),
+            RegOperation(SET_VALUE, HIVE, r"Software\App", "Q", 1, REG_QWORD),
+            RegOperation(DELETE_VALUE, HIVE, r"Software\App", "Gone"),
+            RegOperation(DELETE_KEY, HIVE, r"Software\Old"),
+        ])
+
+    def test_regedit4_strings_are_ansi(self):
+        filepath = self.write(
+            "REGEDIT4\n\n[HKEY_CURRENT_USER\\X]\n\"E\"=hex(2):25,50,25,00\n", encoding="utf-8"
+        )
+        self.assertEqual(list(parse_reg_file(filepath))[-1].data, "%P%")
+
+    def test_errors_report_line_numbers(self):
+        cases = [
+            ("Not a reg file\r\n", 1),
+            ("Windows Registry Editor Version 5.00\r\n\"A\"=dword:1\r\n", 2),
+            ("Windows Registry Editor Version 5.00\r\n[HKEY_BOGUS\\X]\r\n", 2),
+            ("Windows Registry Editor Version 5.00\r\n[HKCU\\X]\r\n\"A\"=dword:zz\r\n", 3),
+            ("Windows Registry Editor Version 5.00\r\n[HKCU\\X]\r\n\"A\"=hex:0g\r\n", 3),
+        ]
+        for text, line_number in cases:
+            with self.subTest(text=text):
+                with self.assertRaises(RegFileError) as caught:
+                    list(parse_reg_file(self.write(text)))
+                self.assertEqual(caught.exception.line_number, line_number)
+
+
+class TestImport(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.source = InMemoryRegistryBackend()
+        self.source.create_key(HIVE, r"Software\App\Sub")
+        self.values = [
+            ("", "default", REG_SZ),
+            ("Count", 7, REG_DWORD),
+            ("Huge", (1 << 64) - 1, REG_QWORD),
+            ("Exp", "%TEMP%\\x", REG_EXPAND_SZ),
+            ("Multi", ["one", "two"], REG_MULTI_SZ),
+            ("Blob", bytes(range(200)), REG_BINARY),
+            ('Odd "name" \\ here', "a\r\nb", REG_SZ),
+        ]
+        for name, data, value_type in self.values:
+            self.source.set_value(HIVE, r"Software\App\Sub", name, data, value_type)
+        self.filepath = os.path.join(self.temp_dir.name, "export.reg")
+        export_to_file(self.source, [(HIVE, "Software\\App")], self.filepath)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_export_round_trips_through_a_previewable_plan(self):
+        target = InMemoryRegistryBackend()
+        handler = RegistryHandler(self.temp_dir.name, backend=target)
+        handler.create_key(HIVE, r"Software\App\Sub")
+        handler.write_value(HIVE, r"Software\App\Sub", "Count", 1, REG_DWORD)
+
+        imported = build_import_plan(handler, parse_reg_file(self.filepath))
+
+        self.assertEqual(imported.keys, [(HIVE, r"Software\App"), (HIVE, r"Software\App\Sub")])
+        self.assertEqual(imported.plan.preview().counts["modify"], 1)
+        self.assertEqual(target.enum_values(HIVE, r"Software\App\Sub"), [("Count", 1, REG_DWORD)])
+        self.assertTrue(imported.plan.apply().success)
+        self.assertEqual(
+            sorted(target.enum_values(HIVE, r"Software\App\Sub")), sorted(self.values)
+        )
+
+    def test_restore_backup_creates_missing_keys(self):
+        handler = RegistryHandler(self.temp_dir.name, backend=InMemoryRegistryBackend())
+
+        self.assertTrue(handler.restore_backup(self.filepath))
+        self.assertEqual(handler.read_value(HIVE, r"Software\App\Sub", "Count"), (7, REG_DWORD))
+
+    def test_later_assignments_win_and_key_deletes_are_refused(self):
+        handler = RegistryHandler(self.temp_dir.name, backend=InMemoryRegistryBackend())
+        operations = [
+            RegOperation(CREATE_KEY, HIVE, "X"),
+            RegOperation(SET_VALUE, HIVE, "X", "A", 1, REG_DWORD),
+            RegOperation(SET_VALUE, HIVE, "x", "a", 2, REG_DWORD),
+        ]
+        plan = build_import_plan(handler, operations).plan
+        self.assertEqual([change.after.value for change in plan.changes], [2])
+
+        with self.assertRaises(RegFileError):
+            build_import_plan(handler, [RegOperation(DELETE_KEY, HIVE, "X")])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,200 @@
+import struct
+import tempfile
+import unittest
+from pathlib import Path
+
+from registry_backend import REG_BINARY, REG_DWORD, REG_EXPAND_SZ, REG_MULTI_SZ, REG_QWORD, REG_SZ
+from registry_handler import RegistryHandler
+from regf_backend import RegfBackend, RegfError
+
+
+HIVE = 0x80000001
+
+
+class Key:
+    def __init__(self, name, values=(), children=(), last_write=0, list_kind="lh"):
+        self.name = name
+        self.values = list(values)
+        self.children = list(children)
+        self.last_write = last_write
+        self.list_kind = list_kind
+
+
+def _name_bytes(name):
+    try:
+        return name.encode("latin-1"), True
+    except UnicodeEncodeError:
+        return name.encode("utf-16-le"), False
+
+
+def _lh_hash(name):
+    value = 0
+    for char in name.upper():
+        value = (value * 37 + ord(char)) & 0xFFFFFFFF
+    return value
+
+
+class HiveWriter:
+    """Builds minimal but well-formed regf files for the reader tests."""
+
+    def __init__(self):
+        self.data = bytearray(0x20)  # hbin header, filled in by build()
+
+    def alloc(self, payload):
+        offset = len(self.data)
+        size = (4 + len(payload) + 7) & ~7
+        self.data += struct.pack("<i", -size) + payload + bytes(size - 4 - len(payload))
+        return offset
+
+    def value(self, name, raw, value_type):
+        encoded, compressed = _name_bytes(name)
+        if len(raw) <= 4:
+            size, data_offset = len(raw) | 0x80000000, int.from_bytes(raw.ljust(4, b"\0"), "little")
+        elif len(raw) > 16344:
+            segments = [
+                self.alloc(raw[start:start + 16344]) for start in range(0, len(raw), 16344)
+            ]
+            segment_list = self.alloc(b"".join(struct.pack("<I", s) for s in segments))
+            size, data_offset = len(raw), self.alloc(b"db" + struct.pack("<HI", len(segments), segment_list))
+        else:
+            size, data_offset = len(raw), self.alloc(raw)
+        header = struct.pack(
+            "<2sHIIIH2x", b"vk", len(encoded), size, data_offset, value_type, 1 if compressed else 0
+        )
+        return self.alloc(header + encoded)
+
+    def subkey_list(self, kind, children):
+        if kind == "ri":
+            half = len(children) // 2
+            parts = [self.subkey_list("li", children[:half]), self.subkey_list("lh", children[half:])]
+            return self.alloc(b"ri" + struct.pack("<H", 2) + struct.pack("<2I", *parts))
+        body = bytearray(kind.encode() + struct.pack("<H", len(children)))
+        for offset, name in children:
+            if kind == "li":
+                body += struct.pack("<I", offset)
+            elif kind == "lh":
+                body += struct.pack("<II", offset, _lh_hash(name))
+            else:
+                body += struct.pack("<I4s", offset, name.encode("latin-1", "replace")[:4].ljust(4, b"\0"))
+        return self.alloc(bytes(body))
+
+    def key(self, key, root=False):
+        children = [(self.key(child), child.name) for child in key.children]
+        subkey_list = self.subkey_list(key.list_kind, children) if children else 0xFFFFFFFF
+        values = [self.value(*value) for value in key.values]
+        value_list = (
+            self.alloc(b"".join(struct.pack("<I", v) for v in values)) if values else 0xFFFFFFFF
+        )
+        encoded, compressed = _name_bytes(key.name)
+        flags = (0x20 if compressed else 0) | (0x0C if root else 0)
+        header = struct.pack(
+            "<2sHQ8xI4xI4xII28xHH",
+            b"nk", flags, key.last_write, len(children), subkey_list,
+            len(values), value_list, len(encoded), 0,
+        )
+        return self.alloc(header + encoded)
+
+    def build(self, root, minor=5):
+        root_offset = self.key(root, root=True)
+        size = (len(self.data) + 0xFFF) & ~0xFFF
+        self.data += bytes(size - len(self.data))
+        self.data[:0x20] = b"hbin" + struct.pack("<II", 0, size) + bytes(20)
+        base = bytearray(0x1000)
+        struct.pack_into("<4sIIQIIIIIII", base, 0, b"regf", 1, 1, 0, 1, minor, 0, 1, root_offset, size, 1)
+        checksum = 0
+        for (dword,) in struct.iter_unpack("<I", base[:0x1FC]):
+            checksum ^= dword
+        struct.pack_into("<I", base, 0x1FC, checksum)
+        return bytes(base) + bytes(self.data)
+
+
+def sz(text):
+    return (text + "\0").encode("utf-16-le")
+
+
+def sample_tree():
+    big = bytes(range(256)) * 100
+    return Key("ROOT", children=[
+        Key("Software", last_write=111, children=[
+            Key("Vendor", last_write=222, values=[
+                ("", sz("default text"), REG_SZ),
+                ("Count", struct.pack("<I", 7), REG_DWORD),
+                ("Huge", struct.pack("<Q", 1 << 40), REG_QWORD),
+                ("Path", sz("%USERPROFILE%\\x"), REG_EXPAND_SZ),
+                ("List", sz("one") + sz("two") + b"\0\0", REG_MULTI_SZ),
+                ("Empty", b"", REG_BINARY),
+                ("Blob", big, REG_BINARY),
+                ("Tiny", b"\x01\x02", REG_BINARY),
+                ("Ünïcode✓", sz("wide name"), REG_SZ),
+            ], children=[Key(f"Child{i}") for i in range(5)], list_kind="ri"),
+            Key("Legacy", children=[Key("A"), Key("Bee")], list_kind="lf"),
+            Key("Wide✓", children=[Key("Inner")], list_kind="li"),
+        ]),
+    ])
+
+
+class TestRegfBackend(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = Path(self.temp_dir.name) / "NTUSER.DAT"
+        self.path.write_bytes(HiveWriter().build(sample_tree()))
+        self.backend = RegfBackend(self.path)
+
+    def tearDown(self):
+        self.backend.close()
+        self.temp_dir.cleanup()
+
+    def test_keys_are_listed_through_every_subkey_index_kind(self):
+        self.assertEqual(self.backend.enum_keys(HIVE, ""), ["Software"])
+        self.assertEqual(self.backend.enum_keys(HIVE, "Software"), ["Vendor", "Legacy", "Wide✓"])
+        self.assertEqual(
+            self.backend.enum_keys(HIVE, r"Software\Vendor"), [f"Child{i}" for i in range(5)]
+        )
+        self.assertEqual(self.backend.enum_keys(HIVE, r"software\LEGACY"), ["A", "Bee"])
+        self.assertEqual(self.backend.enum_keys(HIVE, r"Software\wide✓"), ["Inner"])
+
+    def test_values_decode_like_winreg(self):
+        values = {name: (data, value_type) for name, data, value_type in
+                  self.backend.enum_values(HIVE, r"Software\Vendor")}
+
+        self.assertEqual(values[""], ("default text", REG_SZ))
+        self.assertEqual(values["Count"], (7, REG_DWORD))
+        self.assertEqual(values["Huge"], (1 << 40, REG_QWORD))
+        self.assertEqual(values["Path"], ("%USERPROFILE%\\x", REG_EXPAND_SZ))
+        self.assertEqual(values["List"], (["one", "two"], REG_MULTI_SZ))
+        self.assertEqual(values["Empty"], (None, REG_BINARY))
+        self.assertEqual(values["Blob"], (bytes(range(256)) * 100, REG_BINARY))
+        self.assertEqual(values["Tiny"], (b"\x01\x02", REG_BINARY))
+        self.assertEqual(values["Ünïcode✓"], ("wide name", REG_SZ))
+        self.assertEqual(
+            self.backend.query_value(HIVE, r"SOFTWARE\vendor", "count"), (7, REG_DWORD)
+        )
+
+    def test_metadata_and_missing_paths(self):
+        info = self.backend.read_key(HIVE, r"Software\Vendor")
+        self.assertEqual(info.last_write, 222)
+        self.assertEqual(self.backend.query_info(HIVE, r"Software\Vendor"), (5, 9, 222))
+        self.assertEqual(self.backend.read_key(HIVE, r"Software\Vendor", unchanged_since=222).values, None)
+        with self.assertRaises(FileNotFoundError):
+            self.backend.enum_keys(HIVE, r"Software\Missing")
+        with self.assertRaises(FileNotFoundError):
+            self.backend.query_value(HIVE, r"Software\Vendor", "Missing")
+
+    def test_handler_reads_searches_and_refuses_writes(self):
+        handler = RegistryHandler(backend=self.backend)
+
+        self.assertEqual(handler.read_key_full(HIVE, r"Software\Legacy").subkeys, ["A", "Bee"])
+        results = handler.search_registry(HIVE, "", "child3", max_workers=2)
+        self.assertEqual(results, [{"path": r"Software\Vendor\Child3", "type": "Key", "name": "Child3"}])
+        self.assertFalse(handler.write_value(HIVE, "Software", "x", 1, REG_DWORD))
+        self.assertIn("read-only", handler.last_error)
+
+    def test_non_hive_files_are_rejected(self):
+        bogus = Path(self.temp_dir.name) / "bogus.dat"
+        bogus.write_bytes(b"not a hive" * 1000)
+        with self.assertRaises(RegfError):
+            RegfBackend(bogus)
+
+
+if __name__ == "__main__":
+    unittest.main()
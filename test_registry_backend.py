@@ -0,0 +1,312 @@
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+
+from change_manager import ApplyStatus, ChangePlan
+from registry_backend import (
+    HKEY_CURRENT_USER,
+    REG_BINARY,
+    REG_DWORD,
+    REG_MULTI_SZ,
+    REG_SZ,
+    InMemoryRegistryBackend,
+)
+from registry_handler import RegistryHandler
+from registry_search import RegistrySearch
+from search_index import SearchIndex
+
+
+HIVE = HKEY_CURRENT_USER
+
+
+class CountingBackend(InMemoryRegistryBackend):
+    """Counts path-addressed value calls and key sessions."""
+
+    def __init__(self):
+        super().__init__()
+        self.path_calls = 0
+        self.sessions = 0
+
+    def query_value(self, hive, path, name):
+        self.path_calls += 1
+        return super().query_value(hive, path, name)
+
+    def set_value(self, hive, path, name, data, value_type):
+        self.path_calls += 1
+        super().set_value(hive, path, name, data, value_type)
+
+    def open_key_session(self, hive, path):
+        self.sessions += 1
+        return super().open_key_session(hive, path)
+
+
+class TestInMemoryRegistryBackend(unittest.TestCase):
+    def setUp(self):
+        self.backend = InMemoryRegistryBackend()
+        self.backend.create_key(HIVE, r"Software\Vendor\App")
+
+    def test_paths_and_value_names_are_case_insensitive(self):
+        self.backend.set_value(HIVE, r"SOFTWARE\vendor\app", "Theme", "dark", REG_SZ)
+        self.backend.set_value(HIVE, r"software\Vendor\App", "THEME", "light", REG_SZ)
+
+        self.assertEqual(self.backend.query_value(HIVE, r"Software\Vendor\App", "theme"), ("light", REG_SZ))
+        self.assertEqual(self.backend.enum_values(HIVE, r"Software\Vendor\App"), [("Theme", "light", REG_SZ)])
+        self.assertEqual(self.backend.enum_keys(HIVE, "software"), ["Vendor"])
+
+    def test_missing_keys_and_values_raise_like_winreg(self):
+        with self.assertRaises(FileNotFoundError):
+            self.backend.enum_values(HIVE, r"Software\Missing")
+        with self.assertRaises(FileNotFoundError):
+            self.backend.query_value(HIVE, r"Software\Vendor\App", "Missing")
+        with self.assertRaises(FileNotFoundError):
+            self.backend.set_value(HIVE, r"Software\Missing", "x", 1, REG_DWORD)
+        with self.assertRaises(FileNotFoundError):
+            self.backend.delete_value(HIVE, r"Software\Vendor\App", "Missing")
+
+    def test_keys_with_subkeys_cannot_be_deleted(self):
+        with self.assertRaises(PermissionError):
+            self.backend.delete_key(HIVE, r"Software\Vendor")
+        self.backend.delete_key(HIVE, r"Software\Vendor\App")
+        self.backend.delete_key(HIVE, r"Software\Vendor")
+        self.assertEqual(self.backend.enum_keys(HIVE, "Software"), [])
+
+    def test_last_write_advances_on_every_change(self):
+        path = r"Software\Vendor\App"
+        stamps = [self.backend.last_write_time(HIVE, path)]
+        self.backend.set_value(HIVE, path, "A", 1, REG_DWORD)
+        stamps.append(self.backend.last_write_time(HIVE, path))
+        self.backend.create_key(HIVE, path + r"\Child")
+        stamps.append(self.backend.last_write_time(HIVE, path))
+        self.backend.delete_value(HIVE, path, "A")
+        stamps.append(self.backend.last_write_time(HIVE, path))
+
+        self.assertEqual(stamps, sorted(set(stamps)))
+        info = self.backend.read_key(HIVE, path, unchanged_since=stamps[-1])
+        self.assertEqual((info.subkeys, info.values), (None, None))
+        self.assertEqual(self.backend.query_info(HIVE, path)[:2], (1, 0))
+
+    def test_returned_data_is_not_shared_with_the_store(self):
+        path = r"Software\Vendor\App"
+        original = ["one", "two"]
+        self.backend.set_value(HIVE, path, "List", original, REG_MULTI_SZ)
+        original.append("three")
+        self.backend.query_value(HIVE, path, "List")[0].append("four")
+
+        self.assertEqual(self.backend.query_value(HIVE, path, "List"), (["one", "two"], REG_MULTI_SZ))
+
+
+class TestHandlerOnInMemoryBackend(unittest.TestCase):
+    def setUp(self):
+        self.backend = InMemoryRegistryBackend()
+        self.handler = RegistryHandler(backend=self.backend)
+        self.path = r"Software\RegistryManagerTests"
+        self.assertTrue(self.handler.create_key(HIVE, self.path))
+
+    def test_handler_error_semantics_are_kept(self):
+        self.assertIsNone(self.handler.read_key(HIVE, r"Software\Missing"))
+        self.assertIsNone(self.handler.read_value(HIVE, self.path, "Missing"))
+        self.assertIsNone(self.handler.read_key_full(HIVE, r"Software\Missing"))
+        self.assertEqual(self.handler.enum_keys(HIVE, r"Software\Missing"), [])
+        self.assertIsNone(self.handler.scan_key(HIVE, r"Software\Missing"))
+        self.assertFalse(self.handler.delete_value(HIVE, self.path, "Missing"))
+        self.assertIsNotNone(self.handler.last_error)
+
+    def test_change_plan_apply_and_undo(self):
+        self.handler.write_value(HIVE, self.path, "Keep", b"\x00\x01", REG_BINARY)
+        plan = ChangePlan(self.handler, "in-memory")
+        plan.set_value(HIVE, self.path, "Counter", 7, REG_DWORD)
+        plan.delete_value(HIVE, self.path, "Keep")
+
+        self.assertTrue(plan.apply().success)
+        self.assertEqual(self.handler.read_key(HIVE, self.path), [("Counter", 7, REG_DWORD)])
+        self.assertTrue(plan.create_inverse_plan().apply().success)
+        self.assertEqual(self.handler.read_key(HIVE, self.path), [("Keep", b"\x00\x01", REG_BINARY)])
+
+    def test_apply_trusts_session_last_write_times(self):
+        self.handler.write_value(HIVE, self.path, "A", 1, REG_DWORD)
+        plan = ChangePlan(self.handler)
+        plan.STAMP_MARGIN = 0  # The in-memory clock has no coarse resolution.
+        plan.set_values(HIVE, self.path, [("A", 2, REG_DWORD), ("B", 3, REG_DWORD)])
+        self.assertEqual(plan.apply().precheck_reads_skipped, 2)
+
+        stale = ChangePlan(self.handler)
+        stale.STAMP_MARGIN = 0
+        stale.set_value(HIVE, self.path, "A", 5, REG_DWORD)
+        self.handler.write_value(HIVE, self.path, "B", 4, REG_DWORD)
+        result = stale.apply()
+        self.assertEqual(result.status, ApplyStatus.SUCCESS)
+        self.assertEqual(result.precheck_reads_skipped, 0)
+
+    def test_key_sessions_fall_back_to_path_calls_for_missing_keys(self):
+        with self.handler.key_session(HIVE, self.path) as session:
+            self.assertTrue(session.write_value("A", 1, REG_DWORD))
+            self.assertEqual(session.read_value("a"), (1, REG_DWORD))
+            self.assertTrue(session.delete_value("A"))
+            self.assertIsNone(session.read_value("A"))
+        with self.handler.key_session(HIVE, r"Software\Missing") as session:
+            self.assertIsNone(session.read_value("A"))
+            self.assertFalse(session.write_value("A", 1, REG_DWORD))
+            self.assertIsNotNone(self.handler.last_error)
+
+    def test_sessions_on_deleted_keys_fail_instead_of_writing_elsewhere(self):
+        child = self.path + r"\Child"
+        self.handler.create_key(HIVE, child)
+        with self.handler.key_session(HIVE, child) as session:
+            self.handler.delete_key(HIVE, child)
+            self.handler.create_key(HIVE, child)
+            self.assertFalse(session.write_value("A", 1, REG_DWORD))
+        self.assertEqual(self.handler.read_key(HIVE, child), [])
+
+    def test_apply_opens_each_key_once(self):
+        backend = CountingBackend()
+        handler = RegistryHandler(backend=backend)
+        plan = ChangePlan(handler, "grouped")
+        for key in range(3):
+            path = rf"{self.path}\Key{key}"
+            handler.create_key(HIVE, path)
+            plan.set_values(HIVE, path, [(f"V{i}", i, REG_DWORD) for i in range(4)])
+        backend.path_calls = 0
+
+        result = plan.apply()
+
+        self.assertEqual(result.applied_count, 12)
+        self.assertEqual((backend.sessions, backend.path_calls), (3, 0))
+        self.assertEqual(handler.read_value(HIVE, rf"{self.path}\Key2", "V3"), (3, REG_DWORD))
+
+    def test_conflict_in_a_later_key_rolls_back_earlier_keys(self):
+        first, second = self.path + r"\First", self.path + r"\Second"
+        for path in (first, second):
+            self.handler.create_key(HIVE, path)
+        self.handler.write_value(HIVE, second, "B", 1, REG_DWORD)
+        plan = ChangePlan(self.handler)
+        plan.set_values(HIVE, first, [("A", 1, REG_DWORD), ("Z", 2, REG_DWORD)])
+        plan.set_values(HIVE, second, [("C", 3, REG_DWORD), ("B", 2, REG_DWORD)])
+        self.handler.write_value(HIVE, second, "B", 99, REG_DWORD)
+
+        result = plan.apply()
+
+        self.assertEqual(result.status, ApplyStatus.ROLLED_BACK)
+        self.assertEqual((result.applied_count, result.rolled_back_count), (2, 2))
+        self.assertEqual(self.handler.read_key(HIVE, first), [])
+        self.assertEqual(self.handler.read_key(HIVE, second), [("B", 99, REG_DWORD)])
+
+    def test_search_and_index_run_against_the_backend(self):
+        for i in range(20):
+            self.handler.create_key(HIVE, rf"{self.path}\Item{i}")
+            self.handler.write_value(HIVE, rf"{self.path}\Item{i}", "Label", f"label {i}", REG_SZ)
+
+        live = RegistrySearch(self.handler, max_workers=4).search(HIVE, self.path, "label 1")
+        self.assertEqual(len(live), 11)
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            index = SearchIndex(Path(temp_dir) / "index.sqlite3", self.handler)
+            index.refresh(HIVE, self.path)
+            self.handler.write_value(HIVE, rf"{self.path}\Item3", "Label", "changed", REG_SZ)
+            stats = index.refresh(HIVE, self.path)
+
+            self.assertEqual(stats.keys_rescanned, 1)
+            self.assertEqual(len(index.search(HIVE, self.path, "label 1")), 11)
+            self.assertEqual(len(index.search(HIVE, self.path, "changed")), 1)
+
+
+class FlakyBackend(InMemoryRegistryBackend):
+    """Key sessions that add write latency and fail chosen value names.
+
+    Latency is added outside the backend lock, the way a registry call
+    blocks in the kernel, so concurrent sessions really overlap.
+    """
+
+    def __init__(self, latency=0.005, fail_names=()):
+        super().__init__()
+        self.latency = latency
+        self.fail_names = {name.casefold() for name in fail_names}
+        self.writes = []
+        self.active = 0
+        self.peak = 0
+        self.counter_lock = threading.Lock()
+
+    def open_key_session(self, hive, path):
+        return FlakySession(self, super().open_key_session(hive, path), path)
+
+
+class FlakySession:
+    def __init__(self, backend, session, path):
+        self.backend = backend
+        self.session = session
+        self.key = path.rsplit("\\", 1)[-1]
+
+    def query_value(self, name):
+        return self.session.query_value(name)
+
+    def set_value(self, name, data, value_type):
+        backend = self.backend
+        with backend.counter_lock:
+            backend.active += 1
+            backend.peak = max(backend.peak, backend.active)
+        try:
+            time.sleep(backend.latency)
+            if name.casefold() in backend.fail_names:
+                raise OSError(5, "injected failure", name)
+            with backend.counter_lock:
+                backend.writes.append((self.key, name))
+            self.session.set_value(name, data, value_type)
+        finally:
+            with backend.counter_lock:
+                backend.active -= 1
+
+    def delete_value(self, name):
+        self.session.delete_value(name)
+
+    def close(self):
+        self.session.close()
+
+
+class TestParallelApply(unittest.TestCase):
+    def build(self, backend, keys=6, values=3):
+        handler = RegistryHandler(backend=backend)
+        plan = ChangePlan(handler, "parallel")
+        for key in range(keys):
+            path = rf"Software\Parallel\Key{key}"
+            handler.create_key(HIVE, path)
+            plan.set_values(HIVE, path, [(f"K{key}V{i}", i, REG_DWORD) for i in range(values)])
+        return handler, plan
+
+    def test_keys_run_concurrently_and_keep_order_within_a_key(self):
+        backend = FlakyBackend()
+        handler, plan = self.build(backend)
+
+        result = plan.apply(max_workers=4)
+
+        self.assertEqual(result.status, ApplyStatus.SUCCESS)
+        self.assertEqual(result.applied_count, 18)
+        self.assertGreater(backend.peak, 1)
+        for key in range(6):
+            names = [name for node, name in backend.writes if node == f"Key{key}"]
+            self.assertEqual(names, [f"K{key}V{i}" for i in range(3)])
+
+    def test_failure_rolls_back_every_group_and_reports_the_earliest(self):
+        backend = FlakyBackend(fail_names=["K0V2", "K3V1"])
+        handler, plan = self.build(backend)
+
+        result = plan.apply(max_workers=4)
+
+        self.assertEqual(result.status, ApplyStatus.ROLLED_BACK)
+        self.assertEqual(result.error.change.name, "K0V2")
+        self.assertEqual(result.applied_count, result.rolled_back_count)
+        for key in range(6):
+            self.assertEqual(handler.read_key(HIVE, rf"Software\Parallel\Key{key}"), [])
+
+    def test_serial_and_parallel_results_match(self):
+        outcomes = []
+        for max_workers in (None, 3):
+            backend = FlakyBackend(latency=0, fail_names=["K2V0"])
+            _, plan = self.build(backend)
+            result = plan.apply(max_workers=max_workers)
+            outcomes.append((result.status, result.error.code, result.error.change.name))
+        self.assertEqual(outcomes[0], outcomes[1])
+
+
+if __name__ == "__main__":
+    unittest.main()
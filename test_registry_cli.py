@@ -0,0 +1,167 @@
+import io
+import json
+import subprocess
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+from change_journal import ChangeJournal
+from change_manager import ChangePlan
+from plan_format import save_plan
+from preset_manager import PresetManager
+from registry_backend import HKEY_CURRENT_USER, REG_DWORD, REG_SZ, InMemoryRegistryBackend
+from registry_cli import (
+    EXIT_FAILED,
+    EXIT_OK,
+    EXIT_USAGE,
+    build_parser,
+    main,
+    run,
+)
+from registry_handler import RegistryHandler
+
+
+PATH = r"Software\CliTests"
+
+
+class TestRegistryCli(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = Path(self.temp_dir.name)
+        self.handler = RegistryHandler(self.root / "backups", backend=InMemoryRegistryBackend())
+        self.handler.create_key(HKEY_CURRENT_USER, PATH)
+        self.handler.write_value(HKEY_CURRENT_USER, PATH, "Mode", 1, REG_DWORD)
+        self.presets = PresetManager(self.root / "presets.json")
+        self.presets.save_preset("Dark", {"path": PATH, "values": [("Mode", 0, REG_DWORD)]})
+        self.presets.save_preset("Named", {"path": PATH, "values": [("Name", "cli", REG_SZ)]})
+
+    def tearDown(self):
+        if self.handler.journal is not None:
+            self.handler.journal.close()
+        self.temp_dir.cleanup()
+
+    def run_cli(self, *argv):
+        out = io.StringIO()
+        code = run(build_parser().parse_args(argv), self.handler, out, self.presets)
+        return code, out.getvalue()
+
+    def test_dry_run_previews_without_writing(self):
+        code, output = self.run_cli("--preset", "Dark", "--preset", "Named", "--dry-run", "--json")
+
+        self.assertEqual(code, EXIT_OK)
+        report = json.loads(output)
+        self.assertEqual([entry["status"] for entry in report["plans"]], ["planned", "planned"])
+        [change] = report["plans"][0]["changes"]
+        self.assertEqual(change["action"], "modify")
+        self.assertEqual(change["before"], {"type": "REG_DWORD", "data": "1"})
+        self.assertEqual(self.handler.read_value(HKEY_CURRENT_USER, PATH, "Mode"), (1, REG_DWORD))
+        self.assertFalse((self.root / "backups").exists())
+
+    def test_apply_backs_up_applies_and_reports_text(self):
+        code, output = self.run_cli("--preset", "Dark", "--preset", "Named")
+
+        self.assertEqual(code, EXIT_OK)
+        self.assertIn("MODIFY  HKEY_CURRENT_USER\\Software\\CliTests • Mode: REG_DWORD 1 -> REG_DWORD 0", output)
+        self.assertIn("success: Applied 1 change(s).", output)
+        self.assertEqual(self.handler.read_value(HKEY_CURRENT_USER, PATH, "Mode"), (0, REG_DWORD))
+        self.assertEqual(len(list((self.root / "backups").glob("*.reg"))), 2)
+
+    def test_unknown_target_applies_nothing(self):
+        code, output = self.run_cli("--preset", "Dark", "--plan", str(self.root / "missing.rmplan"), "--json")
+
+        self.assertEqual(code, EXIT_USAGE)
+        self.assertIn("missing.rmplan", json.loads(output)["error"])
+        self.assertEqual(self.handler.read_value(HKEY_CURRENT_USER, PATH, "Mode"), (1, REG_DWORD))
+
+    def test_preset_without_a_path_is_a_usage_error(self):
+        self.presets.save_preset("NoPath", {"values": [("Mode", 0, REG_DWORD)]})
+
+        code, output = self.run_cli("--preset", "NoPath", "--dry-run", "--json")
+
+        self.assertEqual(code, EXIT_USAGE)
+        self.assertIn("NoPath", json.loads(output)["error"])
+
+    def test_plan_files_replay_and_failures_stop_later_plans(self):
+        plan = ChangePlan(self.handler)
+        plan.set_value(HKEY_CURRENT_USER, PATH, "Mode", 7, REG_DWORD)
+        save_plan(plan, self.root / "rollout.jsonl")
+        self.handler.delete_key(HKEY_CURRENT_USER, PATH)
+
+        code, output = self.run_cli(
+            "--plan", str(self.root / "rollout.jsonl"), "--preset", "Named", "--no-backup", "--json",
+        )
+
+        # The key is gone, so the write fails and the preset is not attempted.
+        self.assertEqual(code, EXIT_FAILED)
+        statuses = [entry["status"] for entry in json.loads(output)["plans"]]
+        self.assertEqual(statuses, ["failed", "not_run"])
+
+    def test_interrupted_plans_block_until_recovered(self):
+        journal = self.handler.journal = ChangeJournal(self.root / "journal.jsonl")
+        interrupted = ChangePlan(self.handler, "Earlier run")
+        interrupted.set_value(HKEY_CURRENT_USER, PATH, "Mode", 5, REG_DWORD)
+        journal.begin(interrupted, interrupted.effective_changes)
+
+        code, _ = self.run_cli("--preset", "Dark", "--no-backup")
+        self.assertEqual(code, EXIT_FAILED)
+        self.assertEqual(self.handler.read_value(HKEY_CURRENT_USER, PATH, "Mode"), (1, REG_DWORD))
+
+        code, output = self.run_cli("--preset", "Dark", "--no-backup", "--recover", "--json")
+        self.assertEqual(code, EXIT_OK)
+        self.assertEqual(json.loads(output)["recovered"][0]["status"], "no_changes")
+        self.assertEqual(self.handler.read_value(HKEY_CURRENT_USER, PATH, "Mode"), (0, REG_DWORD))
+
+    def test_recovery_restores_written_values_before_planning(self):
+        journal = self.handler.journal = ChangeJournal(self.root / "journal.jsonl")
+        interrupted = ChangePlan(self.handler, "Earlier run")
+        interrupted.set_value(HKEY_CURRENT_USER, PATH, "Mode", 5, REG_DWORD)
+        journal.begin(interrupted, interrupted.effective_changes)
+        self.handler.write_value(HKEY_CURRENT_USER, PATH, "Mode", 5, REG_DWORD)
+
+        code, output = self.run_cli("--preset", "Dark", "--no-backup", "--recover", "--json")
+
+        self.assertEqual(code, EXIT_OK)
+        report = json.loads(output)
+        self.assertEqual(report["recovered"][0]["status"], "rolled_back")
+        [change] = report["plans"][0]["changes"]
+        self.assertEqual(change["before"], {"type": "REG_DWORD", "data": "1"})
+        self.assertEqual(report["plans"][0]["status"], "success")
+        self.assertEqual(self.handler.read_value(HKEY_CURRENT_USER, PATH, "Mode"), (0, REG_DWORD))
+
+    def test_listing_and_dry_runs_leave_preset_files_untouched(self):
+        presets_file = self.root / "presets.json"
+        before = presets_file.read_bytes()
+
+        main(["--presets-file", str(presets_file), "--list-presets"], io.StringIO())
+        main(["--data-dir", str(self.root), "--preset", "Dark", "--dry-run", "--json"], io.StringIO())
+
+        self.assertEqual(presets_file.read_bytes(), before)
+        self.assertFalse((self.root / "presets.sqlite3").exists())
+
+        database = PresetManager(presets_file, db_path=self.root / "presets.sqlite3")
+        database.save_preset("Stored", {"path": PATH, "values": [("Mode", 2, REG_DWORD)]})
+        database.close()
+        stored = (self.root / "presets.sqlite3").read_bytes()
+        out = io.StringIO()
+
+        main(["--data-dir", str(self.root), "--list-presets", "--json"], out)
+
+        self.assertIn("Stored", json.loads(out.getvalue()))
+        self.assertEqual((self.root / "presets.sqlite3").read_bytes(), stored)
+        self.assertEqual(presets_file.read_bytes(), before)
+
+    def test_cli_imports_no_ui_or_plan_file_modules(self):
+        probe = (
+            "import sys, registry_cli; "
+            "print(sorted(m for m in ('customtkinter', 'tkinter', 'ui', 'plan_format') if m in sys.modules))"
+        )
+        output = subprocess.run(
+            [sys.executable, "-c", probe], capture_output=True, text=True, check=True,
+            cwd=Path(__file__).resolve().parent,
+        ).stdout
+        self.assertEqual(output.strip(), "[]")
+
+
+if __name__ == "__main__":
+    unittest.main()
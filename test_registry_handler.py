@@ -2,7 +2,10 @@ import unittest
 import winreg
 import os
 import uuid
-from registry_handler import RegistryHandler
+from unittest import mock
+
+import registry_handler
+from registry_handler import KeyHandleCache, RegistryHandler, RegistryOperationError
 from change_manager import ChangePlan
 
 class TestRegistryHandler(unittest.TestCase):
@@ -93,5 +96,157 @@ class TestRegistryHandler(unittest.TestCase):
             )
         )
 
+
+class FakeKeyHandle:
+    def __init__(self, parent, path):
+        self.parent = parent
+        self.path = path
+        self.closed = False
+
+    def Close(self):
+        self.closed = True
+
+
+class TestKeyHandleCache(unittest.TestCase):
+    def setUp(self):
+        self.opened = []
+
+        def open_key(parent, path, reserved=0, access=0):
+            handle = FakeKeyHandle(parent, path)
+            self.opened.append(handle)
+            return handle
+
+        patcher = mock.patch.object(registry_handler.winreg, "OpenKey", side_effect=open_key)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.cache = KeyHandleCache(capacity=3)
+        self.hive = winreg.HKEY_CURRENT_USER
+        self.read = winreg.KEY_READ
+
+    def test_repeated_access_reuses_one_handle(self):
+        first = self.cache.run(self.hive, "Software\\Demo", self.read, lambda key: key)
+        second = self.cache.run(self.hive, "software\\DEMO", self.read, lambda key: key)
+
+        self.assertIs(first, second)
+        self.assertEqual(len(self.opened), 1)
+        self.assertEqual(self.cache.stats()[:2], (1, 1))
+
+    def test_children_open_relative_to_cached_parent(self):
+        parent = self.cache.run(self.hive, "Software\\Demo", self.read, lambda key: key)
+        child = self.cache.run(self.hive, "Software\\Demo\\Child\\Leaf", self.read, lambda key: key)
+
+        self.assertIs(child.parent, parent)
+        self.assertEqual(child.path, "Child\\Leaf")
+        self.assertEqual(self.cache.stats().relative_opens, 1)
+
+    def test_access_masks_are_cached_separately(self):
+        reader = self.cache.run(self.hive, "Software\\Demo", self.read, lambda key: key)
+        writer = self.cache.run(self.hive, "Software\\Demo", winreg.KEY_SET_VALUE, lambda key: key)
+        self.assertIsNot(reader, writer)
+
+    def test_least_recently_used_handles_are_closed(self):
+        handles = [
+            self.cache.run(self.hive, f"Key{i}", self.read, lambda key: key) for i in range(3)
+        ]
+        self.cache.run(self.hive, "Key0", self.read, lambda key: key)
+        self.cache.run(self.hive, "Key3", self.read, lambda key: key)
+
+        self.assertTrue(handles[1].closed)
+        self.assertFalse(handles[0].closed)
+        self.assertEqual(self.cache.stats().evictions, 1)
+        self.assertEqual(self.cache.stats().open_handles, 3)
+
+    def test_invalidate_closes_subtree_only(self):
+        demo = self.cache.run(self.hive, "Software\\Demo", self.read, lambda key: key)
+        child = self.cache.run(self.hive, "Software\\Demo\\Child", self.read, lambda key: key)
+        sibling = self.cache.run(self.hive, "Software\\Demolition", self.read, lambda key: key)
+
+        self.cache.invalidate(self.hive, "software\\demo")
+
+        self.assertTrue(demo.closed and child.closed)
+        self.assertFalse(sibling.closed)
+        self.assertEqual(self.cache.stats().open_handles, 1)
+
+    def test_deleted_key_handle_is_reopened_once(self):
+        stale = self.cache.run(self.hive, "Software\\Demo", self.read, lambda key: key)
+
+        def operation(key):
+            if key is stale:
+                error = OSError("Illegal operation on a key marked for deletion")
+                error.winerror = 1018
+                raise error
+            return "fresh"
+
+        self.assertEqual(self.cache.run(self.hive, "Software\\Demo", self.read, operation), "fresh")
+        self.assertTrue(stale.closed)
+
+    def test_handler_invalidates_on_key_deletion(self):
+        handler = RegistryHandler()
+        handler.backend.key_cache = self.cache
+        handle = self.cache.run(self.hive, "Software\\Demo", self.read, lambda key: key)
+        with mock.patch.object(registry_handler.winreg, "DeleteKey"):
+            self.assertTrue(handler.delete_key(self.hive, "Software\\Demo"))
+        self.assertTrue(handle.closed)
+
+
+class TestReadKeyFull(unittest.TestCase):
+    def setUp(self):
+        self.handler = RegistryHandler()
+        self.hive = winreg.HKEY_CURRENT_USER
+
+    def patch_winreg(self, **functions):
+        for name, function in functions.items():
+            patcher = mock.patch.object(registry_handler.winreg, name, side_effect=function)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_counts_presize_one_open_without_exceptions(self):
+        subkeys = ["A", "B"]
+        values = [("One", 1, winreg.REG_DWORD), ("", "text", winreg.REG_SZ)]
+        opens = []
+
+        def enum(items):
+            def call(key, index):
+                self.assertLess(index, len(items), "enumerated past QueryInfoKey count")
+                return items[index]
+            return call
+
+        self.patch_winreg(
+            OpenKey=lambda *args: opens.append(args) or FakeKeyHandle(*args[:2]),
+            QueryInfoKey=lambda key: (2, 2, 1234),
+            EnumKey=enum(subkeys),
+            EnumValue=enum(values),
+        )
+
+        info = self.handler.read_key_full(self.hive, "Software\\Demo")
+
+        self.assertEqual(info, (subkeys, values, 1234))
+        self.assertEqual(info.last_write, 1234)
+        self.assertEqual(len(opens), 1)
+
+    def test_listing_is_truncated_when_key_shrinks(self):
+        def enum_key(key, index):
+            if index:
+                raise OSError("No more data is available")
+            return "Only"
+
+        self.patch_winreg(
+            OpenKey=lambda *args: FakeKeyHandle(*args[:2]),
+            QueryInfoKey=lambda key: (3, 0, 1),
+            EnumKey=enum_key,
+        )
+        self.assertEqual(self.handler.read_key_full(self.hive, "K").subkeys, ["Only"])
+
+    def test_missing_and_unreadable_keys(self):
+        def open_key(parent, path, reserved=0, access=0):
+            if path == "Missing":
+                raise FileNotFoundError(path)
+            raise PermissionError("Access is denied")
+
+        self.patch_winreg(OpenKey=open_key)
+        self.assertIsNone(self.handler.read_key_full(self.hive, "Missing"))
+        with self.assertRaises(RegistryOperationError):
+            self.handler.read_key_full(self.hive, "Locked")
+
 if __name__ == '__main__':
     unittest.main()
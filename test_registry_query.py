@@ -0,0 +1,127 @@
+import unittest
+
+from registry_query import CompiledQuery, QuerySyntaxError, SubstringMatcher, compile_query
+from registry_search import RegistrySearch
+
+
+HIVE = 0x80000001
+REG_SZ = 1
+REG_BINARY = 3
+REG_DWORD = 4
+REG_QWORD = 11
+
+
+class TreeHandler:
+    def __init__(self, keys):
+        self.keys = {path.casefold(): (path, values) for path, values in keys.items()}
+        self.scanned = []
+        self.value_enumerations = []
+
+    def scan_key(self, hive, subkey, include_values=True):
+        self.scanned.append(subkey)
+        fold = subkey.casefold()
+        if fold not in self.keys and fold:
+            return None
+        prefix = fold + "\\" if fold else ""
+        subkeys = [
+            path.rpartition("\\")[2]
+            for key, (path, _) in self.keys.items()
+            if key.startswith(prefix) and "\\" not in key[len(prefix):]
+        ]
+        if not include_values:
+            return subkeys, []
+        self.value_enumerations.append(subkey)
+        return subkeys, list(self.keys.get(fold, ("", []))[1])
+
+
+class TestCompileQuery(unittest.TestCase):
+    def test_plain_text_keeps_legacy_substring_meaning(self):
+        matcher = compile_query("Dark Mode: on")
+        self.assertIsInstance(matcher, SubstringMatcher)
+        self.assertTrue(matcher.match_value("K", "Name", "dark mode: ON", REG_SZ))
+        self.assertFalse(matcher.match_key("K\\Dark", "Dark"))
+        windows = compile_query(r"C:\Windows")
+        self.assertIsInstance(windows, SubstringMatcher)
+        self.assertTrue(windows.match_value("K", "Path", r"c:\windows\system32", REG_SZ))
+
+    def test_combined_expression(self):
+        query = compile_query(r"type:REG_DWORD name:/^Hide/ data>=1 path:Software\Microsoft\*")
+        self.assertIsInstance(query, CompiledQuery)
+        path = r"Software\Microsoft\Windows\Explorer\Advanced"
+
+        self.assertTrue(query.match_value(path, "HideFileExt", "1", REG_DWORD))
+        self.assertFalse(query.match_value(path, "HideFileExt", "0", REG_DWORD))
+        self.assertFalse(query.match_value(path, "ShowHidden", "1", REG_DWORD))
+        self.assertFalse(query.match_value(path, "HideFileExt", "1", REG_SZ))
+        self.assertFalse(query.match_value(r"Software\Other", "HideFileExt", "1", REG_DWORD))
+        self.assertFalse(query.match_key(path, "HideThings"))
+
+    def test_type_lists_numbers_and_short_names(self):
+        query = compile_query("type:dword,REG_QWORD,3")
+        for value_type in (REG_DWORD, REG_QWORD, REG_BINARY):
+            self.assertTrue(query.match_value("K", "V", "", value_type))
+        self.assertFalse(query.match_value("K", "V", "", REG_SZ))
+
+    def test_integer_comparisons_only_apply_to_integer_types(self):
+        self.assertTrue(compile_query("data<0x10").match_value("K", "V", "15", REG_QWORD))
+        self.assertFalse(compile_query("data<0x10").match_value("K", "V", "15", REG_SZ))
+        self.assertTrue(compile_query("data!=2").match_value("K", "V", "3", REG_DWORD))
+        self.assertTrue(compile_query('data="Light"').match_value("K", "V", "light", REG_SZ))
+
+    def test_bare_words_and_quotes_are_anded(self):
+        query = compile_query('theme "dark mode" name:Apps')
+        self.assertTrue(query.match_value("K", "AppsTheme", "Dark Mode", REG_SZ))
+        self.assertFalse(query.match_value("K", "AppsTheme", "Light", REG_SZ))
+        self.assertTrue(query.match_key("K\\AppsThemeDark Mode", "AppsThemeDark Mode"))
+
+    def test_path_glob_prunes_unrelated_subtrees(self):
+        query = compile_query(r"path:Software\Microsoft\* name:x")
+        self.assertTrue(query.may_contain(""))
+        self.assertTrue(query.may_contain("SOFTWARE"))
+        self.assertTrue(query.may_contain(r"software\microsoft\windows"))
+        self.assertFalse(query.may_contain(r"Software\Mozilla"))
+        self.assertFalse(query.may_contain("System"))
+        self.assertFalse(query.wants_values(r"Software\Microsoft"))
+        self.assertTrue(query.wants_values(r"Software\Microsoft\Windows"))
+
+        exact = compile_query(r"path:Software\Demo name:x")
+        self.assertTrue(exact.may_contain(r"Software\Demo"))
+        self.assertFalse(exact.may_contain(r"Software\Demo\Child"))
+
+    def test_syntax_errors_are_reported(self):
+        for text in ("name:/[unclosed/", "type:REG_BOGUS", "data>=abc", "path>1"):
+            with self.subTest(text=text):
+                with self.assertRaises(QuerySyntaxError):
+                    compile_query(text)
+
+
+class TestQueryDrivenSearch(unittest.TestCase):
+    def test_path_predicates_prune_before_values_are_enumerated(self):
+        handler = TreeHandler({
+            "Software": [("Hide", 1, REG_DWORD)],
+            r"Software\Microsoft": [("HideRoot", 1, REG_DWORD)],
+            r"Software\Microsoft\Explorer": [("HideFileExt", 1, REG_DWORD), ("HideIcons", 0, REG_DWORD)],
+            r"Software\Microsoft\Explorer\Deep": [("HideDeep", "1", REG_SZ)],
+            r"Software\Mozilla": [("HideAll", 1, REG_DWORD)],
+            r"Software\Mozilla\Firefox": [("HideMe", 1, REG_DWORD)],
+            "System": [("HideSystem", 1, REG_DWORD)],
+        })
+
+        results = RegistrySearch(handler, max_workers=1).search(
+            HIVE, "", r"type:REG_DWORD name:/^Hide/ data>=1 path:Software\Microsoft\*"
+        )
+
+        self.assertEqual(
+            results,
+            [{"path": r"Software\Microsoft\Explorer", "type": "Value", "name": "HideFileExt", "data": "1"}],
+        )
+        self.assertNotIn(r"Software\Mozilla", handler.scanned)
+        self.assertNotIn("System", handler.scanned)
+        self.assertEqual(
+            handler.value_enumerations,
+            [r"Software\Microsoft\Explorer", r"Software\Microsoft\Explorer\Deep"],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
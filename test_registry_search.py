@@ -0,0 +1,179 @@
+import sys
+import threading
+import unittest
+
+from registry_search import RegistrySearch
+
+
+HIVE = 0x80000001
+
+
+class FakeHive:
+    """In-memory stand-in exposing the ``scan_key`` surface used by search."""
+
+    def __init__(self):
+        self.keys = {"": ([], [])}
+        self.scans = {}
+        self.lock = threading.Lock()
+
+    def add_key(self, path, values=()):
+        parent, _, name = path.rpartition("\\")
+        if path.casefold() not in self.keys:
+            self.keys[path.casefold()] = ([], list(values))
+            self.keys[parent.casefold()][0].append(name)
+        return path
+
+    def scan_key(self, hive, subkey):
+        with self.lock:
+            self.scans[subkey.casefold()] = self.scans.get(subkey.casefold(), 0) + 1
+        entry = self.keys.get(subkey.casefold())
+        if entry is None:
+            return None
+        return list(entry[0]), list(entry[1])
+
+
+def build_wide_tree(hive, fanout=12, depth=4):
+    level = [""]
+    count = 0
+    for depth_index in range(depth):
+        next_level = []
+        for parent in level:
+            for index in range(fanout):
+                name = f"Key{depth_index}_{index}"
+                path = f"{parent}\\{name}" if parent else name
+                values = [("Setting", index, 4), ("", f"data-{count}", 1)]
+                next_level.append(hive.add_key(path, values))
+                count += 1
+        level = next_level
+    return count
+
+
+def reference_search(hive, path, query):
+    """The original recursive algorithm, used as an oracle for small trees."""
+    results = []
+    subkeys, values = hive.scan_key(HIVE, path)
+    for subkey in subkeys:
+        full = f"{path}\\{subkey}" if path else subkey
+        if query.lower() in subkey.lower():
+            results.append({"path": full, "type": "Key", "name": subkey})
+        results.extend(reference_search(hive, full, query))
+    for name, data, _ in values:
+        name_text = name if name else "(Default)"
+        if query.lower() in name_text.lower() or query.lower() in str(data).lower():
+            results.append({"path": path, "type": "Value", "name": name_text, "data": str(data)})
+    return results
+
+
+def canonical(results):
+    return sorted(tuple(sorted(result.items())) for result in results)
+
+
+class TestRegistrySearch(unittest.TestCase):
+    def test_matches_recursive_reference_for_serial_and_parallel_walks(self):
+        hive = FakeHive()
+        build_wide_tree(hive, fanout=5, depth=3)
+        expected = canonical(reference_search(hive, "", "key1_3"))
+        expected_data = canonical(reference_search(hive, "", "DATA-4"))
+
+        for workers in (1, 4):
+            with self.subTest(workers=workers):
+                search = RegistrySearch(hive, max_workers=workers)
+                self.assertEqual(canonical(search.search(HIVE, "", "key1_3")), expected)
+                self.assertEqual(canonical(search.search(HIVE, "", "DATA-4")), expected_data)
+
+    def test_large_tree_scans_every_key_exactly_once(self):
+        hive = FakeHive()
+        key_count = build_wide_tree(hive, fanout=12, depth=4)
+
+        results = RegistrySearch(hive, max_workers=6).search(HIVE, "", "Setting")
+
+        self.assertEqual(len(results), key_count)
+        self.assertEqual(len(hive.scans), key_count + 1)
+        self.assertEqual(set(hive.scans.values()), {1})
+
+    def test_deep_tree_does_not_hit_recursion_limit(self):
+        hive = FakeHive()
+        path = ""
+        for index in range(sys.getrecursionlimit() + 500):
+            path = hive.add_key(f"{path}\\Level{index}" if path else f"Level{index}")
+        hive.keys[path.casefold()][1].append(("Needle", "bottom", 1))
+
+        for workers in (1, 3):
+            with self.subTest(workers=workers):
+                results = RegistrySearch(hive, max_workers=workers).search(HIVE, "", "needle")
+                self.assertEqual(
+                    results,
+                    [{"path": path, "type": "Value", "name": "Needle", "data": "bottom"}],
+                )
+
+    def test_stop_event_cancels_walk(self):
+        hive = FakeHive()
+        build_wide_tree(hive, fanout=6, depth=4)
+        stop_event = threading.Event()
+        original_scan = hive.scan_key
+
+        def stopping_scan(hive_id, subkey):
+            stop_event.set()
+            return original_scan(hive_id, subkey)
+
+        hive.scan_key = stopping_scan
+        results = RegistrySearch(hive, max_workers=4).search(HIVE, "", "Setting", stop_event)
+
+        self.assertEqual(results, [])
+        self.assertLess(len(hive.scans), 10)
+
+    def test_unreadable_and_missing_keys_contribute_nothing(self):
+        hive = FakeHive()
+        hive.add_key("Readable", [("Match", "x", 1)])
+        hive.add_key("Denied", [("Match", "y", 1)])
+        original_scan = hive.scan_key
+
+        def scan(hive_id, subkey):
+            if subkey == "Denied":
+                raise PermissionError("access denied")
+            return original_scan(hive_id, subkey)
+
+        hive.scan_key = scan
+        results = RegistrySearch(hive, max_workers=2).search(HIVE, "", "match")
+        self.assertEqual([result["path"] for result in results], ["Readable"])
+        self.assertEqual(RegistrySearch(hive).search(HIVE, "Missing", "match"), [])
+
+    def test_iter_batches_streams_per_key_batches(self):
+        hive = FakeHive()
+        key_count = build_wide_tree(hive, fanout=6, depth=3)
+
+        batches = [
+            batch
+            for batch in RegistrySearch(hive, max_workers=3).iter_batches(HIVE, "", "Setting")
+            if batch
+        ]
+
+        self.assertEqual(sum(len(batch) for batch in batches), key_count)
+        self.assertGreater(len(batches), 1)
+
+    def test_closing_iterator_cancels_walk_with_bounded_backlog(self):
+        hive = FakeHive()
+        key_count = build_wide_tree(hive, fanout=10, depth=4)
+        engine = RegistrySearch(hive, max_workers=2)
+
+        batches = engine.iter_batches(HIVE, "", "Setting", max_pending=4)
+        first = next(batch for batch in batches if batch)
+        batches.close()
+
+        self.assertTrue(first)
+        # Backpressure stopped the producer long before the tree was walked.
+        self.assertLess(engine.keys_scanned, key_count // 2)
+
+    def test_iter_batches_honours_caller_stop_event(self):
+        hive = FakeHive()
+        build_wide_tree(hive, fanout=4, depth=3)
+        stop_event = threading.Event()
+        stop_event.set()
+
+        batches = list(RegistrySearch(hive).iter_batches(HIVE, "", "Setting", stop_event))
+
+        self.assertEqual([batch for batch in batches if batch], [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,180 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from registry_backend import KeyInfo
+from registry_search import RegistrySearch
+from search_index import SearchIndex
+
+
+HIVE = 0x80000001
+
+
+class TimestampedHive:
+    """In-memory tree whose keys carry a last-write counter like FILETIME."""
+
+    def __init__(self):
+        self.clock = 1
+        self.keys = {"": {"name": "", "subkeys": [], "values": [], "last_write": 1}}
+        self.enumerations = 0
+
+    def _touch(self, entry):
+        self.clock += 1
+        entry["last_write"] = self.clock
+
+    def add_key(self, path, values=()):
+        parent, _, name = path.rpartition("\\")
+        self.keys[path.casefold()] = {
+            "name": name, "subkeys": [], "values": list(values), "last_write": 0,
+        }
+        self._touch(self.keys[path.casefold()])
+        self.keys[parent.casefold()]["subkeys"].append(name)
+        self._touch(self.keys[parent.casefold()])
+
+    def set_values(self, path, values):
+        entry = self.keys[path.casefold()]
+        entry["values"] = list(values)
+        self._touch(entry)
+
+    def delete_tree(self, path):
+        parent, _, name = path.rpartition("\\")
+        fold = path.casefold()
+        for key in [key for key in self.keys if key == fold or key.startswith(fold + "\\")]:
+            del self.keys[key]
+        self.keys[parent.casefold()]["subkeys"].remove(name)
+        self._touch(self.keys[parent.casefold()])
+
+    def scan_key(self, hive, subkey, unchanged_since=None):
+        entry = self.keys.get(subkey.casefold())
+        if entry is None:
+            return None
+        if unchanged_since is not None and unchanged_since == entry["last_write"]:
+            return KeyInfo(None, None, entry["last_write"])
+        self.enumerations += 1
+        return KeyInfo(list(entry["subkeys"]), list(entry["values"]), entry["last_write"])
+
+
+def canonical(results):
+    return sorted(tuple(sorted(result.items())) for result in results)
+
+
+class TestSearchIndex(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.db_path = Path(self.temp_dir.name) / "index" / "search_index.sqlite3"
+        self.hive = TimestampedHive()
+        for top in range(6):
+            self.hive.add_key(f"Software{top}", [("Version", top, 4)])
+            for child in range(8):
+                self.hive.add_key(
+                    f"Software{top}\\Vendor{child}",
+                    [("", f"café {top}-{child}", 1), ("Flags", b"\x01\x02", 3)],
+                )
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def assert_matches_live(self, index, start_path, query):
+        live = RegistrySearch(self.hive, max_workers=1).search(HIVE, start_path, query)
+        self.assertEqual(
+            canonical(index.search(HIVE, start_path, query)), canonical(live)
+        )
+
+    def test_index_answers_like_live_search(self):
+        index = SearchIndex(self.db_path, self.hive)
+        stats = index.refresh(HIVE)
+
+        self.assertTrue(stats.complete)
+        self.assertEqual(stats.keys_rescanned, 1 + 6 + 48)
+        for query in ("vendor3", "CAFÉ 2-", "x01", "ve", "(default)", "software1"):
+            with self.subTest(query=query):
+                self.assert_matches_live(index, "", query)
+        self.assert_matches_live(index, "Software2", "vendor")
+        self.assert_matches_live(index, "Software2\\Vendor1", "caf")
+        self.assertEqual(
+            len(index.search(HIVE, "software2\\VENDOR1", "caf")), 1
+        )
+
+    def test_unchanged_keys_are_not_enumerated_again(self):
+        index = SearchIndex(self.db_path, self.hive)
+        index.refresh(HIVE)
+        self.hive.enumerations = 0
+
+        self.hive.set_values("Software3\\Vendor4", [("Fresh", "needle", 1)])
+        stats = index.refresh(HIVE)
+
+        self.assertEqual(self.hive.enumerations, 1)
+        self.assertEqual(stats.keys_rescanned, 1)
+        self.assertEqual(stats.keys_reused, 1 + 6 + 47)
+        self.assertEqual(
+            index.search(HIVE, "", "needle"),
+            [{"path": "Software3\\Vendor4", "type": "Value", "name": "Fresh", "data": "needle"}],
+        )
+        self.assert_matches_live(index, "", "café 3-4")
+
+    def test_added_and_removed_subtrees_are_tracked(self):
+        index = SearchIndex(self.db_path, self.hive)
+        index.refresh(HIVE)
+
+        self.hive.delete_tree("Software1")
+        self.hive.add_key("Software2\\Added", [("Marker", "new", 1)])
+        stats = index.refresh(HIVE)
+
+        self.assertEqual(stats.keys_removed, 9)
+        self.assertEqual(index.search(HIVE, "", "Software1"), [])
+        self.assert_matches_live(index, "", "marker")
+        self.assert_matches_live(index, "", "vendor")
+        self.assertEqual(index.status().key_count, 1 + 5 + 40 + 1)
+
+    def test_status_reports_freshness_and_coverage(self):
+        index = SearchIndex(self.db_path, self.hive)
+        self.assertFalse(index.status().built)
+        self.assertFalse(index.covers(HIVE, ""))
+
+        index.refresh(HIVE, "Software0")
+        status = index.status()
+
+        self.assertTrue(status.built)
+        self.assertEqual((status.key_count, status.value_count), (9, 1 + 16))
+        self.assertLess(status.age_seconds(), 60)
+        self.assertTrue(index.covers(HIVE, "software0\\Vendor2"))
+        self.assertFalse(index.covers(HIVE, "Software1"))
+
+    def test_refresh_after_an_interrupted_one_indexes_everything(self):
+        class StopAfter:
+            def __init__(self, hive, limit):
+                self.hive, self.limit = hive, limit
+
+            def is_set(self):
+                return self.hive.enumerations >= self.limit
+
+        index = SearchIndex(self.db_path, self.hive)
+        stats = index.refresh(HIVE, stop_event=StopAfter(self.hive, 3))
+        self.assertFalse(stats.complete)
+        self.assertFalse(index.status().complete)
+
+        stats = index.refresh(HIVE)
+
+        self.assertTrue(stats.complete)
+        self.assertTrue(index.status().complete)
+        self.assertEqual(index.status().key_count, 1 + 6 + 48)
+        for query in ("vendor", "café", "software"):
+            with self.subTest(query=query):
+                self.assert_matches_live(index, "", query)
+
+    def test_plain_scan_fallback_matches_trigram_results(self):
+        index = SearchIndex(self.db_path, self.hive)
+        index.refresh(HIVE)
+        with_fts = canonical(index.search(HIVE, "", "vendor5"))
+        index.fts_enabled = False
+        self.assertEqual(canonical(index.search(HIVE, "", "vendor5")), with_fts)
+
+    def test_index_persists_across_instances(self):
+        SearchIndex(self.db_path, self.hive).refresh(HIVE)
+        reopened = SearchIndex(self.db_path, self.hive)
+        self.assertTrue(reopened.status().complete)
+        self.assert_matches_live(reopened, "", "flags")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,7 +1,8 @@
 import threading
 import unittest
 
-from ui.search_view import SearchView
+from search_index import SearchIndexError
+from ui.search_view import DISPLAY_LIMIT, SearchProgress, SearchView
 
 
 class SearchHarness:
@@ -16,6 +17,43 @@ class SearchHarness:
         self.published.append(results)
 
 
+class StreamingHarness:
+    def __init__(self, handler):
+        self.registry_handler = handler
+        self.scheduled = []
+
+    def _schedule(self, callback, *args):
+        self.scheduled.append((callback.__name__, args))
+        return True
+
+    def _publish_progress(self, *args):
+        pass
+
+    def _publish_results(self, *args):
+        pass
+
+    def _publish_failure(self, *args):
+        pass
+
+
+class BrokenIndex:
+    def iter_batches(self, hive, start_path, query, stop_event):
+        yield [{"path": "A", "type": "Key", "name": "A"}]
+        raise SearchIndexError("database disk image is malformed")
+
+
+class ManyMatchesHandler:
+    def __init__(self, key_count, values_per_key):
+        self.key_count = key_count
+        self.values_per_key = values_per_key
+
+    def scan_key(self, hive, subkey):
+        if subkey:
+            values = [(f"Hit{i}", i, 4) for i in range(self.values_per_key)]
+            return [], values
+        return [f"Key{i}" for i in range(self.key_count)], []
+
+
 class TestSearchGeneration(unittest.TestCase):
     def test_only_current_generation_can_publish(self):
         harness = SearchHarness()
@@ -44,5 +82,49 @@ class TestSearchGeneration(unittest.TestCase):
         self.assertEqual(harness.published, [])
 
 
+class TestStreamingSearch(unittest.TestCase):
+    def test_worker_streams_bounded_rows_and_exact_total(self):
+        harness = StreamingHarness(ManyMatchesHandler(key_count=50, values_per_key=40))
+        stop_event = threading.Event()
+
+        SearchView._run_search(harness, "hit", "", 1, stop_event)
+
+        names = [name for name, _ in harness.scheduled]
+        self.assertEqual(names[0], "_publish_progress")
+        self.assertEqual(names[-1], "_publish_results")
+        progresses = [args[2] for _, args in harness.scheduled]
+        self.assertTrue(progresses[0].rows)
+        self.assertEqual(sum(len(p.rows) for p in progresses), DISPLAY_LIMIT)
+        self.assertEqual(progresses[-1].total, 50 * 40)
+        self.assertEqual(progresses[-1].keys_scanned, 51)
+
+    def test_index_failure_is_published_instead_of_leaving_the_search_running(self):
+        harness = StreamingHarness(None)
+        stop_event = threading.Event()
+
+        SearchView._run_search(harness, "a", "", 1, stop_event, BrokenIndex())
+
+        name, args = harness.scheduled[-1]
+        self.assertEqual(name, "_publish_failure")
+        self.assertEqual(args[:2], (1, stop_event))
+        self.assertIn("malformed", args[2])
+
+    def test_progress_respects_generation_guard(self):
+        harness = SearchHarness()
+        event = threading.Event()
+        harness._active_stop_event = event
+        appended = []
+        harness._append_rows = appended.extend
+        harness.status_label = type("Label", (), {"configure": lambda self, **kw: None})()
+        progress = SearchProgress(({"path": "A", "type": "Key", "name": "A"},), 1, 1, 0.1)
+
+        SearchView._publish_progress(harness, 0, event, progress)
+        self.assertEqual(appended, [])
+
+        SearchView._publish_progress(harness, 1, event, progress)
+        self.assertEqual(appended, list(progress.rows))
+        self.assertIs(harness._active_stop_event, event)
+
+
 if __name__ == "__main__":
     unittest.main()
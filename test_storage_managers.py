@@ -65,7 +65,7 @@ class TestPresetManagerStorage(unittest.TestCase):
             original_content = presets_file.read_bytes()
             original_presets = manager.presets.copy()
 
-            with mock.patch("preset_manager.os.replace", side_effect=OSError("replace failed")):
+            with mock.patch("json_store.os.replace", side_effect=OSError("replace failed")):
                 with self.assertRaises(OSError):
                     manager.save_preset("Not committed", {"path": "Software", "values": []})
 
@@ -107,7 +107,7 @@ class TestFavoritesManagerStorage(unittest.TestCase):
             original_content = favorites_file.read_bytes()
             original_favorites = list(manager.favorites)
 
-            with mock.patch("favorites_manager.os.replace", side_effect=OSError("replace failed")):
+            with mock.patch("json_store.os.replace", side_effect=OSError("replace failed")):
                 with self.assertRaises(OSError):
                     manager.add_favorite("HKEY_CURRENT_USER", r"Software\New")
 
@@ -0,0 +1,50 @@
+import random
+import unittest
+
+from value_delta import COPY, INSERT, diff, patch
+
+
+def literal_size(ops):
+    return sum(len(op[1]) for op in ops if op[0] == INSERT)
+
+
+class TestValueDelta(unittest.TestCase):
+    def setUp(self):
+        self.base = random.Random(7).randbytes(64 * 1024)
+
+    def assert_round_trip(self, before, after):
+        ops = diff(before, after)
+        self.assertIsNotNone(ops)
+        self.assertEqual(patch(before, ops), after)
+        return ops
+
+    def test_scattered_edits_in_place_keep_only_the_changed_bytes(self):
+        after = bytearray(self.base)
+        for offset in (0, 5000, 40_000, len(after) - 1):
+            after[offset] ^= 0xFF
+        ops = self.assert_round_trip(self.base, bytes(after))
+        self.assertLessEqual(literal_size(ops), 4)
+
+    def test_insertions_and_deletions_resynchronize(self):
+        after = self.base[:1000] + b"inserted" + self.base[1000:30_000] + self.base[30_017:]
+        ops = self.assert_round_trip(self.base, after)
+        self.assertEqual(literal_size(ops), len(b"inserted"))
+
+    def test_multi_string_edits_copy_unchanged_strings(self):
+        before = tuple(f"entry {index}" for index in range(200))
+        after = before[:50] + ("new",) + before[51:150] + before[160:]
+        ops = self.assert_round_trip(before, after)
+        self.assertEqual([op for op in ops if op[0] == INSERT], [(INSERT, ("new",))])
+
+    def test_small_unrelated_or_mismatched_payloads_are_stored_whole(self):
+        self.assertIsNone(diff(b"\x00" * 100, b"\x01" * 100))
+        self.assertIsNone(diff(self.base, random.Random(8).randbytes(len(self.base))))
+        self.assertIsNone(diff(("a",) * 500, self.base))
+
+    def test_patch_rejects_ops_that_do_not_fit(self):
+        with self.assertRaises(ValueError):
+            patch(b"short", [(COPY, 2, 10)])
+
+
+if __name__ == "__main__":
+    unittest.main()
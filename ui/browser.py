@@ -3,6 +3,7 @@ from tkinter import ttk
 import customtkinter as ctk
 import winreg
 from change_manager import ChangePlan
+from registry_handler import RegistryOperationError
 from .editors import ValueEditor, NewValueDialog
 from .styles import COLOR_BG, COLOR_SELECTED
 
@@ -162,12 +163,12 @@ class RegistryBrowser(ctk.CTkFrame):
         ctk.CTkButton(filter_row, text="Apply", width=70, command=lambda: self.load_values(path)).pack(side="left", padx=3)
         ctk.CTkButton(filter_row, text="Clear", width=70, command=self.clear_value_filter).pack(side="left", padx=3)
 
-        values = self.registry_handler.read_key(self.current_hive, path)
-        
-        if values and isinstance(values, str):
-            # Permission denied
-            ctk.CTkLabel(self.value_list, text=f"⚠ {values}", text_color="orange").pack(pady=10)
+        try:
+            info = self.registry_handler.read_key_full(self.current_hive, path)
+        except RegistryOperationError as exc:
+            ctk.CTkLabel(self.value_list, text=f"⚠ {exc.detail}", text_color="orange").pack(pady=10)
             return
+        values = info.values if info else None
         
         if values:
             filter_text = self.value_filter_var.get().strip().lower()
@@ -305,8 +306,13 @@ class RegistryBrowser(ctk.CTkFrame):
         dialog = ctk.CTkInputDialog(text="Enter preset name:", title="Save Preset")
         name = dialog.get_input()
         if name:
-            values = self.registry_handler.read_key(self.current_hive, self.current_path)
-            if values and not isinstance(values, str):
+            try:
+                info = self.registry_handler.read_key_full(self.current_hive, self.current_path)
+            except RegistryOperationError as exc:
+                self.set_status(f"Could not read key: {exc.detail}", "red")
+                return
+            values = info.values if info else None
+            if values:
                 preset_data = {
                     "hive": "HKEY_CURRENT_USER", 
                     "path": self.current_path,
@@ -2,7 +2,7 @@ import customtkinter as ctk
 from change_manager import ChangeClassification
 
 class HistoryView(ctk.CTkFrame):
-    """View showing the session's change history with undo/redo buttons."""
+    """View showing the change history with undo/redo buttons."""
     
     def __init__(self, parent, history_manager, on_undo=None, on_redo=None):
         super().__init__(parent, corner_radius=0)
@@ -54,7 +54,7 @@ class HistoryView(ctk.CTkFrame):
         history = self.history_manager.get_history()
         
         if not history:
-            ctk.CTkLabel(self.list_frame, text="No changes recorded in this session.",
+            ctk.CTkLabel(self.list_frame, text="No changes recorded yet.",
                          text_color="gray").pack(pady=20)
             return
         
@@ -62,13 +62,14 @@ class HistoryView(ctk.CTkFrame):
             row = ctk.CTkFrame(self.list_frame)
             row.pack(fill="x", pady=2)
 
-            if hasattr(entry, "preview"):
-                preview = entry.preview()
-                counts = preview.counts
+            if hasattr(entry, "create_inverse_plan"):
+                # Stored plans summarize from their header without loading.
+                counts = entry.counts
+                effective = sum(counts.values()) - counts[ChangeClassification.NO_CHANGE]
                 action = "PLAN"
                 color = "#4EA1E8"
                 detail = (
-                    f"{entry.label}  •  {len(preview.effective_changes)} change(s)"
+                    f"{entry.label}  •  {effective} change(s)"
                     f"  •  +{counts[ChangeClassification.ADD]}"
                     f"  ~{counts[ChangeClassification.MODIFY]}"
                     f"  -{counts[ChangeClassification.DELETE]}"
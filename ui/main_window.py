@@ -2,13 +2,19 @@ import customtkinter as ctk
 import os
 import winreg
 from dataclasses import dataclass
-from tkinter import messagebox
+from tkinter import filedialog, messagebox
 from app_paths import get_app_paths, migrate_legacy_data
+from change_journal import ChangeJournal, JournalError
 from change_manager import ApplyStatus, ChangePlan
 from registry_handler import RegistryHandler
+from regf_backend import RegfBackend, RegfError
+from reg_file import build_import_plan, parse_reg_file
 from preset_manager import PresetManager
+from preset_store import PresetStoreError
 from favorites_manager import FavoritesManager
 from history_manager import HistoryManager
+from history_store import HistoryStore, HistoryStoreError
+from search_index import SearchIndex, SearchIndexError
 from .sidebar import Sidebar
 from .browser import RegistryBrowser
 from .search_view import SearchView
@@ -17,6 +23,27 @@ from .history_view import HistoryView
 from .change_preview import ChangePreviewDialog
 
 
+# Above this many value changes, the change journal alone covers recovery
+# and the per-key .reg export is skipped.
+JOURNAL_ONLY_CHANGE_COUNT = 1000
+
+# Snapshot data history may keep in memory; older plans reload from disk.
+HISTORY_MEMORY_BUDGET = 64 * 1024 * 1024
+# Retention of the on-disk history, which holds every changed value's data.
+HISTORY_KEEP_PLANS = 1000
+HISTORY_KEEP_DAYS = 30
+PRESET_PAGE_SIZE = 100
+
+
+def format_byte_size(size):
+    """Return *size* bytes as a short human-readable string."""
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+
 @dataclass(frozen=True)
 class _UiApplyResult:
     success: bool
@@ -38,9 +65,34 @@ class RegistryApp(ctk.CTk):
         self.app_paths = get_app_paths(data_dir)
         self.migration_report = migrate_legacy_data(self.app_paths)
         self.registry_handler = RegistryHandler(self.app_paths["backups"])
-        self.preset_manager = PresetManager(self.app_paths["presets"])
+        try:
+            self.registry_handler.journal = ChangeJournal(self.app_paths["journal"])
+        except (OSError, JournalError) as exc:
+            print(f"Change journal unavailable: {exc}")
+        try:
+            self.preset_manager = PresetManager(
+                self.app_paths["presets"], db_path=self.app_paths["preset_db"]
+            )
+        except (OSError, PresetStoreError) as exc:
+            print(f"Preset database unavailable, using presets.json: {exc}")
+            self.preset_manager = PresetManager(self.app_paths["presets"])
+        self.preset_page = 0
         self.favorites_manager = FavoritesManager(self.app_paths["favorites"])
-        self.history_manager = HistoryManager()
+        try:
+            history_store = HistoryStore(self.app_paths["history"], self.registry_handler)
+        except (OSError, HistoryStoreError) as exc:
+            print(f"History store unavailable, keeping history in memory: {exc}")
+            history_store = None
+        self.history_manager = HistoryManager(
+            store=history_store,
+            max_bytes=HISTORY_MEMORY_BUDGET,
+            keep_plans=HISTORY_KEEP_PLANS,
+            keep_days=HISTORY_KEEP_DAYS,
+        )
+        self.search_index = None
+        # Read-only handler over an opened hive file; browser and search use
+        # it instead of the live registry while it is set.
+        self.offline_handler = None
 
         # Sidebar
         self.sidebar = Sidebar(self, self.on_navigate)
@@ -76,14 +128,16 @@ class RegistryApp(ctk.CTk):
                 f"Migrated {len(self.migration_report['copied'])} legacy data item(s).",
                 "green",
             )
+        self.after(200, self.offer_journal_recovery)
 
     def set_status(self, text, color="gray"):
         self.status_label.configure(text=text, text_color=color)
 
     def update_undo_status(self):
-        undo_count = len(self.history_manager.undo_stack)
-        redo_count = len(self.history_manager.redo_stack)
-        text = f"Undo: {undo_count}  |  Redo: {redo_count}"
+        undo_count = self.history_manager.undo_count()
+        redo_count = self.history_manager.redo_count()
+        memory = format_byte_size(self.history_manager.memory_usage())
+        text = f"Undo: {undo_count}  |  Redo: {redo_count}  |  Memory: {memory}"
         self.undo_label.configure(text=text)
 
     def on_navigate(self, view_name):
@@ -99,18 +153,51 @@ class RegistryApp(ctk.CTk):
             self.show_favorites()
         elif view_name == "history":
             self.show_history()
+        elif view_name == "hive":
+            self.toggle_offline_hive()
 
     def clear_content(self):
         for widget in self.content_frame.winfo_children():
             widget.destroy()
 
+    @property
+    def view_handler(self):
+        return self.offline_handler or self.registry_handler
+
+    # --- Offline hives ---
+    def toggle_offline_hive(self):
+        if self.offline_handler is not None:
+            self.offline_handler.backend.close()
+            self.offline_handler = None
+            self.sidebar.set_offline_hive(None)
+            self.show_browser()
+            return
+
+        filepath = filedialog.askopenfilename(
+            title="Open offline hive file",
+            filetypes=[("Registry hives", "*.dat *.hiv"), ("All files", "*.*")],
+        )
+        if not filepath:
+            return
+        try:
+            backend = RegfBackend(filepath)
+        except (OSError, RegfError) as exc:
+            self.set_status(f"Could not open hive: {exc}", "red")
+            return
+        self.offline_handler = RegistryHandler(self.app_paths["backups"], backend=backend)
+        self.sidebar.set_offline_hive(os.path.basename(filepath))
+        self.show_browser()
+
     # --- Browser ---
     def show_browser(self):
         self.clear_content()
-        self.set_status("Browsing Registry")
+        if self.offline_handler is not None:
+            self.set_status(f"Browsing offline hive (read-only): {self.offline_handler.backend.path}")
+        else:
+            self.set_status("Browsing Registry")
         browser = RegistryBrowser(
             self.content_frame, 
-            self.registry_handler, 
+            self.view_handler, 
             self.preset_manager,
             history_manager=self.history_manager,
             favorites_manager=self.favorites_manager,
@@ -132,9 +219,22 @@ class RegistryApp(ctk.CTk):
     def show_search(self):
         self.clear_content()
         self.set_status("Search Mode")
-        search = SearchView(self.content_frame, self.registry_handler, on_navigate_to_key=self.navigate_to_key)
+        search = SearchView(
+            self.content_frame,
+            self.view_handler,
+            on_navigate_to_key=self.navigate_to_key,
+            search_index=None if self.offline_handler else self._get_search_index(),
+        )
         search.pack(fill="both", expand=True)
 
+    def _get_search_index(self):
+        if self.search_index is None:
+            try:
+                self.search_index = SearchIndex(self.app_paths["search_index"], self.registry_handler)
+            except SearchIndexError as exc:
+                print(f"Search index unavailable: {exc}")
+        return self.search_index
+
     # --- Favorites ---
     def show_favorites(self):
         self.clear_content()
@@ -142,6 +242,44 @@ class RegistryApp(ctk.CTk):
         fav_view = FavoritesView(self.content_frame, self.favorites_manager, on_navigate_to_key=self.navigate_to_key)
         fav_view.pack(fill="both", expand=True)
 
+    # --- Crash recovery ---
+    def offer_journal_recovery(self):
+        """Offer to roll back plans that a previous session left unfinished."""
+        journal = self.registry_handler.journal
+        if journal is None:
+            return
+        try:
+            interrupted = journal.interrupted()
+        except (OSError, JournalError) as exc:
+            self.set_status(f"Could not read the change journal: {exc}", "red")
+            return
+        for plan in interrupted:
+            choice = self.ask_journal_recovery(plan)
+            if choice is None:
+                continue
+            try:
+                if choice:
+                    result = journal.recover(self.registry_handler, plan)
+                    color = "green" if result.status is not ApplyStatus.ROLLBACK_FAILED else "red"
+                    self.set_status(f"Recovered: {result.message}", color)
+                else:
+                    journal.discard(plan)
+                    self.set_status(f"Kept the registry as {plan.label} left it.", "orange")
+            except OSError as exc:
+                self.set_status(f"Could not update the change journal: {exc}", "red")
+
+    def ask_journal_recovery(self, plan):
+        """Return True to roll back, False to keep, or None to ask next time."""
+        return messagebox.askyesnocancel(
+            "Interrupted registry change",
+            f"\"{plan.label}\" did not finish when Registry Manager last closed. "
+            f"It planned {len(plan.changes)} value change(s); at least {plan.attempted} had started.\n\n"
+            "Yes: restore the values recorded before it began.\n"
+            "No: keep the registry as it is now.\n"
+            "Cancel: decide at the next start.",
+            parent=self,
+        )
+
     # --- History ---
     def show_history(self):
         self.clear_content()
@@ -193,7 +331,7 @@ class RegistryApp(ctk.CTk):
             return "orange"
         return "red"
 
-    def review_change_plan(self, plan, on_success=None):
+    def review_change_plan(self, plan, on_success=None, create_keys=()):
         """Open a zero-write diff review for a prepared change plan."""
         return ChangePreviewDialog(
             self,
@@ -202,32 +340,47 @@ class RegistryApp(ctk.CTk):
                 reviewed_plan,
                 create_backup=create_backup,
                 on_success=on_success,
+                create_keys=create_keys,
             ),
             backup_default=True,
         )
 
-    def apply_change_plan(self, plan, create_backup=True, on_success=None):
-        """Create recovery exports, apply, verify, then commit history."""
+    def apply_change_plan(self, plan, create_backup=True, on_success=None, create_keys=()):
+        """Create a recovery export, apply, verify, then commit history.
+
+        *create_keys* lists ``(hive, path)`` keys that must exist before the
+        plan's values can be written, such as the sections of an imported
+        .reg file; they are created after the export and before any write.
+        """
+        if plan.handler is self.offline_handler:
+            message = "Offline hive files are read-only; close the hive to edit the live registry."
+            self.set_status(message, "orange")
+            return _UiApplyResult(False, message)
         effective = plan.effective_changes
-        if create_backup:
-            backed_up = set()
-            for change in effective:
-                location = (change.hive_name.casefold(), change.path.casefold())
-                if location in backed_up:
-                    continue
-                full_path = (
-                    f"{change.hive_name}\\{change.path}"
-                    if change.path else change.hive_name
-                )
-                backup_path = self.registry_handler.backup_key(full_path)
-                if not backup_path:
-                    message = (
-                        f"Recovery export failed for {full_path}; no registry changes were applied. "
-                        f"{self.registry_handler.last_error or ''}"
-                    ).strip()
-                    self.set_status(message, "red")
-                    return _UiApplyResult(False, message)
-                backed_up.add(location)
+        journaled = getattr(plan.handler, "journal", None) is not None
+        if create_backup and effective and not (journaled and len(effective) > JOURNAL_ONLY_CHANGE_COUNT):
+            # One export holding just the keys this plan touches; their
+            # subtrees are not affected, so they are not exported.
+            full_paths = [
+                f"{change.hive_name}\\{change.path}" if change.path else change.hive_name
+                for change in effective
+            ]
+            backup_path = self.registry_handler.backup_keys(
+                full_paths, recursive=False, missing_ok=True
+            )
+            if not backup_path:
+                message = (
+                    "Recovery export failed; no registry changes were applied. "
+                    f"{self.registry_handler.last_error or ''}"
+                ).strip()
+                self.set_status(message, "red")
+                return _UiApplyResult(False, message)
+
+        for hive, path in create_keys:
+            if not self.registry_handler.create_key(hive, path):
+                message = f"Could not create {path}: {self.registry_handler.last_error or ''}".strip()
+                self.set_status(message, "red")
+                return _UiApplyResult(False, message)
 
         result = plan.apply()
         if result.success:
@@ -253,7 +406,7 @@ class RegistryApp(ctk.CTk):
         return result
 
     # --- Presets ---
-    def show_presets(self):
+    def show_presets(self, page=0):
         self.clear_content()
         self.set_status("Presets Manager")
         
@@ -262,31 +415,50 @@ class RegistryApp(ctk.CTk):
         
         ctk.CTkLabel(frame, text="Presets Manager", font=ctk.CTkFont(size=24, weight="bold")).pack(pady=(10, 20))
         
-        presets = self.preset_manager.presets
-        if not presets:
+        # Rows list names, paths and counts only; values load on Review.
+        total = len(self.preset_manager.presets)
+        page = max(0, min(page, (total - 1) // PRESET_PAGE_SIZE)) if total else 0
+        self.preset_page = page
+        if not total:
             ctk.CTkLabel(frame, text="No presets found.", text_color="gray").pack(pady=10)
         else:
-            for name in presets:
+            for summary in self.preset_manager.list_presets(page * PRESET_PAGE_SIZE, PRESET_PAGE_SIZE):
+                name = summary.name
                 row = ctk.CTkFrame(frame)
                 row.pack(fill="x", padx=30, pady=4)
                 ctk.CTkLabel(row, text=name, font=("Arial", 14), anchor="w").pack(side="left", padx=15)
                 
-                preset_data = presets[name]
-                path_text = preset_data.get("path", "")
-                ctk.CTkLabel(row, text=path_text, text_color="gray", anchor="w").pack(side="left", padx=10, fill="x", expand=True)
+                ctk.CTkLabel(row, text=summary.path, text_color="gray", anchor="w").pack(side="left", padx=10, fill="x", expand=True)
                 
-                value_count = len(preset_data.get("values", []))
                 ctk.CTkLabel(
-                    row, text=f"{value_count} value(s)", text_color="#86B7E7"
+                    row, text=f"{summary.value_count} value(s)", text_color="#86B7E7"
                 ).pack(side="right", padx=8)
                 ctk.CTkButton(row, text="Review", width=75, command=lambda n=name: self.apply_preset(n)).pack(side="right", padx=5)
                 ctk.CTkButton(row, text="Delete", width=70, fg_color="red", hover_color="darkred", 
                               command=lambda n=name: self.delete_preset(n)).pack(side="right", padx=5)
 
+        if total > PRESET_PAGE_SIZE:
+            pager = ctk.CTkFrame(frame, fg_color="transparent")
+            pager.pack(fill="x", padx=30, pady=(10, 4))
+            first = page * PRESET_PAGE_SIZE
+            ctk.CTkButton(
+                pager, text="◀ Previous", width=100,
+                state="normal" if page > 0 else "disabled",
+                command=lambda: self.show_presets(page - 1),
+            ).pack(side="left", padx=5)
+            ctk.CTkLabel(
+                pager, text=f"{first + 1}–{min(first + PRESET_PAGE_SIZE, total)} of {total}", text_color="gray"
+            ).pack(side="left", padx=10, expand=True)
+            ctk.CTkButton(
+                pager, text="Next ▶", width=100,
+                state="normal" if first + PRESET_PAGE_SIZE < total else "disabled",
+                command=lambda: self.show_presets(page + 1),
+            ).pack(side="right", padx=5)
+
     def delete_preset(self, name):
         self.preset_manager.delete_preset(name)
         self.set_status(f"Deleted preset: {name}", "orange")
-        self.show_presets()
+        self.show_presets(self.preset_page)
 
     def apply_preset(self, name):
         data = self.preset_manager.get_preset(name)
@@ -299,12 +471,11 @@ class RegistryApp(ctk.CTk):
         hive = winreg.HKEY_CURRENT_USER
 
         try:
-            plan = ChangePlan(self.registry_handler, f"Apply preset: {name}")
             for value_spec in values:
                 if not isinstance(value_spec, (list, tuple)) or len(value_spec) != 3:
                     raise ValueError("Each preset value must contain name, data, and type.")
-                value_name, value_data, value_type = value_spec
-                plan.set_value(hive, path, value_name, value_data, value_type)
+            plan = ChangePlan(self.registry_handler, f"Apply preset: {name}", intern_payloads=True)
+            plan.set_values(hive, path, values)
         except Exception as exc:
             self.set_status(f"Could not prepare preset: {exc}", "red")
             return
@@ -336,25 +507,24 @@ class RegistryApp(ctk.CTk):
                 row = ctk.CTkFrame(frame)
                 row.pack(fill="x", padx=30, pady=4)
                 ctk.CTkLabel(row, text=f, font=("Arial", 14), anchor="w").pack(side="left", padx=15, fill="x", expand=True)
-                ctk.CTkButton(row, text="Import / merge", width=110, command=lambda fn=f: self.restore_backup(fn)).pack(side="right", padx=5)
+                ctk.CTkButton(row, text="Review import", width=110, command=lambda fn=f: self.restore_backup(fn)).pack(side="right", padx=5)
                 ctk.CTkButton(row, text="Delete", width=70, fg_color="red", hover_color="darkred",
                               command=lambda fn=f: self.delete_backup(fn)).pack(side="right", padx=5)
 
     def restore_backup(self, filename):
-        if not messagebox.askyesno(
-            "Import registry backup",
-            "This merges the selected .reg file into the Windows Registry. "
-            "It is not an exact snapshot restore. Continue?",
-            parent=self,
-        ):
-            self.set_status("Backup import cancelled.", "gray")
-            return
         filepath = os.path.join(self.app_paths["backups"], filename)
-        success = self.registry_handler.restore_backup(filepath)
-        if success:
-            self.set_status(f"Imported / merged: {filename}", "green")
-        else:
-            self.set_status(f"Import failed: {filename}", "red")
+        try:
+            imported = build_import_plan(
+                self.registry_handler, parse_reg_file(filepath), f"Import / merge: {filename}"
+            )
+        except (OSError, ValueError, RuntimeError) as exc:
+            self.set_status(f"Could not read {filename}: {exc}", "red")
+            return
+        self.set_status(
+            f"Review import of {filename}: {imported.operations} operation(s) in "
+            f"{len(imported.keys)} key(s). Importing merges; it does not remove newer values.",
+        )
+        self.review_change_plan(imported.plan, create_keys=imported.keys)
 
     def delete_backup(self, filename):
         filepath = os.path.join(self.app_paths["backups"], filename)
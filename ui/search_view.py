@@ -1,20 +1,82 @@
 import customtkinter as ctk
+import sqlite3
 import tkinter as tk
 import winreg
 import threading
+import time
+from contextlib import closing
+from dataclasses import dataclass
+
+from registry_query import QuerySyntaxError, compile_query
+from registry_search import RegistrySearch
+from search_index import SearchIndexError
+
+
+# Rows beyond this are counted but never materialized, so memory stays flat
+# no matter how many registry entries match.
+DISPLAY_LIMIT = 200
+# Minimum spacing between UI publications from the worker thread.
+PUBLISH_INTERVAL = 0.05
+
+
+@dataclass(frozen=True)
+class SearchProgress:
+    rows: tuple
+    total: int
+    keys_scanned: int
+    elapsed: float
+
+    @property
+    def keys_per_second(self):
+        return self.keys_scanned / self.elapsed if self.elapsed > 0 else 0.0
+
+
+def _scan_rate_text(progress):
+    if not progress.keys_scanned:
+        return ""
+    return f"  •  {progress.keys_scanned} key(s) at {progress.keys_per_second:,.0f}/s"
+
+
+def _index_age_text(status):
+    if not status.built:
+        return "Index not built yet."
+    age = status.age_seconds() or 0
+    if age < 90:
+        when = "just now"
+    elif age < 5400:
+        when = f"{age / 60:.0f} min ago"
+    elif age < 172800:
+        when = f"{age / 3600:.0f} h ago"
+    else:
+        when = f"{age / 86400:.0f} days ago"
+    partial = "" if status.complete else " (partial)"
+    return f"Index: {status.key_count:,} keys, {status.value_count:,} values  •  refreshed {when}{partial}"
+
+
+def _is_current(view, generation, stop_event):
+    return not (
+        view._destroyed
+        or generation != view._search_generation
+        or stop_event is not view._active_stop_event
+        or stop_event.is_set()
+    )
+
 
 class SearchView(ctk.CTkFrame):
     """Full search view with threaded background search."""
     
-    def __init__(self, parent, registry_handler, on_navigate_to_key=None):
+    def __init__(self, parent, registry_handler, on_navigate_to_key=None, search_index=None):
         super().__init__(parent, corner_radius=0)
         self.registry_handler = registry_handler
         self.on_navigate_to_key = on_navigate_to_key
+        self.search_index = search_index
+        self._refresh_thread = None
         self.stop_event = threading.Event()
         self.search_thread = None
         self._active_stop_event = None
         self._search_generation = 0
         self._destroyed = False
+        self._shown_count = 0
         
         self.create_widgets()
     
@@ -27,7 +89,7 @@ class SearchView(ctk.CTkFrame):
         search_frame.pack(fill="x", padx=30, pady=10)
         
         ctk.CTkLabel(search_frame, text="Query:").pack(side="left", padx=(0, 5))
-        self.search_entry = ctk.CTkEntry(search_frame, placeholder_text="Search keys and values...", width=400)
+        self.search_entry = ctk.CTkEntry(search_frame, placeholder_text="Text, or e.g. type:REG_DWORD name:/^Hide/ data>=1 path:Software\\*", width=400)
         self.search_entry.pack(side="left", fill="x", expand=True, padx=5)
         self.search_entry.bind("<Return>", lambda e: self.start_search())
         
@@ -45,6 +107,21 @@ class SearchView(ctk.CTkFrame):
         ctk.CTkLabel(options_frame, text="Start path:").pack(side="left", padx=(0, 5))
         self.start_path_entry = ctk.CTkEntry(options_frame, placeholder_text="Leave blank for root (HKCU)", width=350)
         self.start_path_entry.pack(side="left", fill="x", expand=True, padx=5)
+
+        self.use_index_var = tk.BooleanVar(master=self, value=False)
+        if self.search_index is not None:
+            index_frame = ctk.CTkFrame(self, fg_color="transparent")
+            index_frame.pack(fill="x", padx=30, pady=(0, 10))
+            ctk.CTkCheckBox(
+                index_frame, text="Indexed search", variable=self.use_index_var
+            ).pack(side="left", padx=(0, 10))
+            self.refresh_index_btn = ctk.CTkButton(
+                index_frame, text="Refresh index", width=120, command=self.refresh_index
+            )
+            self.refresh_index_btn.pack(side="left", padx=5)
+            self.index_label = ctk.CTkLabel(index_frame, text="", text_color="gray", anchor="w")
+            self.index_label.pack(side="left", padx=10, fill="x", expand=True)
+            self._update_index_label()
         
         # Status
         self.status_label = ctk.CTkLabel(self, text="", text_color="gray")
@@ -58,10 +135,16 @@ class SearchView(ctk.CTkFrame):
         query = self.search_entry.get().strip()
         if not query:
             return
+        try:
+            matcher = compile_query(query)
+        except QuerySyntaxError as exc:
+            self.status_label.configure(text=str(exc), text_color="red")
+            return
         
         # Clear previous results
         for widget in self.results_frame.winfo_children():
             widget.destroy()
+        self._shown_count = 0
         
         if self._active_stop_event:
             self._active_stop_event.set()
@@ -75,10 +158,21 @@ class SearchView(ctk.CTkFrame):
         self.status_label.configure(text="Searching...", text_color="orange")
         
         start_path = self.start_path_entry.get().strip()
+        engine = None
+        if self.search_index is not None and self.use_index_var.get():
+            try:
+                if self.search_index.covers(winreg.HKEY_CURRENT_USER, start_path):
+                    engine = self.search_index
+                else:
+                    fallback = "Index does not cover this path; searching the live registry..."
+            except SearchIndexError:
+                fallback = "Index unavailable; searching the live registry..."
+            if engine is None:
+                self.status_label.configure(text=fallback, text_color="orange")
         
         self.search_thread = threading.Thread(
             target=self._run_search, 
-            args=(query, start_path, generation, stop_event),
+            args=(matcher, start_path, generation, stop_event, engine),
             daemon=True
         )
         self.search_thread.start()
@@ -92,36 +186,122 @@ class SearchView(ctk.CTkFrame):
         self.search_btn.configure(state="normal")
         self.stop_btn.configure(state="disabled")
     
-    def _run_search(self, query, start_path, generation, stop_event):
-        results = self.registry_handler.search_registry(
-            winreg.HKEY_CURRENT_USER, start_path, query, stop_event
-        )
+    def _run_search(self, query, start_path, generation, stop_event, engine=None):
+        engine = engine or RegistrySearch(self.registry_handler)
+        started = time.perf_counter()
+        last_publish = None
+        pending = []
+        sent_rows = 0
+        total = 0
+
+        def progress():
+            return SearchProgress(
+                tuple(pending),
+                total,
+                getattr(engine, "keys_scanned", 0),
+                time.perf_counter() - started,
+            )
+
+        try:
+            batches = engine.iter_batches(
+                winreg.HKEY_CURRENT_USER, start_path, query, stop_event
+            )
+            with closing(batches):
+                for batch in batches:
+                    total += len(batch)
+                    room = DISPLAY_LIMIT - sent_rows - len(pending)
+                    if room > 0:
+                        pending.extend(batch[:room])
+                    now = time.perf_counter()
+                    # Publish the first hit immediately, then throttle so the Tk
+                    # event queue stays short while the walk continues.
+                    if (last_publish is None and pending) or (
+                        now - (last_publish or started) >= PUBLISH_INTERVAL
+                    ):
+                        if not self._schedule(
+                            self._publish_progress, generation, stop_event, progress()
+                        ):
+                            return
+                        sent_rows += len(pending)
+                        pending = []
+                        last_publish = now
+        except (SearchIndexError, sqlite3.Error) as exc:
+            self._schedule(self._publish_failure, generation, stop_event, f"Search failed: {exc}")
+            return
 
         if stop_event.is_set():
             return
+        self._schedule(self._publish_results, generation, stop_event, progress())
+
+    def _schedule(self, callback, *args):
         try:
-            self.after(
-                0,
-                lambda: self._publish_results(
-                    generation, stop_event, results
-                ),
-            )
+            self.after(0, lambda: callback(*args))
+            return True
         except (RuntimeError, tk.TclError):
             # Navigation can destroy the view while a worker is finishing.
+            return False
+
+    def _publish_progress(self, generation, stop_event, progress):
+        if not _is_current(self, generation, stop_event):
             return
+        self._append_rows(progress.rows)
+        self.status_label.configure(
+            text=f"Searching... {progress.total} result(s){_scan_rate_text(progress)}",
+            text_color="orange",
+        )
 
     def _publish_results(self, generation, stop_event, results):
-        if (
-            self._destroyed
-            or generation != self._search_generation
-            or stop_event is not self._active_stop_event
-            or stop_event.is_set()
-        ):
+        if not _is_current(self, generation, stop_event):
             return
         self._active_stop_event = None
         self.search_thread = None
         self._show_results(results)
 
+    def _publish_failure(self, generation, stop_event, message):
+        if not _is_current(self, generation, stop_event):
+            return
+        self._active_stop_event = None
+        self.search_thread = None
+        self.search_btn.configure(state="normal")
+        self.stop_btn.configure(state="disabled")
+        self.status_label.configure(text=message, text_color="red")
+
+    def _update_index_label(self):
+        try:
+            text = _index_age_text(self.search_index.status())
+        except SearchIndexError as exc:
+            text = f"Index unavailable: {exc}"
+        self.index_label.configure(text=text)
+
+    def refresh_index(self):
+        if self._refresh_thread is not None:
+            return
+        self.refresh_index_btn.configure(state="disabled")
+        self.index_label.configure(text="Refreshing index...")
+        index = self.search_index
+
+        def work():
+            try:
+                stats = index.refresh(winreg.HKEY_CURRENT_USER)
+                message = (
+                    f"Index refreshed in {stats.elapsed:.1f}s: {stats.keys_rescanned:,} "
+                    f"changed, {stats.keys_reused:,} reused key(s)."
+                )
+            except SearchIndexError as exc:
+                message = f"Index refresh failed: {exc}"
+            self._schedule(self._finish_index_refresh, message)
+
+        self._refresh_thread = threading.Thread(target=work, daemon=True)
+        self._refresh_thread.start()
+
+    def _finish_index_refresh(self, message):
+        self._refresh_thread = None
+        if self._destroyed:
+            return
+        self.refresh_index_btn.configure(state="normal")
+        self._update_index_label()
+        self.status_label.configure(text=message, text_color="gray")
+
     def destroy(self):
         self._destroyed = True
         self._search_generation += 1
@@ -130,18 +310,31 @@ class SearchView(ctk.CTkFrame):
         self._active_stop_event = None
         super().destroy()
     
-    def _show_results(self, results):
+    def _show_results(self, progress):
         self.search_btn.configure(state="normal")
         self.stop_btn.configure(state="disabled")
-        
-        if not results:
+        self._append_rows(progress.rows)
+
+        if not progress.total:
             self.status_label.configure(text="No results found.", text_color="gray")
             return
-        
-        self.status_label.configure(text=f"Found {len(results)} result(s).", text_color="green")
-        
-        # Show up to 200 results
-        for i, result in enumerate(results[:200]):
+
+        self.status_label.configure(
+            text=(
+                f"Found {progress.total} result(s) in {progress.elapsed:.2f}s"
+                f"{_scan_rate_text(progress)}"
+            ),
+            text_color="green",
+        )
+        if progress.total > self._shown_count:
+            ctk.CTkLabel(
+                self.results_frame,
+                text=f"... and {progress.total - self._shown_count} more results (search narrower).",
+                text_color="gray",
+            ).pack(pady=5)
+
+    def _append_rows(self, results):
+        for result in results:
             row = ctk.CTkFrame(self.results_frame)
             row.pack(fill="x", pady=2)
             
@@ -161,7 +354,4 @@ class SearchView(ctk.CTkFrame):
                 go_btn = ctk.CTkButton(row, text="Go", width=40, 
                                         command=lambda p=result['path']: self.on_navigate_to_key(p))
                 go_btn.pack(side="right", padx=5)
-        
-        if len(results) > 200:
-            ctk.CTkLabel(self.results_frame, text=f"... and {len(results) - 200} more results (search narrower).",
-                         text_color="gray").pack(pady=5)
+        self._shown_count += len(results)
@@ -5,7 +5,7 @@ class Sidebar(ctk.CTkFrame):
     def __init__(self, parent, on_navigate):
         super().__init__(parent, width=SIDEBAR_WIDTH, corner_radius=0)
         self.on_navigate = on_navigate
-        self.grid_rowconfigure(7, weight=1)
+        self.grid_rowconfigure(8, weight=1)
 
         self.logo_label = ctk.CTkLabel(self, text="RegManager", font=FONT_LOGO)
         self.logo_label.grid(row=0, column=0, padx=20, pady=(20, 10))
@@ -28,11 +28,18 @@ class Sidebar(ctk.CTkFrame):
         self.btn_history = ctk.CTkButton(self, text="↶  History", command=lambda: self.on_navigate("history"), anchor="w")
         self.btn_history.grid(row=6, column=0, padx=20, pady=5, sticky="ew")
 
+        self.btn_hive = ctk.CTkButton(self, text="📂  Open Hive", command=lambda: self.on_navigate("hive"), anchor="w")
+        self.btn_hive.grid(row=7, column=0, padx=20, pady=5, sticky="ew")
+
         # Appearance mode toggle at the bottom
         self.appearance_menu = ctk.CTkOptionMenu(self, values=["System", "Dark", "Light"],
                                                   command=self.change_appearance)
         self.appearance_menu.set("System")
-        self.appearance_menu.grid(row=8, column=0, padx=20, pady=(10, 20), sticky="s")
+        self.appearance_menu.grid(row=9, column=0, padx=20, pady=(10, 20), sticky="s")
+
+    def set_offline_hive(self, name):
+        """Show whether an offline hive file replaces the live registry."""
+        self.btn_hive.configure(text=f"⏏  Close {name}" if name else "📂  Open Hive")
 
     def change_appearance(self, mode):
         ctk.set_appearance_mode(mode)
@@ -0,0 +1,118 @@
+"""Copy/insert deltas between two versions of a large registry payload.
+
+Editing a few bytes of a large REG_BINARY value, or one string of a long
+REG_MULTI_SZ list, leaves most of the data as it was. ``diff`` describes
+the new payload as ranges copied from the old one plus inserted literals,
+and ``patch`` rebuilds it. Both work on ``bytes`` and on tuples of str.
+
+Matching is a single greedy pass: the old payload is indexed by aligned
+blocks, and each match found in the new one is extended in both
+directions. Edits in place, insertions and deletions resynchronize within
+one block, so a delta costs linear time in the payload size.
+"""
+
+from __future__ import annotations
+
+
+COPY = 0
+INSERT = 1
+
+# Payloads smaller than this many bytes are cheaper to store whole.
+DELTA_MIN_SIZE = 256
+
+_BYTES_BLOCK = 32
+
+
+def _size(value):
+    if isinstance(value, bytes):
+        return len(value)
+    return sum(2 * (len(item) + 1) for item in value)
+
+
+def _match_length(before, source, after, position):
+    """Length of the common run of *before* at *source* and *after* at *position*."""
+    limit = min(len(before) - source, len(after) - position)
+    length = 0
+    step = 64
+    while length < limit:
+        count = min(step, limit - length)
+        if before[source + length:source + length + count] == after[position + length:position + length + count]:
+            length += count
+            step *= 2
+        elif count == 1:
+            break
+        else:
+            step = count // 2
+    return length
+
+
+def diff(before, after):
+    """Return ops that rebuild *after* from *before*, or None if not worth it.
+
+    Ops are ``(COPY, start, length)`` and ``(INSERT, literal)``, where a
+    literal is a slice of *after*. None is returned for small or mismatched
+    payloads, and once more than half of *after* would be literal.
+    """
+    if type(before) is not type(after) or not isinstance(after, (bytes, tuple)):
+        return None
+    if _size(after) < DELTA_MIN_SIZE:
+        return None
+    block = _BYTES_BLOCK if isinstance(after, bytes) else 1
+    index = {}
+    for start in range(0, len(before) - block + 1, block):
+        index.setdefault(before[start:start + block], start)
+
+    size = len(after)
+    budget = size // 2
+    ops = []
+    literal_total = 0
+    literal_start = 0
+    position = 0
+    shift = 0
+    while position + block <= size:
+        key = after[position:position + block]
+        source = position + shift
+        if source < 0 or before[source:source + block] != key:
+            source = index.get(key)
+        if source is None:
+            position += 1
+            if literal_total + position - literal_start > budget:
+                return None
+            continue
+        # Aligned blocks can match late; take back the literal bytes before.
+        while source > 0 and position > literal_start and before[source - 1] == after[position - 1]:
+            source -= 1
+            position -= 1
+        if position > literal_start:
+            ops.append((INSERT, after[literal_start:position]))
+            literal_total += position - literal_start
+        length = _match_length(before, source, after, position)
+        ops.append((COPY, source, length))
+        shift = source - position
+        position += length
+        literal_start = position
+    if literal_start < size:
+        literal_total += size - literal_start
+        if literal_total > budget:
+            return None
+        ops.append((INSERT, after[literal_start:]))
+    return ops
+
+
+def patch(before, ops):
+    """Rebuild a payload from *before* and ops made by ``diff``.
+
+    Raises ``ValueError`` for ops that do not fit *before*.
+    """
+    parts = bytearray() if isinstance(before, bytes) else []
+    for op in ops:
+        if op[0] == COPY:
+            _, start, length = op
+            if start < 0 or length < 0 or start + length > len(before):
+                raise ValueError("Delta copies past the end of its source.")
+            parts += before[start:start + length]
+        elif op[0] == INSERT:
+            parts += op[1]
+        else:
+            raise ValueError(f"Unknown delta op {op[0]}.")
+    return bytes(parts) if isinstance(before, bytes) else tuple(parts)